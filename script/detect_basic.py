@@ -1,169 +1,233 @@
-# -*- coding: utf8 -*-
-# author: ronniecao
-# time: 2018/03/10
-# description: start script
-from __future__ import print_function
-import sys
-import argparse
-import os
-import platform
-import collections
-import random
-import numpy
-import multiprocessing as mp
-from multiprocessing.sharedctypes import Array
-from ctypes import c_double, cast, POINTER
-os.environ['CUDA_DEVICE_ORDER'] = 'PCI_BUS_ID'
-
-if 'Windows' in platform.platform():
-    store_dir = 'E:\Github\\table-detection\\'
-elif 'Linux' in platform.platform():
-    data_dir = '/home/caory/github/yolo-tensorflow/'
-
-
-def main(method='train', gpus=''):
-    from src.data.data_basic import Processor
-    from src.network.network_basic import Network
-    from src.model.model_basic import Model
-   
-    option = collections.OrderedDict()
-    option['batch_size'] = 32
-    option['image_x_size'] = 448
-    option['image_y_size'] = 448
-    option['n_channel'] = 3
-    option['n_classes'] = 20
-    option['cell_x_size'] = 7
-    option['cell_y_size'] = 7
-    option['pool_mode'] = 'max'
-    option['n_boxes'] = 5
-    option['n_processes'] = 2
-    option['max_objects'] = 30
-    option['n_iter'] = 200000
-    option['buffer_size'] = 5
-    option['gpus'] = gpus
-    option['n_gpus'] = len(gpus.split(',')) if len(gpus.split(',')) != 0 else 1
-    option['is_multigpu'] = True if option['n_gpus'] > 1 else False
-    option['is_valid'] = False
-    option['noobject_scale'] = 0.5
-    option['object_scale'] = 1
-    option['coord_scale'] = 5
-    option['class_scale'] = 1
-    option['is_weight_decay'] = False
-    option['weight_decay'] = 1e-3
-    option['learning_rate'] = 1e-4
-    option['is_lr_decay'] = False
-    option['train_data'] = 'voc'
-    option['test_data'] = 'voc'
-    option['seq'] = 'voc-v1'
-    option['model'] = 'model_best.ckpt'
-    option['update_function'] = 'momentum'
-    option['is_observe'] = True
-    
-    # 打印option
-    print()
-    for key in option:
-        print('%-20s' % (key), '= {}'.format(option[key]))
-    print()
-    
-    processor = Processor(
-        image_x_size = option['image_x_size'], 
-        image_y_size = option['image_y_size'], 
-        max_objects = option['max_objects'], 
-        n_classes = option['n_classes'],
-        cell_x_size = option['cell_x_size'], 
-        cell_y_size = option['cell_y_size'],
-        n_boxes = option['n_boxes'],
-        batch_size = option['batch_size'], 
-        n_channel = option['n_channel'],
-        n_processes = option['n_processes'], 
-        n_iters = option['n_iter'], 
-        buffer_size = option['buffer_size'])
-        
-    network = Network(
-        n_channel = option['n_channel'], 
-        n_classes = option['n_classes'], 
-        image_x_size = option['image_x_size'], 
-        image_y_size = option['image_y_size'],
-        max_objects = option['max_objects'], 
-        cell_x_size = option['cell_x_size'], 
-        cell_y_size = option['cell_y_size'], 
-        pool_mode = option['pool_mode'],
-        box_per_cell = option['n_boxes'], 
-        batch_size = option['batch_size'],
-        object_scale = option['object_scale'], 
-        noobject_scale = option['noobject_scale'], 
-        coord_scale = option['coord_scale'], 
-        class_scale = option['class_scale'],
-        noobject_thresh = 0.6, 
-        recall_thresh = 0.6, 
-        pred_thresh = 0.5, 
-        nms_thresh = 0.4,
-        is_weight_decay = option['is_weight_decay'],
-        weight_decay_scale = option['weight_decay'])
-    
-    model = Model(
-        n_channel = option['n_channel'], 
-        max_objects = option['max_objects'],
-        image_x_size = option['image_x_size'], 
-        image_y_size = option['image_y_size'], 
-        cell_x_size = option['cell_x_size'], 
-        cell_y_size = option['cell_y_size'],
-        n_classes = option['n_classes'],
-        box_per_cell = option['n_boxes'], 
-        batch_size = option['batch_size'],
-        buffer_size = option['buffer_size'],
-        is_valid = option['is_valid'], 
-        update_function = option['update_function'], 
-        learning_rate = option['learning_rate'],
-        is_lr_decay = option['is_lr_decay'],
-        is_observe = option['is_observe']) 
-    
-    if method == 'train':
-        # 训练模型
-        train_image_paths_file = os.path.join(data_dir, 'datasets', option['train_data'], 'train.txt')
-        test_image_paths_file = os.path.join(data_dir, 'datasets', option['test_data'], 'valid.txt')
-        traineval_image_paths_file = os.path.join(data_dir, 'datasets', option['test_data'], 'traineval.txt')
-        processor.init_datasets(mode='train',
-            train_image_paths_file=train_image_paths_file, 
-            test_image_paths_file=test_image_paths_file,
-            traineval_image_paths_file=traineval_image_paths_file)
-        
-        # 设置数据池，processor负责生产dataset，model负责消费dataset
-        producers = []
-        for i in range(option['n_processes']):
-            producer = mp.Process(
-                target=processor.dataset_producer_based_shm, args=(i,), name='producer%d' % (i))
-            producers.append(producer)
-        # 在CPU中运行生产者
-        os.environ['CUDA_VISIBLE_DEVICES'] = ''
-        for producer in producers:
-            producer.start()
-        # 在GPU中运行消费者
-        os.environ['CUDA_VISIBLE_DEVICES'] = gpus
-        model.train(
-            processor, network, 
-            backup_dir=os.path.join(data_dir, 'backup', option['seq']), 
-            logs_dir=os.path.join(data_dir, 'logs', option['seq']), 
-            n_iters=option['n_iter'])
-        
-    elif method == 'test':
-        # 测试某一个已经训练好的模型
-        test_image_paths_files=[os.path.join(data_dir, 'datasets', option['datas'][-1], 'test_tensor.txt')]
-        processor.init_datasets(mode='test', test_image_paths_files=test_image_paths_files)
-        os.environ['CUDA_VISIBLE_DEVICES'] = ''
-        model_path = os.path.join(store_dir, 'backup', option['seq'], option['sub_dir'], option['model'])
-        model.test_model(
-            processor=processor, network=network, model_path=model_path,
-            output_dir=os.path.join(store_dir, 'logs', option['seq']))
-
-
-if __name__ == '__main__':
-    print('current process id: %d' % (os.getpid()))
-    parser = argparse.ArgumentParser(description='parsing command parameters')
-    parser.add_argument('-method')
-    parser.add_argument('-gpus')
-    parser.add_argument('-name')
-    arg = parser.parse_args()
-    method = arg.method
-    gpus = arg.gpus if arg.gpus else ''
-    main(method=method, gpus=gpus)
+# -*- coding: utf8 -*-
+# author: ronniecao
+# time: 2018/03/10
+# description: start script
+from __future__ import print_function
+import sys
+import argparse
+import os
+import platform
+import collections
+import random
+import numpy
+import multiprocessing as mp
+from multiprocessing.sharedctypes import Array
+from ctypes import c_double, cast, POINTER
+os.environ['CUDA_DEVICE_ORDER'] = 'PCI_BUS_ID'
+
+if 'Windows' in platform.platform():
+    store_dir = 'E:\Github\\table-detection\\'
+elif 'Linux' in platform.platform():
+    data_dir = '/home/caory/github/yolo-tensorflow/'
+
+
+def main(method='train', gpus=''):
+    from src.data.data_basic import Processor
+    from src.data.producer_pool import ProducerPool
+    from src.network.network_basic import Network
+    from src.model.model_basic import Model
+   
+    option = collections.OrderedDict()
+    option['batch_size'] = 32
+    option['image_x_size'] = 448
+    option['image_y_size'] = 448
+    option['n_channel'] = 3
+    option['n_classes'] = 20
+    option['cell_x_size'] = 7
+    option['cell_y_size'] = 7
+    option['pool_mode'] = 'max'
+    option['n_boxes'] = 5
+    option['n_processes'] = 2
+    option['max_objects'] = 30
+    option['n_iter'] = 200000
+    option['buffer_size'] = 5
+    option['image_cache_size'] = 1024
+    # letterbox缓存的目录，例如os.path.join(data_dir, 'datasets', 'cache')，None时不使用缓存
+    # 第一次运行时解码所有图片，为每个数据集写一个letterbox之后的uint8文件，之后生产者直接读取，不再解码
+    option['letterbox_cache_dir'] = None
+    # 读取标签清单时检查每个Labels/*.txt是否在写入清单之后改变，改变时重新生成清单，
+    # 每张图片多一次文件状态的读取，在网络文件系统上较慢，只在修改过标签之后打开
+    option['is_check_labels'] = False
+    # 生产者写入shared_memory的图片类型，float32：在生产者中除以255，uint8：传输原始像素，在图中转换和缩放，
+    # shared_memory中图片占用的空间和带宽小很多
+    option['image_dtype'] = 'float32'
+    # 类别标签的形式，False：one-hot的class_true，True：整数类别，在图中展开为one-hot，标签小很多，
+    # 但一个cell中的物体超过max_objects-1个时只保留最后一个物体的类别，与one-hot的结果不同
+    option['is_sparse_class'] = False
+    option['seed'] = 0
+    option['n_loaders'] = 8
+    # 训练集的数据增强，例如['random_resize', 'flip']，None时不做增强
+    # 第一个增强是random_resize时训练集不再使用letterbox缓存
+    option['augmentations'] = None
+    # lazy：每个生产者按需解码并缓存image_cache_size MB，arena：启动时把训练集全部解码到共享内存，
+    # 只适合能完整放进内存的数据集，启动时间和内存占用与训练集大小成正比
+    option['image_store_mode'] = 'lazy'
+    option['input_mode'] = 'feed'
+    # 按宽高比分桶的输入尺寸，例如[(448, 448), (320, 448), (448, 320)]，None时所有图片都letterbox到正方形
+    # 宽和高必须是网络步长64的整数倍，每个尺寸的cell个数为宽和高除以64，例如320x448对应5x7个cell，需要head为conv
+    option['bucket_sizes'] = None
+    # 多尺度训练时每个batch随机选择的输入宽度，例如[320, 384, 448]，必须是网络步长64的整数倍，需要head为conv
+    option['image_scales'] = None
+    # 验证和测试时的输入尺寸，例如低延迟时使用(320, 320)，None时使用image_x_size x image_y_size，
+    # 与默认尺寸不同时需要head为conv
+    option['inference_size'] = None
+    # anchor box的分配方式，network：在loss中计算，producer：生产者在CPU上计算好目标
+    option['assign_mode'] = 'network'
+    # 检测头，dense：两层全连接，只支持默认的输入尺寸，conv：1x1卷积，参数量和计算量小很多，输出的网格随输入尺寸变化
+    option['head'] = 'dense'
+    # 骨干网络的配置，每一层一个dict，格式见src/network/backbone.py，None时使用默认的YOLO_BACKBONE
+    option['backbone'] = None
+    option['heartbeat_timeout'] = 120.0
+    option['stall_timeout'] = 60.0
+    option['gpus'] = gpus
+    option['n_gpus'] = len(gpus.split(',')) if len(gpus.split(',')) != 0 else 1
+    option['is_multigpu'] = True if option['n_gpus'] > 1 else False
+    option['is_valid'] = False
+    option['noobject_scale'] = 0.5
+    option['object_scale'] = 1
+    option['coord_scale'] = 5
+    option['class_scale'] = 1
+    option['is_weight_decay'] = False
+    option['weight_decay'] = 1e-3
+    option['learning_rate'] = 1e-4
+    option['is_lr_decay'] = False
+    option['train_data'] = 'voc'
+    option['test_data'] = 'voc'
+    option['seq'] = 'voc-v1'
+    option['model'] = 'model_best.ckpt'
+    option['update_function'] = 'momentum'
+    option['is_observe'] = True
+    
+    # 打印option
+    print()
+    for key in option:
+        print('%-20s' % (key), '= {}'.format(option[key]))
+    print()
+    
+    processor = Processor(
+        image_x_size = option['image_x_size'], 
+        image_y_size = option['image_y_size'], 
+        max_objects = option['max_objects'], 
+        n_classes = option['n_classes'],
+        cell_x_size = option['cell_x_size'], 
+        cell_y_size = option['cell_y_size'],
+        n_boxes = option['n_boxes'],
+        batch_size = option['batch_size'], 
+        n_channel = option['n_channel'],
+        n_processes = option['n_processes'], 
+        n_iters = option['n_iter'], 
+        buffer_size = option['buffer_size'],
+        image_cache_size = option['image_cache_size'],
+        letterbox_cache_dir = option['letterbox_cache_dir'],
+        is_check_labels = option['is_check_labels'],
+        image_dtype = option['image_dtype'],
+        is_sparse_class = option['is_sparse_class'],
+        seed = option['seed'],
+        n_loaders = option['n_loaders'],
+        augmentations = option['augmentations'],
+        image_store_mode = option['image_store_mode'],
+        bucket_sizes = option['bucket_sizes'],
+        image_scales = option['image_scales'],
+        assign_mode = option['assign_mode'])
+        
+    network = Network(
+        n_channel = option['n_channel'], 
+        n_classes = option['n_classes'], 
+        image_x_size = option['image_x_size'], 
+        image_y_size = option['image_y_size'],
+        max_objects = option['max_objects'], 
+        cell_x_size = option['cell_x_size'], 
+        cell_y_size = option['cell_y_size'], 
+        pool_mode = option['pool_mode'],
+        box_per_cell = option['n_boxes'], 
+        batch_size = option['batch_size'],
+        object_scale = option['object_scale'], 
+        noobject_scale = option['noobject_scale'], 
+        coord_scale = option['coord_scale'], 
+        class_scale = option['class_scale'],
+        noobject_thresh = 0.6, 
+        recall_thresh = 0.6, 
+        pred_thresh = 0.5, 
+        nms_thresh = 0.4,
+        is_weight_decay = option['is_weight_decay'],
+        weight_decay_scale = option['weight_decay'],
+        input_sizes = processor.input_sizes,
+        assign_mode = option['assign_mode'],
+        head = option['head'],
+        backbone = option['backbone'])
+    
+    model = Model(
+        n_channel = option['n_channel'], 
+        max_objects = option['max_objects'],
+        image_x_size = option['image_x_size'], 
+        image_y_size = option['image_y_size'], 
+        cell_x_size = option['cell_x_size'], 
+        cell_y_size = option['cell_y_size'],
+        n_classes = option['n_classes'],
+        box_per_cell = option['n_boxes'], 
+        batch_size = option['batch_size'],
+        buffer_size = option['buffer_size'],
+        is_valid = option['is_valid'], 
+        update_function = option['update_function'], 
+        learning_rate = option['learning_rate'],
+        is_lr_decay = option['is_lr_decay'],
+        is_observe = option['is_observe'],
+        image_dtype = option['image_dtype'],
+        is_sparse_class = option['is_sparse_class'],
+        input_mode = option['input_mode'],
+        input_sizes = processor.input_sizes,
+        inference_size = option['inference_size'],
+        assign_mode = option['assign_mode']) 
+    
+    if method == 'train':
+        # 训练模型
+        train_image_paths_file = os.path.join(data_dir, 'datasets', option['train_data'], 'train.txt')
+        test_image_paths_file = os.path.join(data_dir, 'datasets', option['test_data'], 'valid.txt')
+        traineval_image_paths_file = os.path.join(data_dir, 'datasets', option['test_data'], 'traineval.txt')
+        processor.init_datasets(mode='train',
+            train_image_paths_file=train_image_paths_file, 
+            test_image_paths_file=test_image_paths_file,
+            traineval_image_paths_file=traineval_image_paths_file)
+        
+        # 设置数据池，processor负责生产dataset，model负责消费dataset
+        # 生产者在CPU中运行，由producer_pool的监督进程启动、监控和重启，监督进程必须在model创建tf.Session之前启动
+        producer_pool = ProducerPool(
+            target=processor.dataset_producer_based_shm, 
+            n_processes=option['n_processes'],
+            env={'CUDA_VISIBLE_DEVICES': ''},
+            heartbeat_timeout=option['heartbeat_timeout'])
+        producer_pool.start()
+        # 在GPU中运行消费者，训练结束或出错时关闭生产者
+        os.environ['CUDA_VISIBLE_DEVICES'] = gpus
+        try:
+            model.train(
+                processor, network, 
+                backup_dir=os.path.join(data_dir, 'backup', option['seq']), 
+                logs_dir=os.path.join(data_dir, 'logs', option['seq']), 
+                n_iters=option['n_iter'],
+                producer_pool=producer_pool,
+                stall_timeout=option['stall_timeout'])
+        finally:
+            producer_pool.stop()
+        
+    elif method == 'test':
+        # 测试某一个已经训练好的模型
+        test_image_paths_files=[os.path.join(data_dir, 'datasets', option['datas'][-1], 'test_tensor.txt')]
+        processor.init_datasets(mode='test', test_image_paths_files=test_image_paths_files)
+        os.environ['CUDA_VISIBLE_DEVICES'] = ''
+        model_path = os.path.join(store_dir, 'backup', option['seq'], option['sub_dir'], option['model'])
+        model.test_model(
+            processor=processor, network=network, model_path=model_path,
+            output_dir=os.path.join(store_dir, 'logs', option['seq']))
+
+
+if __name__ == '__main__':
+    print('current process id: %d' % (os.getpid()))
+    parser = argparse.ArgumentParser(description='parsing command parameters')
+    parser.add_argument('-method')
+    parser.add_argument('-gpus')
+    parser.add_argument('-name')
+    arg = parser.parse_args()
+    method = arg.method
+    gpus = arg.gpus if arg.gpus else ''
+    main(method=method, gpus=gpus)
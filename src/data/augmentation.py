@@ -0,0 +1,190 @@
+# -*- coding: utf8 -*-
+# description: batch data augmentation in object detection
+from __future__ import print_function
+import time
+import numpy
+import cv2
+
+
+"""
+随机缩放类：随机改变宽高比(jitter)和缩放尺度(scale)，再随机平移到输出画布中，超出的部分被裁剪
+输入原始图片的list，输出固定尺寸的batch，替代letterbox
+"""
+class RandomResize:
+
+    name = 'random_resize'
+    is_resize = True
+
+    def __init__(self, image_x_size, image_y_size, jitter=0.2, min_scale=0.8, max_scale=1.2):
+        """
+        输入1：image_x_size, image_y_size - 输出图片的尺寸，调用时以out的尺寸为准
+        输入2：jitter - 宽和高分别在[-jitter, jitter]的比例内随机变化
+        输入3：min_scale, max_scale - 长边相对于输出尺寸的缩放范围
+        """
+        self.image_x_size = image_x_size
+        self.image_y_size = image_y_size
+        self.jitter = jitter
+        self.min_scale = min_scale
+        self.max_scale = max_scale
+
+    def __call__(self, batch_images, batch_labels, out, random_state=numpy.random):
+        """
+        输入1：batch_images - 原始图片的list
+        输入2：batch_labels - 原始标签，尺寸(batch_size, max_objects, 5)
+        输入3：out - 预先分配的uint8数组，尺寸(batch_size, image_y_size, image_x_size, 3)
+        输出1：out - 增强之后的图片
+        输出2：new_batch_labels - 变换后的标签，裁剪掉的物体被移除，剩下的物体排在前面
+        """
+        n = len(batch_images)
+        image_y_size, image_x_size = out.shape[1], out.shape[2]
+        orig_sizes = numpy.array([[image.shape[1], image.shape[0]] for image in batch_images],
+            dtype='float64')
+
+        # 随机宽高比和缩放尺度，先像letterbox一样放入输出画布，再缩放scale倍
+        jitters = random_state.uniform(-self.jitter, self.jitter, size=(n, 2))
+        new_ar = orig_sizes[:,0] * (1.0 + jitters[:,0]) / (orig_sizes[:,1] * (1.0 + jitters[:,1]))
+        scales = random_state.uniform(self.min_scale, self.max_scale, size=(n, ))
+        is_tall = new_ar < 1.0 * image_x_size / image_y_size
+        new_w = numpy.where(is_tall, scales * image_y_size * new_ar, scales * image_x_size)
+        new_h = numpy.where(is_tall, scales * image_y_size, scales * image_x_size / new_ar)
+        new_w = numpy.maximum(new_w.astype('int64'), 1)
+        new_h = numpy.maximum(new_h.astype('int64'), 1)
+
+        # 随机平移，缩放后的图片比画布小时是放置的位置，比画布大时是裁剪的位置（为负数）
+        dx = (random_state.random_sample(n) * (image_x_size - new_w)).astype('int64')
+        dy = (random_state.random_sample(n) * (image_y_size - new_h)).astype('int64')
+
+        # 缩放、平移、裁剪和填充由一次warpAffine完成，直接写入out，像素中心的对齐方式与cv2.resize相同
+        for i, image in enumerate(batch_images):
+            sx = 1.0 * new_w[i] / orig_sizes[i,0]
+            sy = 1.0 * new_h[i] / orig_sizes[i,1]
+            matrix = numpy.array([
+                [sx, 0.0, dx[i] + 0.5 * sx - 0.5],
+                [0.0, sy, dy[i] + 0.5 * sy - 0.5]], dtype='float64')
+            target = out[i]
+            warped_image = cv2.warpAffine(image, matrix, (image_x_size, image_y_size),
+                dst=target, flags=cv2.INTER_LINEAR,
+                borderMode=cv2.BORDER_CONSTANT, borderValue=(128, 128, 128))
+            if warped_image is not target:
+                target[:] = warped_image
+
+        # 整个batch的框一起变换，先转成左上右下的坐标并裁剪到画布内
+        batch_labels = numpy.array(batch_labels, dtype='float32')
+        is_object = get_object_mask(batch_labels)
+        x, y, w, h = [numpy.array(batch_labels[:,:,k], dtype='float64') for k in range(1, 5)]
+        new_w, new_h = new_w[:,None], new_h[:,None]
+        left = ((x - w / 2.0) * new_w + dx[:,None]) / image_x_size
+        right = ((x + w / 2.0) * new_w + dx[:,None]) / image_x_size
+        top = ((y - h / 2.0) * new_h + dy[:,None]) / image_y_size
+        bottom = ((y + h / 2.0) * new_h + dy[:,None]) / image_y_size
+        left, right = numpy.clip(left, 0.0, 1.0), numpy.clip(right, 0.0, 1.0)
+        top, bottom = numpy.clip(top, 0.0, 1.0), numpy.clip(bottom, 0.0, 1.0)
+        is_object = is_object & (right > left) & (bottom > top)
+
+        new_batch_labels = numpy.zeros(batch_labels.shape, dtype='float32')
+        new_batch_labels[:,:,0] = batch_labels[:,:,0]
+        new_batch_labels[:,:,1] = (left + right) / 2.0
+        new_batch_labels[:,:,2] = (top + bottom) / 2.0
+        new_batch_labels[:,:,3] = right - left
+        new_batch_labels[:,:,4] = bottom - top
+
+        return out, compact_labels(new_batch_labels, is_object)
+
+
+"""
+随机翻转类：每张图片以prob的概率水平翻转，在固定尺寸的batch上原地进行
+"""
+class RandomFlip:
+
+    name = 'flip'
+    is_resize = False
+
+    def __init__(self, prob=0.5):
+        self.prob = prob
+
+    def __call__(self, batch_images, batch_labels, out=None, random_state=numpy.random):
+        """
+        输入1：batch_images - 固定尺寸的图片，尺寸(batch_size, image_y_size, image_x_size, 3)，原地修改
+        输入2：batch_labels - 标签，尺寸(batch_size, max_objects, 5)
+        输出1：batch_images - 翻转之后的图片
+        输出2：new_batch_labels - 翻转之后的标签
+        """
+        is_flip = random_state.random_sample(len(batch_images)) < self.prob
+        for i in numpy.nonzero(is_flip)[0]:
+            target = batch_images[i]
+            flipped_image = cv2.flip(target, 1, dst=target)
+            if flipped_image is not target:
+                target[:] = flipped_image
+
+        new_batch_labels = numpy.array(batch_labels, dtype='float32')
+        is_object = get_object_mask(new_batch_labels) & is_flip[:,None]
+        new_batch_labels[:,:,1] = numpy.where(is_object, 1.0 - new_batch_labels[:,:,1], new_batch_labels[:,:,1])
+
+        return batch_images, new_batch_labels
+
+
+"""
+数据增强类：按顺序执行多个增强，统计每个增强的耗时
+stages中的每一个元素是名字（random_resize/flip）或者有name、is_resize属性的可调用对象
+第一个增强is_resize为True时，它负责把原始图片变成固定尺寸的batch，否则先做letterbox
+"""
+class Augmentation:
+
+    def __init__(self, stages, image_x_size, image_y_size):
+        self.stages = []
+        for stage in stages:
+            if stage == 'random_resize':
+                stage = RandomResize(image_x_size, image_y_size)
+            elif stage == 'flip':
+                stage = RandomFlip()
+            self.stages.append(stage)
+        for stage in self.stages[1:]:
+            if stage.is_resize:
+                raise('ERROR: resize augmentation must be the first stage!')
+        self.is_resize = len(self.stages) > 0 and self.stages[0].is_resize
+
+        self.timings = dict((stage.name, 0.0) for stage in self.stages)
+        self.n_batches = 0
+
+    def __call__(self, batch_images, batch_labels, out, random_state=numpy.random):
+        """
+        输入1：batch_images - is_resize时为原始图片的list，否则为letterbox之后的batch
+        输入2：batch_labels - 标签，尺寸(batch_size, max_objects, 5)
+        输入3：out - 预先分配的uint8数组，尺寸(batch_size, image_y_size, image_x_size, 3)
+        输出1：batch_images - 增强之后的图片
+        输出2：batch_labels - 增强之后的标签
+        """
+        for stage in self.stages:
+            st = time.time()
+            batch_images, batch_labels = stage(batch_images, batch_labels, out, random_state=random_state)
+            self.timings[stage.name] += time.time() - st
+        self.n_batches += 1
+
+        return batch_images, batch_labels
+
+    def get_timings(self):
+        """
+        每个增强平均每个batch的耗时（毫秒）
+        """
+        return [(stage.name, 1000.0 * self.timings[stage.name] / max(self.n_batches, 1)) \
+            for stage in self.stages]
+
+
+def get_object_mask(batch_labels):
+    """
+    第一个空物体之前的物体为有效物体
+    """
+    is_object = numpy.any(batch_labels[:,:,1:5] != 0, axis=2)
+    return numpy.cumprod(is_object, axis=1).astype('bool')
+
+def compact_labels(batch_labels, is_object):
+    """
+    把有效物体按原来的顺序排到前面，其余位置清零
+    """
+    order = numpy.argsort(~is_object, axis=1, kind='mergesort')
+    b_idx = numpy.arange(batch_labels.shape[0])[:,None]
+    new_batch_labels = batch_labels[b_idx, order]
+    is_object = is_object[b_idx, order]
+    new_batch_labels[~is_object] = 0
+
+    return new_batch_labels
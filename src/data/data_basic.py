@@ -1,511 +1,1301 @@
-# -*- coding: utf8 -*-
-# author: ronniecao
-# time: 2018/03/10
-# description: data processing module in object detection
-from __future__ import print_function
-import sys
-import os
-import time
-import json
-import math
-import numpy
-import random
-import platform
-import cv2
-import multiprocessing as mp
-from multiprocessing.sharedctypes import Array, Value
-from ctypes import c_double, cast, POINTER
-
-"""
-数据处理类：对数据进行预处理、数据扩增等过程
-"""
-class Processor:
-    
-    def __init__(self, 
-        image_x_size, 
-        image_y_size, 
-        max_objects,
-        n_classes, 
-        cell_x_size, 
-        cell_y_size,
-        n_boxes,
-        batch_size, 
-        n_channel, 
-        n_processes, 
-        n_iters, 
-        buffer_size):
-
-        # 参数赋值
-        self.image_x_size = image_x_size
-        self.image_y_size = image_y_size
-        self.max_objects = max_objects
-        self.n_classes = n_classes + 1
-        self.cell_x_size = cell_x_size
-        self.cell_y_size = cell_y_size
-        self.n_boxes = n_boxes
-        self.batch_size = batch_size
-        self.n_channel = n_channel
-        self.n_processes = n_processes
-        self.n_iters = n_iters
-        self.buffer_size = buffer_size
-        
-        self.index_size = (self.batch_size)
-        self.image_size = (self.batch_size, self.image_y_size, self.image_x_size, 3)
-        self.coord_true_size = (self.batch_size, self.cell_y_size, self.cell_x_size, self.max_objects, 4)
-        self.object_mask_size = (self.batch_size, self.cell_y_size, self.cell_x_size, self.max_objects)
-        self.class_true_size = (self.batch_size, self.cell_y_size, self.cell_x_size, self.max_objects, self.n_classes)
-        self.unpos_coord_true_size = (self.batch_size, self.max_objects, 4)
-        self.unpos_object_mask_size = (self.batch_size, self.max_objects)
-        self.object_nums_size = (self.batch_size, self.cell_y_size, self.cell_x_size)
-        
-        self.dataset_size = sum([numpy.prod(t) for t in [
-            self.index_size, self.image_size, self.coord_true_size,
-            self.object_mask_size, self.class_true_size, 
-            self.unpos_coord_true_size, self.unpos_object_mask_size, 
-            self.object_nums_size]])
-        
-        
-    def init_datasets(self, mode, train_image_paths_file=None,
-        test_image_paths_file=None, traineval_image_paths_file=None): 
-        """
-        初始化数据集
-        输入1：mode - 训练/验证/测试/应用
-        输入2：train_image_paths_file - 训练数据图片存储的路径文件
-        输入3：test_image_paths_file - 测试数据图片存储的路径文件
-        """
-        # 根据mode进行image_processor的初始化，并判断参数是否出错
-        if mode == 'train':
-            if train_image_paths_file is None and test_image_paths_file is None and \
-                traineval_image_paths_file is None:
-                raise('ERROR: wrong parameters in initialization!')
-        elif mode == 'test':
-            if test_image_paths_file is None:
-                raise('ERROR: wrong parameters in initialization!')
-        else:
-            raise('ERROR: wrong mode in initialization!')
-
-        if mode == 'train':
-            self.load_datasets('train', image_paths_file=train_image_paths_file)
-            self.load_datasets('valid', image_paths_file=test_image_paths_file)
-            self.load_datasets('traineval', image_paths_file=traineval_image_paths_file)
-            self.shared_memory = SharedMemory(self.buffer_size, self.dataset_size)
-            print('finish apply shared memory ...')
-            sys.stdout.flush()
-        elif mode == 'test':
-            self.load_datasets('test', image_paths_file=test_image_paths_file)
-    
-    def load_datasets(self, mode, image_paths_file=None, items=None):
-        """
-        读取数据集
-        输入1：mode - 训练/验证/测试/应用
-        输入2：image_paths_files - 数据图片存储的路径文件
-        输入3：items - 数据的list，每一个元素是一个数据item
-        """
-        # 在训练/验证/测试/应用不同模式下读取datasets
-        datasets = []
-        
-        # 判断参数是否出错
-        if mode in ['train', 'valid', 'test', 'traineval']:
-            if image_paths_file is None:
-                raise('ERROR: wrong parameters in load_datasets!')
-        else:
-            raise('ERROR: wrong mode in load_datasets!')
-
-        if mode == 'train':
-            datasets = self.init_subdataset(image_paths_file)
-            self.trainsets = datasets
-            self.n_train = len(self.trainsets)
-            print('number of train images: %d' % (self.n_train))
-        elif mode == 'valid':
-            datasets = self.init_subdataset(image_paths_file)
-            self.validsets = datasets
-            self.n_valid = len(self.validsets)
-            print('number of valid images: %d' % (self.n_valid))
-        elif mode == 'traineval':
-            datasets = self.init_subdataset(image_paths_file)
-            self.trainevalsets = datasets
-            self.n_traineval = len(self.trainevalsets)
-        elif mode == 'test':
-            datasets = self.init_subdataset(image_paths_file)
-            self.testsets = datasets
-            self.n_test = len(self.testsets)
-            print('number of test images: %d' % (self.n_test))
-
-    def init_subdataset(self, image_paths_file):
-        datasets = []
-        image_infos = self._load_image_paths_from_file(image_paths_file)
-                
-        # 组织datasets, datasets是一个item的list
-        for i in range(len(image_infos)):
-            [image_path, image_name] = image_infos[i]
-            label_path = image_path.replace('Images', 'Labels')
-            label_path = label_path.replace('.jpg', '.txt')
-           
-            item = {'image_name': image_name, 'image_path': image_path, 'label_path': label_path}
-            item['label'] = self._get_label_from_path(item['label_path'])
-            item['image'] = self._get_image_from_path(item['image_path'])
-            
-            datasets.append(item)
-        
-        return datasets
-               
-    def dataset_producer_based_shm(self, produce_index=0):
-        """
-        基于共享内存的方法生产数据
-        """
-        i_basic, i_adapt = 0, 0
-        while True:
-            batch_indexs, batch_images, batch_labels = \
-                self.get_random_batch(self.trainsets, self.batch_size)
-     
-            batch_indexs = numpy.array(batch_indexs, dtype='float32')
-            batch_images, batch_labels = self.convert_batch_infos(batch_images, batch_labels)
-            batch_images = numpy.array(batch_images / 255.0, dtype='float32')
-            
-            # 数据增强
-            batch_coord_true, batch_object_mask, batch_class_true, \
-                batch_unpos_coord_true, batch_unpos_object_mask, batch_object_nums = \
-                self.convert_batch_labels(batch_labels)
-            
-            # 改变尺寸存入shared_memory
-            batch_indexs = batch_indexs.flatten()
-            batch_images = batch_images.flatten()
-            batch_coord_true = batch_coord_true.flatten()
-            batch_object_mask = batch_object_mask.flatten()
-            batch_class_true = batch_class_true.flatten()
-            batch_unpos_coord_true =  batch_unpos_coord_true.flatten()
-            batch_unpos_object_mask = batch_unpos_object_mask.flatten()
-            batch_object_nums = batch_object_nums.flatten()
-            
-            dataset = numpy.concatenate([
-                batch_indexs, batch_images, batch_coord_true, batch_object_mask, batch_class_true,
-                batch_unpos_coord_true, batch_unpos_object_mask, batch_object_nums], axis=0)
-            self.shared_memory.put(dataset)
-            
-    def get_random_batch(self, datasets, batch_size):
-        """
-        获取随机一个batch的数据
-        输入1：datasets - 整个数据集
-        输入2：batch_size - 该batch的大小
-        输出1：batch_indexs - 每条数据在整个数据集中的index
-        输出2：batch_images - 每条数据的图片
-        输出3：batch_labels - 每条数据的标签
-        """
-        batch_indexs, batch_images, batch_labels = [], [], []
-       
-        for i in range(batch_size):
-            valid_indexs = range(self.n_train)
-            index = random.choice(valid_indexs)
-            item = datasets[index]
-            image = item['image']
-            label = item['label']
-            batch_indexs.append(index)
-            batch_images.append(image)
-            batch_labels.append(label)
-        
-        return batch_indexs, batch_images, batch_labels
-
-    def dataset_producer(self, mode, indexs):
-        # 直接从内存获取一个batch的数据
-        if mode == 'train':
-            dictionary = copy.deepcopy(self.trainevalsets)
-        elif mode == 'valid':
-            dictionary = copy.deepcopy(self.validsets)
-        elif mode == 'test':
-            dictionary = copy.deepcopy(self.testsets)
-
-        batch_images, batch_datasets = [], []
-        for index in indexs:
-            batch_images.append(dictionary[index]['image'])
-            batch_datasets.append(dictionary[index])
-        
-        batch_images = self.convert_batch_infos(batch_images)
-        batch_images = numpy.array(batch_images / 255.0, dtype='float32')
-        return batch_images, batch_datasets
-
-    def convert_batch_infos(self, batch_images, batch_labels=None):
-        """
-        将一个batch的images从list转化成numpy.array
-        """
-        new_batch_images, new_batch_labels = [], []
-
-        for i, image in enumerate(batch_images):
-            # images
-            orig_h, orig_w = image.shape[0], image.shape[1]
-            canvas_image = numpy.zeros((self.image_y_size, self.image_x_size, 3), dtype='uint8') + 128
-            if 1.0 * orig_h / orig_w >= 1.0 * self.image_y_size / self.image_x_size:
-                new_h = int(round(self.image_y_size))
-                new_w = int(round(1.0 * orig_w / orig_h * new_h))
-                resized_image = cv2.resize(image, (new_w, new_h))
-                start_x = int((self.image_x_size - new_w) / 2.0)
-                canvas_image[:, start_x: start_x+new_w, :] = resized_image
-            else:
-                new_w = int(round(self.image_x_size))
-                new_h = int(round(1.0 * orig_h / orig_w * new_w))
-                resized_image = cv2.resize(image, (new_w, new_h))
-                start_y = int((self.image_y_size - new_h) / 2.0)
-                canvas_image[start_y: start_y+new_h, :, :] = resized_image
-            new_batch_images.append(canvas_image)
-            
-            # labels
-            if batch_labels:
-                new_label = batch_labels[i]
-                if 1.0 * orig_h / orig_w >= 1.0 * self.image_y_size / self.image_x_size:
-                    new_h = int(round(self.image_y_size))
-                    new_w = int(round(1.0 * orig_w / orig_h * new_h))
-                    for j in range(self.max_objects):
-                        [index, x, y, w, h] = batch_labels[i][j]
-                        if x == 0 and y == 0 and w == 0 and h == 0:
-                            break
-                        x = 1.0 * (x * new_w + (self.image_x_size - new_w) / 2.0) / self.image_x_size
-                        y = y
-                        w = 1.0 * w * new_w / self.image_x_size
-                        h = h
-                        new_label[j] = [index, x, y, w, h]
-                else:
-                    new_w = int(round(self.image_x_size))
-                    new_h = int(round(1.0 * orig_h / orig_w * new_w))
-                    for j in range(self.max_objects):
-                        [index, x, y, w, h] = batch_labels[i][j]
-                        if x == 0 and y == 0 and w == 0 and h == 0:
-                            break
-                        x = x
-                        y = 1.0 * (y * new_h + (self.image_y_size - new_h) / 2.0) / self.image_y_size
-                        w = w
-                        h = 1.0 * h * new_h / self.image_y_size
-                        new_label[j] = [index, x, y, w, h]
-                new_batch_labels.append(new_label)
-
-        new_batch_images = numpy.array(new_batch_images, dtype='float32')
-        if batch_labels:
-            new_batch_labels = numpy.array(new_batch_labels, dtype='float32')
-            return new_batch_images, new_batch_labels
-        else:
-            return new_batch_images
-
-    def convert_batch_labels(self, batch_labels):
-        """
-        将一个batch的label从list转化成numpy.array
-        """
-        batch_coord_true, batch_object_mask, batch_class_true, batch_unpos_coord_true, \
-            batch_unpos_object_mask, batch_object_nums = [], [], [], [], [], []
-            
-        for i in range(len(batch_labels)):
-            coord_true, object_mask, class_true, unpos_coord_true, unpos_object_mask, object_nums = \
-                self._process_label(batch_labels[i])
-            batch_coord_true.append(coord_true)
-            batch_object_mask.append(object_mask)
-            batch_class_true.append(class_true)
-            batch_unpos_coord_true.append(unpos_coord_true)
-            batch_unpos_object_mask.append(unpos_object_mask)
-            batch_object_nums.append(object_nums)
-        
-        batch_coord_true = numpy.array(batch_coord_true, dtype='float32')
-        batch_object_mask = numpy.array(batch_object_mask, dtype='float32')
-        batch_class_true = numpy.array(batch_class_true, dtype='float32')
-        batch_unpos_coord_true = numpy.array(batch_unpos_coord_true, dtype='float32')
-        batch_unpos_object_mask = numpy.array(batch_unpos_object_mask, dtype='float32')
-        batch_object_nums = numpy.array(batch_object_nums, dtype='float32')
-        
-        return batch_coord_true, batch_object_mask, batch_class_true, \
-            batch_unpos_coord_true, batch_unpos_object_mask, batch_object_nums
-
-    def _process_label(self, label):
-        """
-        处理所有network部分所需要的label
-        """
-        coord_true = numpy.zeros(
-            shape=(self.cell_y_size, self.cell_x_size, self.max_objects, 4),
-            dtype='float32')
-        object_mask = numpy.zeros(
-            shape=(self.cell_y_size, self.cell_x_size, self.max_objects),
-            dtype='float32')
-        class_true = numpy.zeros(
-            shape=(self.cell_y_size, self.cell_x_size, self.max_objects, self.n_classes),
-            dtype='float32')
-        unpos_coord_true = numpy.zeros(
-            shape=(self.max_objects, 4),
-            dtype='float32')
-        unpos_object_mask = numpy.zeros(
-            shape=(self.max_objects, ),
-            dtype='float32')
-        object_nums = numpy.zeros(
-            shape=(self.cell_y_size, self.cell_x_size),
-            dtype='int32')
-        
-        for j in range(self.max_objects):
-            
-            [index, in_x, in_y, in_w, in_h] = label[j]
-            index = int(index)
-            
-            if not (in_x == 0.0 and in_y == 0.0 and in_w == 0.0 and in_h == 0.0):
-                # 计算包围框标记
-                center_cell_x = min(int(self.cell_x_size * in_x), self.cell_x_size-1)
-                center_cell_y = min(int(self.cell_y_size * in_y), self.cell_y_size-1)
-                
-                coord_true[center_cell_y, center_cell_x, 
-                    object_nums[center_cell_y, center_cell_x],:] = numpy.array(
-                    [in_x, in_y, in_w, in_h])
-                object_mask[center_cell_y, center_cell_x,
-                    object_nums[center_cell_y, center_cell_x]] = 1.0
-                
-                unpos_coord_true[j,:] = numpy.array([in_x, in_y, in_w, in_h])
-                unpos_object_mask[j] = 1.0
-                
-                class_true[center_cell_y, center_cell_x, 
-                    object_nums[center_cell_y, center_cell_x], index] = 1.0
-
-                if object_nums[center_cell_y, center_cell_x] < self.max_objects-1:
-                    object_nums[center_cell_y, center_cell_x] += 1
-
-        for i in range(self.cell_y_size):
-            for j in range(self.cell_x_size):
-                for n in range(self.max_objects):
-                    if sum(class_true[i,j,n,:]) == 0.0:
-                        class_true[i,j,n,0] = 1.0
-                
-        return coord_true, object_mask, class_true, \
-            unpos_coord_true, unpos_object_mask, object_nums
-
-    def _load_image_paths_from_file(self, image_paths_file):
-        """
-        从文件中读取所有图片的路径
-        输入：image_paths_file - 图片路径文件
-        输出：image_paths - 图片路径list，每一个元素包含图片路径和图片名
-        """
-        image_paths = []
-        
-        with open(image_paths_file, 'r') as fo:
-            for line in fo:
-                image_path = line.strip()
-                if not os.path.exists(image_path):
-                    print(image_path)
-                    raise('ERROR: image path not exists!')
-                file_name = os.path.split(image_path)[1]
-                image_name = os.path.splitext(file_name)[0]
-                image_paths.append([image_path, image_name])
-
-        return image_paths
-
-    def _get_label_from_path(self, label_path):
-        """
-        根据标签路径读取标签
-        输入：label_path_file - 标签路径
-        输出：labels - 图片标签list
-        """
-        new_label = numpy.zeros((self.max_objects, 5), dtype='float32')
-        n_object = 0
-            
-        with open(label_path, 'r') as fo:
-            for line in fo:
-                infos = line.strip().split(' ')
-                
-                index = float(int(infos[0]) + 1)
-                in_x = float(infos[1])
-                in_y = float(infos[2])
-                in_w = float(infos[3])
-                in_h = float(infos[4])
-            
-                new_label[n_object,:] = numpy.array([index, in_x, in_y, in_w, in_h], dtype='float32')
-                n_object += 1
-
-                if n_object >= self.max_objects:
-                    break
-        
-        return new_label
-
-    def _get_image_from_path(self, image_path):
-        image = cv2.imread(image_path)
-        return image
-
-
-"""
-共享内存类：生产者消费者模式下，用于存储和传递数据的共享内存区域
-"""
-class SharedMemory:
-    
-    def __init__(self, buffer_size, dataset_size):
-        self.buffer_size = buffer_size
-        self.dataset_size = dataset_size
-        self.put_index = Value('i', 0)
-        self.get_index = Value('i', 0)
-        self.put_lock = mp.Lock()
-
-        self.cdatasets = Array('d', [0.0] * self.buffer_size * self.dataset_size)
-        self.cbuffer = self.cdatasets._obj._wrapper
-        
-    def put(self, dataset):
-        """
-        将数据写入共享内存
-        输入：dataset - 一个batch的数据（已经flatten）
-        """
-        # 向共享内存中生产数据
-        with self.put_lock:
-            while self.put_index.value - self.get_index.value >= self.buffer_size - 1:
-                time.sleep(0.1)
-            index = self.put_index.value % self.buffer_size
-            buffer_ptr = cast(self.cbuffer.get_address() + index * self.dataset_size * 8, POINTER(c_double))
-            data = numpy.ctypeslib.as_array(buffer_ptr, shape=(self.dataset_size, ))
-            data[:] = dataset
-            self.put_index.value += 1
-
-    def get(self):
-        """
-        从共享内存读取数据
-        输出：data - 一个batch的数据（已经flatten）
-        """
-        # 向共享内存中消费数据
-        while self.put_index.value - self.get_index.value <= 0:
-            time.sleep(0.1)
-        index = self.get_index.value % self.buffer_size
-        buffer_ptr = cast(self.cbuffer.get_address() + index * self.dataset_size * 8, POINTER(c_double))
-        data = numpy.ctypeslib.as_array(buffer_ptr, shape=(self.dataset_size, ))
-        self.get_index.value += 1
-
-        return data
-
-
-"""
-共享区域类：生产者消费者模式下，用于存储和传递数据的共享内存区域
-"""
-class SharedBlock:
-    
-    def __init__(self, dataset_size):
-        self.dataset_size = dataset_size
-        self.index = Value('i', 0)
-        self.get_lock = mp.Lock()
-        self.index_lock = mp.Lock()
-
-        self.cdatasets = Array('d', [0.0] * 2 * self.dataset_size)
-        self.cbuffer = self.cdatasets._obj._wrapper
-
-        init_array = numpy.ones((dataset_size, ), dtype='float32')
-        self.put(init_array)
-        self.put(init_array)
-        
-    def put(self, dataset):
-        """
-        将数据写入共享内存
-        输入：dataset - 写入新的数据
-        """
-        # 向共享内存中生产数据
-        index = self.index.value % 2
-        buffer_ptr = cast(self.cbuffer.get_address() + index * self.dataset_size * 8, POINTER(c_double))
-        data = numpy.ctypeslib.as_array(buffer_ptr, shape=(self.dataset_size, ))
-        data[:] = dataset
-        with self.index_lock:
-            self.index.value += 1
-
-    def get(self):
-        """
-        从共享内存读取数据
-        输出：data - 读取旧的数据
-        """
-        # 向共享内存中消费数据
-        with self.get_lock:
-            with self.index_lock:
-                index = (self.index.value + 1) % 2
-            buffer_ptr = cast(self.cbuffer.get_address() + index * self.dataset_size * 8, POINTER(c_double))
-            data = numpy.ctypeslib.as_array(buffer_ptr, shape=(self.dataset_size, ))
-
-        return data
+# -*- coding: utf8 -*-
+# author: ronniecao
+# time: 2018/03/10
+# description: data processing module in object detection
+from __future__ import print_function
+import sys
+import os
+import time
+import json
+import math
+import errno
+import signal
+import numpy
+import random
+import platform
+import collections
+import cv2
+import multiprocessing as mp
+from multiprocessing.pool import ThreadPool
+from multiprocessing.sharedctypes import Array, Value
+from ctypes import c_double, cast, POINTER
+from src.data.image_store import ImageStore
+from src.data.image_arena import ImageArena
+from src.data.letterbox_cache import LetterboxCache
+from src.data.sampler import EpochSampler, BucketSampler, assign_buckets, get_fill_ratios
+from src.data.label_manifest import LabelManifest, get_manifest_path, build_from_label_files
+from src.data.image_meta import load_meta_index
+from src.data.augmentation import Augmentation
+import src.tools.utils as utils
+
+"""
+数据处理类：对数据进行预处理、数据扩增等过程
+"""
+class Processor:
+    
+    def __init__(self, 
+        image_x_size, 
+        image_y_size, 
+        max_objects,
+        n_classes, 
+        cell_x_size, 
+        cell_y_size,
+        n_boxes,
+        batch_size, 
+        n_channel, 
+        n_processes, 
+        n_iters, 
+        buffer_size,
+        image_cache_size=1024,
+        letterbox_cache_dir=None,
+        is_check_labels=False,
+        image_dtype='float32',
+        is_sparse_class=False,
+        seed=0,
+        n_loaders=8,
+        augmentations=None,
+        image_store_mode='lazy',
+        bucket_sizes=None,
+        image_scales=None,
+        assign_mode='network'):
+
+        # 参数赋值
+        self.image_x_size = image_x_size
+        self.image_y_size = image_y_size
+        self.max_objects = max_objects
+        self.n_classes = n_classes + 1
+        self.cell_x_size = cell_x_size
+        self.cell_y_size = cell_y_size
+        self.n_boxes = n_boxes
+        self.batch_size = batch_size
+        self.n_channel = n_channel
+        self.n_processes = n_processes
+        self.n_iters = n_iters
+        self.buffer_size = buffer_size
+        self.image_cache_size = image_cache_size
+        # 读取标签清单时是否检查每个Labels/*.txt在写入清单之后有没有改变
+        self.is_check_labels = is_check_labels
+        # uint8时生产者直接传输原始像素，归一化在网络中进行
+        self.image_dtype = image_dtype
+        # 稀疏时class_true只保存类别序号，one-hot在网络中展开
+        self.is_sparse_class = is_sparse_class
+        self.seed = seed
+        # 读取数据集时的线程数，cv2解码和文件读取时会释放GIL
+        self.n_loaders = n_loaders
+        
+        # 图片按需解码，image_cache_size为每个进程的缓存大小（MB）
+        self.image_store = ImageStore(max_bytes=int(self.image_cache_size * 1024 * 1024))
+        # arena时训练集的图片在fork生产者之前全部解码到一块共享内存中，所有生产者共用
+        self.image_store_mode = image_store_mode
+        self.image_arena = ImageArena() if self.image_store_mode == 'arena' else None
+        
+        # 训练集的数据增强，在生产者中运行，augmentations为增强的名字或对象的list
+        if augmentations:
+            self.augmentation = Augmentation(augmentations, self.image_x_size, self.image_y_size)
+        else:
+            self.augmentation = None
+        
+        # 不做数据增强时，letterbox的结果不变，可以缓存到磁盘上
+        # 第一个增强是随机缩放时训练集不能使用letterbox缓存，其他数据集仍然使用
+        if letterbox_cache_dir:
+            self.letterbox_cache = LetterboxCache(letterbox_cache_dir, 
+                self.image_x_size, self.image_y_size, self.max_objects)
+        else:
+            self.letterbox_cache = None
+        # 按宽高比分桶时，训练集的每个batch使用所在桶的输入尺寸，bucket_sizes为(image_x_size, image_y_size)的list
+        # 验证集和测试集仍然使用image_x_size和image_y_size
+        self.bucket_sizes = [tuple(size) for size in bucket_sizes] if bucket_sizes else None
+        # 多尺度训练时每个batch随机选择一个尺度，image_scales为image_x_size对应的各个输入宽度，例如[320, 384, 448]
+        # 每个桶的尺寸按相同的比例缩放，并取网络步长的整数倍，网络的步长为输入尺寸除以cell的个数
+        # 每个输入尺寸的cell个数为输入尺寸除以步长，例如448对应7个cell，320对应5个cell
+        self.image_scales = list(image_scales) if image_scales else None
+        self.stride = int(self.image_x_size / self.cell_x_size)
+        base_sizes = self.bucket_sizes if self.bucket_sizes else [(self.image_x_size, self.image_y_size)]
+        for size in base_sizes + [(scale, scale) for scale in (self.image_scales or [])]:
+            if size[0] % self.stride != 0 or size[1] % self.stride != 0:
+                print(size)
+                raise('ERROR: input size must be a multiple of network stride!')
+        if self.image_scales:
+            self.scale_sizes = [[self.get_scale_size(size, scale) for scale in self.image_scales] \
+                for size in base_sizes]
+        else:
+            self.scale_sizes = [[size] for size in base_sizes]
+        # 训练时所有可能的输入尺寸
+        self.input_sizes = sorted(set([size for sizes in self.scale_sizes for size in sizes]))
+        # producer时生产者在CPU上计算每个anchor box负责的物体和回归目标，网络中不再计算
+        # anchor box的尺寸必须和Network中的一致
+        self.assign_mode = assign_mode
+        self.prior_sizes = numpy.array([
+            [1.0, 0.2], [0.8, 0.4], [0.6, 0.6], [0.4, 0.8], [0.2, 1.0]], dtype='float32')
+        self.is_train_cached = self.letterbox_cache is not None and \
+            self.input_sizes == [(self.image_x_size, self.image_y_size)] and \
+            not (self.augmentation and self.augmentation.is_resize)
+        
+        # 共享内存中的图片和网格相关的标签按最大的输入尺寸分配，每个batch只使用起始位置开始的一段，见get_batch_views
+        self.max_x_size = max([size[0] for size in self.input_sizes])
+        self.max_y_size = max([size[1] for size in self.input_sizes])
+        max_shapes = self.get_field_shapes((self.max_x_size, self.max_y_size))
+        self.index_size = (self.batch_size)
+        self.image_size = (self.batch_size, ) + max_shapes['images']
+        self.coord_true_size = (self.batch_size, ) + max_shapes['coord_true']
+        self.object_mask_size = (self.batch_size, ) + max_shapes['object_mask']
+        self.class_true_size = (self.batch_size, ) + max_shapes['class_true']
+        self.unpos_coord_true_size = (self.batch_size, self.max_objects, 4)
+        self.unpos_object_mask_size = (self.batch_size, self.max_objects)
+        self.object_nums_size = (self.batch_size, ) + max_shapes['object_nums']
+        self.anchor_mask_size = (self.batch_size, ) + max_shapes['anchor_mask']
+        self.anchor_coord_size = (self.batch_size, ) + max_shapes['anchor_coord']
+        self.anchor_class_size = (self.batch_size, ) + max_shapes['anchor_class']
+        self.object_coord_size = (self.batch_size, self.max_objects, 4)
+        self.object_cells_size = (self.batch_size, self.max_objects)
+        self.object_anchors_size = (self.batch_size, self.max_objects, self.n_boxes)
+        
+        # 共享内存中一个batch的结构，每个字段有自己的类型和尺寸
+        fields = [
+            ('indexs', 'int32', self.index_size),
+            ('sample_infos', 'int32', (3, )),
+            ('image_shape', 'int32', (2, )),
+            ('images', self.image_dtype, self.image_size),
+            ('coord_true', 'float32', self.coord_true_size),
+            ('object_mask', 'float32', self.object_mask_size),
+            ('class_true', 'int32' if self.is_sparse_class else 'float32', self.class_true_size),
+            ('unpos_coord_true', 'float32', self.unpos_coord_true_size),
+            ('unpos_object_mask', 'float32', self.unpos_object_mask_size),
+            ('object_nums', 'int32', self.object_nums_size)]
+        if self.assign_mode == 'producer':
+            fields += [
+                ('anchor_mask', 'float32', self.anchor_mask_size),
+                ('anchor_coord', 'float32', self.anchor_coord_size),
+                ('anchor_class', 'int32' if self.is_sparse_class else 'float32', self.anchor_class_size),
+                ('object_coord', 'float32', self.object_coord_size),
+                ('object_cells', 'int32', self.object_cells_size),
+                ('object_anchors', 'float32', self.object_anchors_size)]
+        self.batch_schema = BatchSchema(fields)
+        
+        
+    def init_datasets(self, mode, train_image_paths_file=None,
+        test_image_paths_file=None, traineval_image_paths_file=None): 
+        """
+        初始化数据集
+        输入1：mode - 训练/验证/测试/应用
+        输入2：train_image_paths_file - 训练数据图片存储的路径文件
+        输入3：test_image_paths_file - 测试数据图片存储的路径文件
+        """
+        # 根据mode进行image_processor的初始化，并判断参数是否出错
+        if mode == 'train':
+            if train_image_paths_file is None and test_image_paths_file is None and \
+                traineval_image_paths_file is None:
+                raise('ERROR: wrong parameters in initialization!')
+        elif mode == 'test':
+            if test_image_paths_file is None:
+                raise('ERROR: wrong parameters in initialization!')
+        else:
+            raise('ERROR: wrong mode in initialization!')
+
+        if mode == 'train':
+            self.load_datasets('train', image_paths_file=train_image_paths_file)
+            self.load_datasets('valid', image_paths_file=test_image_paths_file)
+            self.load_datasets('traineval', image_paths_file=traineval_image_paths_file)
+            self.shared_memory = SharedMemory(self.buffer_size, self.batch_schema, 
+                n_owners=self.n_processes)
+            # 每个生产者下一个要采样的(epoch, position)，在写入shared_memory时更新，
+            # 重启的生产者从这里继续采样，不会重复已经写入的batch
+            self.sampler_states = Array('l', 2 * self.n_processes, lock=False)
+            print('finish apply shared memory, %.2fMB per batch ...' % (
+                self.batch_schema.nbytes / 1024.0 / 1024.0))
+            sys.stdout.flush()
+        elif mode == 'test':
+            self.load_datasets('test', image_paths_file=test_image_paths_file)
+    
+    def load_datasets(self, mode, image_paths_file=None, items=None):
+        """
+        读取数据集
+        输入1：mode - 训练/验证/测试/应用
+        输入2：image_paths_files - 数据图片存储的路径文件
+        输入3：items - 数据的list，每一个元素是一个数据item
+        """
+        # 在训练/验证/测试/应用不同模式下读取datasets
+        datasets = []
+        st = time.time()
+        
+        # 判断参数是否出错
+        if mode in ['train', 'valid', 'test', 'traineval']:
+            if image_paths_file is None:
+                raise('ERROR: wrong parameters in load_datasets!')
+        else:
+            raise('ERROR: wrong mode in load_datasets!')
+
+        if mode == 'train':
+            datasets = self.init_subdataset(image_paths_file)
+            self.trainsets = datasets
+            self.n_train = len(self.trainsets)
+            print('number of train images: %d' % (self.n_train))
+        elif mode == 'valid':
+            datasets = self.init_subdataset(image_paths_file)
+            self.validsets = datasets
+            self.n_valid = len(self.validsets)
+            print('number of valid images: %d' % (self.n_valid))
+        elif mode == 'traineval':
+            datasets = self.init_subdataset(image_paths_file)
+            self.trainevalsets = datasets
+            self.n_traineval = len(self.trainevalsets)
+        elif mode == 'test':
+            datasets = self.init_subdataset(image_paths_file)
+            self.testsets = datasets
+            self.n_test = len(self.testsets)
+            print('number of test images: %d' % (self.n_test))
+        
+        if self.letterbox_cache and (mode != 'train' or self.is_train_cached):
+            self.letterbox_cache.load(mode, datasets, self)
+        elif self.image_arena and mode == 'train':
+            self.image_arena.build([item['image_path'] for item in datasets], self,
+                image_sizes=[item['image_size'] for item in datasets])
+        
+        if self.bucket_sizes and mode == 'train':
+            self.init_buckets(datasets)
+        
+        et = time.time()
+        print('load %s datasets time: %.2fs, resident memory: %.2fMB' % (
+            mode, et - st, utils.get_resident_memory()))
+        sys.stdout.flush()
+
+    def get_scale_size(self, size, scale):
+        """
+        把一个输入尺寸按scale / image_x_size的比例缩放，结果取网络步长的整数倍，不是整数倍时打印取整后的尺寸
+        输入1：size - 输入尺寸(image_x_size, image_y_size)
+        输入2：scale - image_x_size缩放后的宽度
+        输出：new_size - 缩放后的输入尺寸(image_x_size, image_y_size)
+        """
+        ratio = 1.0 * scale / self.image_x_size
+        new_size = tuple([max(int(round(ratio * t / self.stride)), 1) * self.stride for t in size])
+        if any([abs(ratio * t - new_t) > 1e-6 for t, new_t in zip(size, new_size)]):
+            print('input size %dx%d at scale %d is rounded to %dx%d' % (
+                size[0], size[1], scale, new_size[0], new_size[1]))
+        
+        return new_size
+
+    def get_cell_size(self, image_size):
+        """
+        输入尺寸对应的cell个数，与网络在这个输入尺寸下输出的网格一致
+        输入：image_size - 输入尺寸(image_x_size, image_y_size)
+        输出：cell_size - (cell_x_size, cell_y_size)
+        """
+        return int(image_size[0] / self.stride), int(image_size[1] / self.stride)
+
+    def get_field_shapes(self, image_size):
+        """
+        随输入尺寸变化的字段在一张图片上的尺寸，包括图片和网格相关的标签
+        输入：image_size - 输入尺寸(image_x_size, image_y_size)
+        输出：shapes - 字段名到尺寸的dict，不包括batch的维度
+        """
+        image_x_size, image_y_size = image_size
+        cell_x_size, cell_y_size = self.get_cell_size(image_size)
+        shapes = {
+            'images': (image_y_size, image_x_size, 3),
+            'coord_true': (cell_y_size, cell_x_size, self.max_objects, 4),
+            'object_mask': (cell_y_size, cell_x_size, self.max_objects),
+            'object_nums': (cell_y_size, cell_x_size),
+            'anchor_mask': (cell_y_size, cell_x_size, self.n_boxes),
+            'anchor_coord': (cell_y_size, cell_x_size, 4)}
+        if self.is_sparse_class:
+            shapes['class_true'] = (cell_y_size, cell_x_size, self.max_objects)
+            shapes['anchor_class'] = (cell_y_size, cell_x_size)
+        else:
+            shapes['class_true'] = (cell_y_size, cell_x_size, self.max_objects, self.n_classes)
+            shapes['anchor_class'] = (cell_y_size, cell_x_size, self.n_classes)
+        
+        return shapes
+
+    def get_batch_views(self, slot, image_size=None):
+        """
+        按一个batch的输入尺寸在slot上生成每个字段的视图，不发生拷贝
+        随输入尺寸变化的字段按最大的输入尺寸分配，这里取出起始位置开始的连续一段，reshape成这个输入尺寸的尺寸
+        输入1：slot - 字段名到numpy视图的dict，例如shared_memory的slot
+        输入2：image_size - 输入尺寸(image_x_size, image_y_size)，None时使用slot中的image_shape
+        输出：views - 字段名到numpy视图的dict，每个视图都是连续的
+        """
+        if image_size is None:
+            image_size = (int(slot['image_shape'][1]), int(slot['image_shape'][0]))
+        shapes = self.get_field_shapes(image_size)
+        views = collections.OrderedDict()
+        for name in slot:
+            if name in shapes:
+                shape = (slot[name].shape[0], ) + shapes[name]
+                views[name] = slot[name].reshape(-1)[0: int(numpy.prod(shape))].reshape(shape)
+            else:
+                views[name] = slot[name]
+        
+        return views
+
+    def init_buckets(self, datasets):
+        """
+        按图片尺寸把训练集分到宽高比最接近的桶，并打印填充像素的比例
+        输入：datasets - 训练集
+        """
+        image_sizes = [item['image_size'] for item in datasets]
+        self.train_buckets = assign_buckets(image_sizes, self.bucket_sizes)
+        
+        fill_ratios = get_fill_ratios(image_sizes, self.bucket_sizes)
+        bucket_fill_ratios = fill_ratios[numpy.arange(len(datasets)), self.train_buckets]
+        square_fill_ratios = get_fill_ratios(image_sizes, [(self.image_x_size, self.image_y_size)])[:,0]
+        for bucket, (image_x_size, image_y_size) in enumerate(self.bucket_sizes):
+            is_bucket = self.train_buckets == bucket
+            print('bucket %dx%d: %d images, padded pixels: %.2f%%' % (
+                image_x_size, image_y_size, numpy.sum(is_bucket), 
+                100.0 * (1.0 - numpy.mean(bucket_fill_ratios[is_bucket])) if numpy.any(is_bucket) else 0.0))
+        print('padded pixels: %.2f%% with %dx%d input, %.2f%% with buckets' % (
+            100.0 * (1.0 - numpy.mean(square_fill_ratios)), self.image_x_size, self.image_y_size, 
+            100.0 * (1.0 - numpy.mean(bucket_fill_ratios))))
+        sys.stdout.flush()
+
+    def init_subdataset(self, image_paths_file):
+        image_infos = self._load_image_paths_from_file(image_paths_file)
+                
+        # 组织datasets, datasets是一个item的list，图片在使用时才解码
+        # 存在标签清单时一次读入所有标签，否则逐个读取Labels/*.txt
+        # 清单中没有的图片，或者is_check_labels时Labels/*.txt在写入清单之后改变，重新生成清单
+        manifest_path = get_manifest_path(image_paths_file)
+        if os.path.exists(manifest_path):
+            label_manifest = LabelManifest(manifest_path)
+            stale_paths = label_manifest.get_stale_paths(
+                [image_info[0] for image_info in image_infos], is_check_labels=self.is_check_labels)
+            if stale_paths:
+                print('WARNING: label manifest %s is outdated for %d images, e.g. %s, rebuild it' % (
+                    manifest_path, len(stale_paths), stale_paths[0]))
+                build_from_label_files(image_paths_file)
+                label_manifest = LabelManifest(manifest_path)
+            datasets = [self._init_item(image_info, label_manifest) for image_info in image_infos]
+            print('read labels from %s' % (manifest_path))
+        else:
+            datasets = self._parallel_map(self._init_item, image_infos, name='read labels')
+        
+        # 图片的尺寸和md5来自只读文件头的元数据索引，用于预先分配image_arena和校验letterbox缓存
+        meta_index = load_meta_index(image_paths_file, 
+            [item['image_path'] for item in datasets], processor=self)
+        for i, item in enumerate(datasets):
+            item['image_size'] = (int(meta_index.widths[i]), int(meta_index.heights[i]))
+            item['image_md5'] = str(meta_index.md5s[i])
+        
+        return datasets
+
+    def _init_item(self, image_info, label_manifest=None):
+        [image_path, image_name] = image_info
+        label_path = image_path.replace('Images', 'Labels')
+        label_path = label_path.replace('.jpg', '.txt')
+       
+        item = {'image_name': image_name, 'image_path': image_path, 'label_path': label_path}
+        if label_manifest:
+            item['label'] = self._get_label_from_manifest(label_manifest, image_path)
+        else:
+            item['label'] = self._get_label_from_path(item['label_path'])
+        
+        return item
+
+    def _parallel_map(self, func, inputs, name='load'):
+        """
+        用线程池对inputs中的每一个元素调用func，输出的顺序和inputs保持一致
+        输入1：func - 处理一个元素的函数
+        输入2：inputs - 元素的list
+        输入3：name - 打印进度时的名称
+        输出：outputs - func输出的list
+        """
+        outputs = []
+        st = time.time()
+        if self.n_loaders > 1:
+            pool = ThreadPool(self.n_loaders)
+            iterator = pool.imap(func, inputs, chunksize=16)
+        else:
+            pool = None
+            iterator = (func(t) for t in inputs)
+        
+        for i, output in enumerate(iterator):
+            outputs.append(output)
+            if (i+1) % 1000 == 0 or i+1 == len(inputs):
+                spend = max(time.time() - st, 1e-6)
+                print('%s: %d / %d, %.2f images/sec' % (name, i+1, len(inputs), (i+1) / spend))
+                sys.stdout.flush()
+        
+        if pool:
+            pool.close()
+            pool.join()
+        
+        return outputs
+               
+    def dataset_producer_based_shm(self, produce_index=0, heartbeat=None):
+        """
+        基于共享内存的方法生产数据
+        输入1：produce_index - 生产者的序号，决定随机种子和负责的数据分片
+        输入2：heartbeat - 心跳函数，heartbeat(n_batches, is_waiting)，由ProducerPool传入
+        """
+        if self.bucket_sizes:
+            sampler = BucketSampler(self.train_buckets, self.batch_size, n_shards=self.n_processes, 
+                shard_index=produce_index, seed=self.seed)
+        else:
+            sampler = EpochSampler(self.n_train, self.batch_size, n_shards=self.n_processes, 
+                shard_index=produce_index, seed=self.seed)
+        # fork出的生产者继承了相同的随机状态，这里按生产者重新设置随机种子
+        # 重启的生产者从旧的生产者写到的位置继续采样，随机种子同时由这个位置决定，不重复旧的随机序列
+        epoch, position = self.sampler_states[2*produce_index], self.sampler_states[2*produce_index+1]
+        if epoch == 0 and position == 0:
+            random.seed(self.seed * 1000 + produce_index)
+            numpy.random.seed((self.seed * 1000 + produce_index) % (2**32))
+        else:
+            sampler.resume(epoch, position)
+            random.seed('%d-%d-%d' % (self.seed * 1000 + produce_index, epoch, position))
+            numpy.random.seed([(self.seed * 1000 + produce_index) % (2**32), epoch, position])
+        # letterbox和数据增强的结果写入生产者自己预先分配的数组，每个输入尺寸一个，每个batch复用
+        letterbox_images_dict = dict(((image_x_size, image_y_size), 
+            numpy.empty((self.batch_size, image_y_size, image_x_size, 3), dtype='uint8')) \
+            for image_x_size, image_y_size in self.input_sizes)
+        # 使用letterbox缓存并且不做数据增强时，拿到slot之后再把缓存中的图片直接读到slot中，只拷贝一次
+        is_direct = self.is_train_cached and not self.augmentation and self.image_dtype == 'uint8'
+        n_batches, produce_time = 0, 0.0
+        
+        while True:
+            st = time.time()
+            batch_indexs, epoch, position = sampler.next_batch()
+            if not is_direct:
+                batch_images, batch_labels = self.get_batch(self.trainsets, batch_indexs)
+            # batch所在的桶和随机选择的尺度决定这个batch的输入尺寸
+            bucket = self.train_buckets[batch_indexs[0]] if self.bucket_sizes else 0
+            scale_index = numpy.random.randint(len(self.scale_sizes[bucket])) if self.image_scales else 0
+            image_x_size, image_y_size = self.scale_sizes[bucket][scale_index]
+            letterbox_images = letterbox_images_dict[(image_x_size, image_y_size)]
+     
+            if self.augmentation and self.augmentation.is_resize:
+                batch_images, batch_labels = self.augmentation(
+                    batch_images, batch_labels, out=letterbox_images)
+            elif not is_direct:
+                if not self.is_train_cached:
+                    batch_images, batch_labels = self.convert_batch_infos(
+                        batch_images, batch_labels, out=letterbox_images)
+                if self.augmentation:
+                    batch_images, batch_labels = self.augmentation(
+                        batch_images, batch_labels, out=letterbox_images)
+            produce_time += time.time() - st
+            
+            # 直接写入shared_memory中的slot，等待空闲slot时只报告等待状态，不更新心跳
+            index, slot = None, None
+            while index is None:
+                index, slot = self.shared_memory.reserve(timeout=1.0, owner=produce_index)
+                if index is None and heartbeat:
+                    heartbeat(is_waiting=True)
+            # 图片和标签的网格按这个batch的输入尺寸写入
+            views = self.get_batch_views(slot, (image_x_size, image_y_size))
+            views['indexs'][:] = batch_indexs
+            views['sample_infos'][:] = [produce_index, epoch, position]
+            views['image_shape'][:] = [image_y_size, image_x_size]
+            if is_direct:
+                st = time.time()
+                batch_images, batch_labels = self.get_batch(self.trainsets, batch_indexs, out=views['images'])
+                produce_time += time.time() - st
+            elif self.image_dtype == 'uint8':
+                views['images'][:] = batch_images
+            else:
+                numpy.divide(batch_images, 255.0, out=views['images'], casting='unsafe')
+            self.convert_batch_labels(batch_labels, out=views)
+            if self.assign_mode == 'producer':
+                self.convert_batch_targets(views['coord_true'], views['object_mask'], views['class_true'], out=views)
+            self.sampler_states[2*produce_index], self.sampler_states[2*produce_index+1] = \
+                sampler.epoch, sampler.position
+            self.shared_memory.commit(index, owner=produce_index)
+            if heartbeat:
+                heartbeat(1)
+            
+            # 每100个batch观测一次读取图片、letterbox和数据增强的耗时，用于确定生产者的个数
+            # 以及图片缓存的命中率，用于确定image_cache_size
+            n_batches += 1
+            if n_batches % 100 == 0:
+                timings = self.augmentation.get_timings() if self.augmentation else []
+                infos = ['%s: %.2fms' % (name, spend) for name, spend in timings]
+                if not self.is_train_cached:
+                    infos.append(self.image_store.get_stats())
+                print('producer %d, batch time: %.2fms, %s' % (
+                    produce_index, 1000.0 * produce_time / n_batches, ', '.join(infos)))
+                sys.stdout.flush()
+            
+    def get_random_batch(self, datasets, batch_size):
+        """
+        获取随机一个batch的数据
+        输入1：datasets - 整个数据集
+        输入2：batch_size - 该batch的大小
+        输出1：batch_indexs - 每条数据在整个数据集中的index
+        输出2：batch_images - 每条数据的图片，使用letterbox缓存时已经是letterbox之后的图片
+        输出3：batch_labels - 每条数据的标签，使用letterbox缓存时已经是变换后的标签
+        """
+        batch_indexs = []
+       
+        for i in range(batch_size):
+            valid_indexs = range(self.n_train)
+            index = random.choice(valid_indexs)
+            batch_indexs.append(index)
+        batch_images, batch_labels = self.get_batch(datasets, batch_indexs)
+        
+        return batch_indexs, batch_images, batch_labels
+
+    def get_batch(self, datasets, batch_indexs, out=None):
+        """
+        获取训练集中指定index的一个batch的数据
+        输入1：datasets - 整个数据集
+        输入2：batch_indexs - 每条数据在整个数据集中的index
+        输入3：out - 使用letterbox缓存时，图片直接从缓存读到这个uint8数组中，为None时新分配
+        输出1：batch_images - 每条数据的图片，使用letterbox缓存时已经是letterbox之后的图片
+        输出2：batch_labels - 每条数据的标签，使用letterbox缓存时已经是变换后的标签
+        """
+        batch_images, batch_labels = [], []
+        
+        if self.is_train_cached:
+            batch_images, batch_labels = self.letterbox_cache.get_batch('train', batch_indexs, out=out)
+        else:
+            for index in batch_indexs:
+                item = datasets[index]
+                image = self._get_image_from_path(item['image_path'])
+                label = item['label']
+                batch_images.append(image)
+                batch_labels.append(label)
+        
+        return batch_images, batch_labels
+
+    def dataset_producer(self, mode, indexs, out=None):
+        """
+        按index读取一个batch的数据，只取出需要的item，不拷贝整个数据集
+        输入1：mode - train/valid/test，train对应traineval数据集
+        输入2：indexs - 每条数据在数据集中的index
+        输入3：out - 预先分配的图片数组，尺寸(len(indexs), image_y_size, image_x_size, 3)，为None时新分配
+               out的尺寸与image_y_size x image_x_size不同时，按out的尺寸letterbox，不使用letterbox缓存
+        输出1：batch_images - letterbox之后的图片，写入out中
+        输出2：batch_datasets - 每条数据的item，是数据集中item的引用，调用者不能修改
+        """
+        if mode == 'train':
+            datasets, cache_mode = self.trainevalsets, 'traineval'
+        elif mode == 'valid':
+            datasets, cache_mode = self.validsets, 'valid'
+        elif mode == 'test':
+            datasets, cache_mode = self.testsets, 'test'
+        else:
+            raise('ERROR: wrong mode in dataset_producer!')
+
+        batch_datasets = [datasets[index] for index in indexs]
+        if out is None:
+            out = numpy.empty((len(indexs), self.image_y_size, self.image_x_size, 3), 
+                dtype=self.image_dtype)
+        
+        if self.letterbox_cache and out.shape[1:3] == (self.image_y_size, self.image_x_size):
+            if self.image_dtype == 'uint8':
+                return self.letterbox_cache.get_batch(cache_mode, indexs, out=out)[0], batch_datasets
+            batch_images, _ = self.letterbox_cache.get_batch(cache_mode, indexs)
+        else:
+            batch_images = [self._get_image_from_path(item['image_path']) for item in batch_datasets]
+            if self.image_dtype == 'uint8':
+                return self.convert_batch_infos(batch_images, out=out), batch_datasets
+            batch_images = self.convert_batch_infos(batch_images, 
+                out=numpy.empty(out.shape, dtype='uint8'))
+        if self.image_dtype == 'uint8':
+            out[:] = batch_images
+        else:
+            numpy.divide(batch_images, 255.0, out=out, casting='unsafe')
+        
+        return out, batch_datasets
+
+    def iter_batches(self, mode, batch_indexs_list, prefetch=True, image_size=None):
+        """
+        按顺序生产多个batch，prefetch时在后台线程中准备下一个batch
+        两个图片数组交替使用，yield出的图片在下一次迭代之前有效
+        输入1：mode - train/valid/test
+        输入2：batch_indexs_list - 每个batch的index list
+        输入3：prefetch - 是否在使用当前batch时准备下一个batch
+        输入4：image_size - 输入尺寸(image_x_size, image_y_size)，例如低延迟时使用较小的尺寸，None时使用默认尺寸
+        """
+        image_x_size, image_y_size = image_size if image_size else (self.image_x_size, self.image_y_size)
+        buffers = [numpy.empty((self.batch_size, image_y_size, image_x_size, 3), 
+            dtype=self.image_dtype) for _ in range(2)]
+        
+        if not prefetch:
+            for batch_indexs in batch_indexs_list:
+                yield self.dataset_producer(mode, batch_indexs, 
+                    out=buffers[0][0:len(batch_indexs)])
+            return
+
+        pool = ThreadPool(1)
+        try:
+            result = None
+            if len(batch_indexs_list) > 0:
+                result = pool.apply_async(self.dataset_producer, (
+                    mode, batch_indexs_list[0], buffers[0][0:len(batch_indexs_list[0])]))
+            for i in range(len(batch_indexs_list)):
+                batch = result.get()
+                if i + 1 < len(batch_indexs_list):
+                    next_indexs = batch_indexs_list[i+1]
+                    result = pool.apply_async(self.dataset_producer, (
+                        mode, next_indexs, buffers[(i+1)%2][0:len(next_indexs)]))
+                yield batch
+        finally:
+            pool.close()
+            pool.join()
+
+    def convert_batch_infos(self, batch_images, batch_labels=None, out=None):
+        """
+        对一个batch做letterbox，图片直接resize到预先分配的数组中，标签整体用numpy变换
+        输入1：batch_images - 原始图片的list
+        输入2：batch_labels - 原始标签，尺寸(batch_size, max_objects, 5)，不会被修改
+        输入3：out - 预先分配的uint8数组，尺寸(batch_size, image_y_size, image_x_size, 3)，为None时新分配
+               输出尺寸由out决定，分桶时out的尺寸为所在桶的输入尺寸
+        输出1：new_batch_images - letterbox之后的图片，即out
+        输出2：new_batch_labels - 变换后的标签，只有batch_labels不为None时输出
+        """
+        n = len(batch_images)
+        if out is None:
+            out = numpy.empty((n, self.image_y_size, self.image_x_size, 3), dtype='uint8')
+        image_y_size, image_x_size = out.shape[1], out.shape[2]
+        
+        # 每张图片等比例缩放到不超过输出尺寸，居中放置，其余部分填充128
+        new_sizes = numpy.zeros((n, 2), dtype='float64')
+        for i, image in enumerate(batch_images):
+            orig_h, orig_w = image.shape[0], image.shape[1]
+            if 1.0 * orig_h / orig_w >= 1.0 * image_y_size / image_x_size:
+                new_h = int(round(image_y_size))
+                new_w = int(round(1.0 * orig_w / orig_h * new_h))
+            else:
+                new_w = int(round(image_x_size))
+                new_h = int(round(1.0 * orig_h / orig_w * new_w))
+            start_x = int((image_x_size - new_w) / 2.0)
+            start_y = int((image_y_size - new_h) / 2.0)
+            new_sizes[i] = [new_w, new_h]
+
+            canvas = out[i]
+            canvas[0:start_y] = 128
+            canvas[start_y+new_h:] = 128
+            canvas[:, 0:start_x] = 128
+            canvas[:, start_x+new_w:] = 128
+            target = canvas[start_y: start_y+new_h, start_x: start_x+new_w]
+            resized_image = cv2.resize(image, (new_w, new_h), dst=target)
+            # 旧版本的cv2不能写入不连续的视图，这时需要再拷贝一次
+            if resized_image is not target:
+                target[:] = resized_image
+        
+        if batch_labels is None:
+            return out
+
+        # 标签只变换第一个空物体之前的物体，x和w按新宽度变换，y和h按新高度变换
+        batch_labels = numpy.array(batch_labels, dtype='float32')
+        is_object = numpy.any(batch_labels[:,:,1:5] != 0, axis=2)
+        is_object = numpy.cumprod(is_object, axis=1).astype('bool')
+        new_w = new_sizes[:,0:1]
+        new_h = new_sizes[:,1:2]
+        x, y, w, h = [numpy.array(batch_labels[:,:,k], dtype='float64') for k in range(1, 5)]
+        x = (x * new_w + (image_x_size - new_w) / 2.0) / image_x_size
+        y = (y * new_h + (image_y_size - new_h) / 2.0) / image_y_size
+        w = w * new_w / image_x_size
+        h = h * new_h / image_y_size
+        new_batch_labels = batch_labels
+        for k, value in zip(range(1, 5), [x, y, w, h]):
+            new_batch_labels[:,:,k] = numpy.where(is_object, value, batch_labels[:,:,k])
+        
+        return out, new_batch_labels
+
+    def convert_batch_labels(self, batch_labels, out=None, image_size=None):
+        """
+        将一个batch的label转化成network所需要的numpy.array，整个batch用numpy的scatter操作一次完成
+        结果和逐张图片调用_process_label完全一致，稀疏时class_true为类别序号，背景为0
+        输入1：batch_labels - 一个batch的标签，尺寸(batch_size, max_objects, 5)
+        输入2：out - 字段名到numpy.array的dict（例如get_batch_views的输出），结果直接写入其中，
+               cell的个数由out的尺寸决定
+        输入3：image_size - out为None时的输入尺寸(image_x_size, image_y_size)，决定cell的个数，None时使用默认尺寸
+        输出：coord_true, object_mask, class_true, unpos_coord_true, unpos_object_mask, object_nums
+        """
+        batch_labels = numpy.asarray(batch_labels, dtype='float32')
+        n_batch = batch_labels.shape[0]
+        
+        if out is None:
+            shapes = self.get_field_shapes(image_size if image_size else (self.image_x_size, self.image_y_size))
+            out = {
+                'coord_true': numpy.zeros((n_batch, ) + shapes['coord_true'], dtype='float32'),
+                'object_mask': numpy.zeros((n_batch, ) + shapes['object_mask'], dtype='float32'),
+                'class_true': numpy.zeros((n_batch, ) + shapes['class_true'], 
+                    dtype='int32' if self.is_sparse_class else 'float32'),
+                'unpos_coord_true': numpy.zeros((n_batch, self.max_objects, 4), dtype='float32'),
+                'unpos_object_mask': numpy.zeros((n_batch, self.max_objects), dtype='float32'),
+                'object_nums': numpy.zeros((n_batch, ) + shapes['object_nums'], dtype='float32')}
+        else:
+            for name in ['coord_true', 'object_mask', 'class_true', 
+                'unpos_coord_true', 'unpos_object_mask', 'object_nums']:
+                out[name][:] = 0
+        cell_y_size, cell_x_size = out['object_mask'].shape[1:3]
+        
+        # 有效的物体，按照(图片, 物体)的顺序排列
+        boxes = batch_labels[:,:,1:5]
+        valid = numpy.any(boxes != 0.0, axis=2)
+        b_idx, o_idx = numpy.nonzero(valid)
+        class_index = batch_labels[b_idx, o_idx, 0].astype('int64')
+        valid_boxes = boxes[b_idx, o_idx]
+        
+        # 计算中心所在的cell，乘法的精度与_process_label中标量的乘法保持一致
+        scalar_dtype = (numpy.float32(1.0) * cell_x_size).dtype
+        cell_x = numpy.minimum(
+            (cell_x_size * valid_boxes[:,0].astype(scalar_dtype)).astype('int64'), cell_x_size-1)
+        cell_y = numpy.minimum(
+            (cell_y_size * valid_boxes[:,1].astype(scalar_dtype)).astype('int64'), cell_y_size-1)
+        
+        # 计算每个物体在所在cell中的序号，超过max_objects-1的物体共用最后一个位置
+        cell_key = (b_idx * cell_y_size + cell_y) * cell_x_size + cell_x
+        order = numpy.argsort(cell_key, kind='mergesort')
+        sorted_key = cell_key[order]
+        is_start = numpy.ones(sorted_key.shape, dtype='bool')
+        is_start[1:] = sorted_key[1:] != sorted_key[:-1]
+        starts = numpy.nonzero(is_start)[0]
+        counts = numpy.diff(numpy.append(starts, sorted_key.shape[0]))
+        rank = numpy.empty(sorted_key.shape, dtype='int64')
+        rank[order] = numpy.arange(sorted_key.shape[0]) - numpy.repeat(starts, counts)
+        n_in_cell = numpy.empty(sorted_key.shape, dtype='int64')
+        n_in_cell[order] = numpy.repeat(counts, counts)
+        slot = numpy.minimum(rank, self.max_objects-1)
+        
+        # 共用最后一个位置的物体，坐标以cell中最后一个物体为准
+        is_kept = (rank < self.max_objects-1) | (rank == n_in_cell-1)
+        out['coord_true'][b_idx[is_kept], cell_y[is_kept], cell_x[is_kept], slot[is_kept], :] = \
+            valid_boxes[is_kept]
+        out['object_mask'][b_idx, cell_y, cell_x, slot] = 1.0
+        if self.is_sparse_class:
+            out['class_true'][b_idx[is_kept], cell_y[is_kept], cell_x[is_kept], slot[is_kept]] = \
+                class_index[is_kept]
+        else:
+            out['class_true'][b_idx, cell_y, cell_x, slot, class_index] = 1.0
+        out['unpos_coord_true'][b_idx, o_idx, :] = valid_boxes
+        out['unpos_object_mask'][b_idx, o_idx] = 1.0
+        object_nums = numpy.bincount(cell_key, 
+            minlength=n_batch * cell_y_size * cell_x_size)
+        out['object_nums'][:] = numpy.reshape(numpy.minimum(object_nums, self.max_objects-1),
+            (n_batch, cell_y_size, cell_x_size))
+        
+        # 没有物体的位置标记为背景类
+        if not self.is_sparse_class:
+            class_true = out['class_true']
+            class_true[:,:,:,:,0][~numpy.any(class_true != 0.0, axis=4)] = 1.0
+        
+        return out['coord_true'], out['object_mask'], out['class_true'], \
+            out['unpos_coord_true'], out['unpos_object_mask'], out['object_nums']
+
+    def convert_batch_targets(self, coord_true, object_mask, class_true, out=None):
+        """
+        在CPU上计算每个anchor box负责的物体和回归目标，结果与Network中的分配方法一致
+        每个物体负责与它pseudo IOU（x和y都为0）最大的anchor box，cell中pseudo IOU最大的物体作为标签
+        输入1：coord_true, object_mask, class_true - convert_batch_labels的输出，cell的个数由它们的尺寸决定
+        输入2：out - 字段名到numpy.array的dict（例如get_batch_views的输出），结果直接写入其中
+        输出1：anchor_mask - 负责预测物体的anchor box，尺寸(batch_size, cell_y_size, cell_x_size, n_boxes)
+        输出2：anchor_coord - 每个cell相对的回归目标，尺寸(batch_size, cell_y_size, cell_x_size, 4)
+        输出3：anchor_class - 每个cell的类别，稀疏时为类别序号
+        输出4：object_coord, object_cells, object_anchors - 每张图片的物体列表，所在cell和负责的anchor box，
+               用于计算iou_value，尺寸(batch_size, max_objects, ...)
+        """
+        n_batch, cell_y_size, cell_x_size = object_mask.shape[0:3]
+        n_cells = n_batch * cell_y_size * cell_x_size
+        
+        if out is None:
+            shapes = self.get_field_shapes((cell_x_size * self.stride, cell_y_size * self.stride))
+            out = {
+                'anchor_mask': numpy.zeros((n_batch, ) + shapes['anchor_mask'], dtype='float32'),
+                'anchor_coord': numpy.zeros((n_batch, ) + shapes['anchor_coord'], dtype='float32'),
+                'anchor_class': numpy.zeros((n_batch, ) + shapes['anchor_class'], 
+                    dtype='int32' if self.is_sparse_class else 'float32'),
+                'object_coord': numpy.zeros((n_batch, ) + self.object_coord_size[1:], dtype='float32'),
+                'object_cells': numpy.zeros((n_batch, ) + self.object_cells_size[1:], dtype='int32'),
+                'object_anchors': numpy.zeros((n_batch, ) + self.object_anchors_size[1:], dtype='float32')}
+        else:
+            for name in ['anchor_mask', 'anchor_coord', 'anchor_class', 
+                'object_coord', 'object_cells', 'object_anchors']:
+                out[name][:] = 0
+        
+        # 物体列表，按照(图片, cell_y, cell_x, 序号)的顺序排列
+        b_idx, y_idx, x_idx, s_idx = numpy.nonzero(object_mask)
+        cells = (b_idx * cell_y_size + y_idx) * cell_x_size + x_idx
+        boxes = coord_true[b_idx, y_idx, x_idx, s_idx, 0:4]
+        classes = class_true[b_idx, y_idx, x_idx, s_idx]
+        
+        # 物体和anchor box的pseudo IOU，尺寸(n_objects, n_boxes)，float32的计算顺序与Network.calculate_iou一致
+        prior_half = self.prior_sizes[None,:,:] / 2.0
+        box_half = boxes[:,None,2:4] / 2.0
+        intersection = numpy.minimum(0.0 + prior_half, 0.0 + box_half) - \
+            numpy.maximum(0.0 - prior_half, 0.0 - box_half)
+        inter_area = intersection[:,:,0] * intersection[:,:,1] * \
+            numpy.all(intersection > 0, axis=2).astype('float32')
+        prior_size = (0.0 + prior_half) - (0.0 - prior_half)
+        box_size = (0.0 + box_half) - (0.0 - box_half)
+        pseudo_iou = inter_area / (prior_size[:,:,0] * prior_size[:,:,1] + \
+            box_size[:,:,0] * box_size[:,:,1] - inter_area + numpy.float32(1e-6))
+        iou_max = numpy.max(pseudo_iou, axis=1)
+        object_anchors = (pseudo_iou >= iou_max[:,None]).astype('float32')
+        
+        # 同一个cell中的物体负责的anchor box取并集
+        anchor_mask = numpy.reshape(out['anchor_mask'], (n_cells, self.n_boxes))
+        o_idx, a_idx = numpy.nonzero(object_anchors)
+        anchor_mask[cells[o_idx], a_idx] = 1.0
+        
+        # cell中pseudo IOU最大的物体作为标签，有多个时坐标取最大值，稀疏的类别取其中一个
+        cell_iou_max = numpy.full((n_cells, ), -numpy.inf, dtype='float32')
+        numpy.maximum.at(cell_iou_max, cells, iou_max)
+        is_label = iou_max >= cell_iou_max[cells]
+        cell_coord = numpy.zeros((n_cells, 4), dtype='float32')
+        numpy.maximum.at(cell_coord, cells[is_label], boxes[is_label])
+        anchor_class = numpy.reshape(out['anchor_class'], (n_cells, ) + out['anchor_class'].shape[3:])
+        if self.is_sparse_class:
+            anchor_class[cells[is_label]] = classes[is_label]
+        else:
+            numpy.maximum.at(anchor_class, cells[is_label], classes[is_label])
+        
+        # 回归目标转化为相对所在cell的坐标，与Network.get_inverse_position一致
+        label_cells = numpy.unique(cells)
+        cell_x = (label_cells % cell_x_size).astype('float32')
+        cell_y = (label_cells // cell_x_size % cell_y_size).astype('float32')
+        anchor_coord = numpy.reshape(out['anchor_coord'], (n_cells, 4))
+        anchor_coord[label_cells, 0] = cell_coord[label_cells, 0] * numpy.float32(cell_x_size) - cell_x
+        anchor_coord[label_cells, 1] = cell_coord[label_cells, 1] * numpy.float32(cell_y_size) - cell_y
+        anchor_coord[label_cells, 2:4] = cell_coord[label_cells, 2:4]
+        
+        # 每张图片的物体依次排列，物体个数不超过max_objects
+        starts = numpy.searchsorted(b_idx, numpy.arange(n_batch))
+        rank = numpy.arange(b_idx.shape[0]) - starts[b_idx]
+        out['object_coord'][b_idx, rank] = boxes
+        out['object_cells'][b_idx, rank] = y_idx * cell_x_size + x_idx
+        out['object_anchors'][b_idx, rank] = object_anchors
+        
+        return out['anchor_mask'], out['anchor_coord'], out['anchor_class'], \
+            out['object_coord'], out['object_cells'], out['object_anchors']
+
+    def _process_label(self, label):
+        """
+        处理所有network部分所需要的label
+        """
+        coord_true = numpy.zeros(
+            shape=(self.cell_y_size, self.cell_x_size, self.max_objects, 4),
+            dtype='float32')
+        object_mask = numpy.zeros(
+            shape=(self.cell_y_size, self.cell_x_size, self.max_objects),
+            dtype='float32')
+        class_true = numpy.zeros(
+            shape=(self.cell_y_size, self.cell_x_size, self.max_objects, self.n_classes),
+            dtype='float32')
+        unpos_coord_true = numpy.zeros(
+            shape=(self.max_objects, 4),
+            dtype='float32')
+        unpos_object_mask = numpy.zeros(
+            shape=(self.max_objects, ),
+            dtype='float32')
+        object_nums = numpy.zeros(
+            shape=(self.cell_y_size, self.cell_x_size),
+            dtype='int32')
+        
+        for j in range(self.max_objects):
+            
+            [index, in_x, in_y, in_w, in_h] = label[j]
+            index = int(index)
+            
+            if not (in_x == 0.0 and in_y == 0.0 and in_w == 0.0 and in_h == 0.0):
+                # 计算包围框标记
+                center_cell_x = min(int(self.cell_x_size * in_x), self.cell_x_size-1)
+                center_cell_y = min(int(self.cell_y_size * in_y), self.cell_y_size-1)
+                
+                coord_true[center_cell_y, center_cell_x, 
+                    object_nums[center_cell_y, center_cell_x],:] = numpy.array(
+                    [in_x, in_y, in_w, in_h])
+                object_mask[center_cell_y, center_cell_x,
+                    object_nums[center_cell_y, center_cell_x]] = 1.0
+                
+                unpos_coord_true[j,:] = numpy.array([in_x, in_y, in_w, in_h])
+                unpos_object_mask[j] = 1.0
+                
+                class_true[center_cell_y, center_cell_x, 
+                    object_nums[center_cell_y, center_cell_x], index] = 1.0
+
+                if object_nums[center_cell_y, center_cell_x] < self.max_objects-1:
+                    object_nums[center_cell_y, center_cell_x] += 1
+
+        for i in range(self.cell_y_size):
+            for j in range(self.cell_x_size):
+                for n in range(self.max_objects):
+                    if sum(class_true[i,j,n,:]) == 0.0:
+                        class_true[i,j,n,0] = 1.0
+                
+        return coord_true, object_mask, class_true, \
+            unpos_coord_true, unpos_object_mask, object_nums
+
+    def _load_image_paths_from_file(self, image_paths_file):
+        """
+        从文件中读取所有图片的路径
+        输入：image_paths_file - 图片路径文件
+        输出：image_paths - 图片路径list，每一个元素包含图片路径和图片名
+        """
+        with open(image_paths_file, 'r') as fo:
+            lines = [line.strip() for line in fo]
+        
+        image_paths = self._parallel_map(self._check_image_path, lines, name='check paths')
+
+        return image_paths
+
+    def _check_image_path(self, image_path):
+        if not os.path.exists(image_path):
+            print(image_path)
+            raise('ERROR: image path not exists!')
+        file_name = os.path.split(image_path)[1]
+        image_name = os.path.splitext(file_name)[0]
+        
+        return [image_path, image_name]
+
+    def _get_label_from_path(self, label_path):
+        """
+        根据标签路径读取标签
+        输入：label_path_file - 标签路径
+        输出：labels - 图片标签list
+        """
+        new_label = numpy.zeros((self.max_objects, 5), dtype='float32')
+        n_object = 0
+            
+        with open(label_path, 'r') as fo:
+            for line in fo:
+                infos = line.strip().split(' ')
+                
+                index = float(int(infos[0]) + 1)
+                in_x = float(infos[1])
+                in_y = float(infos[2])
+                in_w = float(infos[3])
+                in_h = float(infos[4])
+            
+                new_label[n_object,:] = numpy.array([index, in_x, in_y, in_w, in_h], dtype='float32')
+                n_object += 1
+
+                if n_object >= self.max_objects:
+                    break
+        
+        return new_label
+
+    def _get_label_from_manifest(self, label_manifest, image_path):
+        """
+        从标签清单中读取标签，格式与_get_label_from_path相同
+        输入1：label_manifest - 标签清单
+        输入2：image_path - 图片路径
+        输出：labels - 图片标签list
+        """
+        new_label = numpy.zeros((self.max_objects, 5), dtype='float32')
+        label = label_manifest.get(image_path)
+        n_object = min(label.shape[0], self.max_objects)
+        new_label[0:n_object,0] = label[0:n_object,0] + 1
+        new_label[0:n_object,1:5] = label[0:n_object,1:5]
+
+        return new_label
+
+    def _get_image_from_path(self, image_path):
+        """
+        根据图片路径读取图片，优先从image_arena中读取，否则经过image_store按需解码并缓存
+        输入：image_path - 图片路径
+        输出：image - BGR图片，只读
+        """
+        if self.image_arena:
+            image = self.image_arena.get(image_path)
+            if image is not None:
+                return image
+        image = self.image_store.get(image_path)
+        return image
+
+
+"""
+batch结构类：描述共享内存中一个batch的每个字段的名称、类型和尺寸
+"""
+class BatchSchema:
+
+    def __init__(self, fields, align=64):
+        """
+        输入1：fields - 字段的list，每一个元素是(name, dtype, shape)
+        输入2：align - 每个字段起始位置对齐的字节数
+        """
+        self.fields = []
+        self.align = align
+        offset = 0
+        for name, dtype, shape in fields:
+            dtype = numpy.dtype(dtype)
+            shape = tuple(shape) if isinstance(shape, (list, tuple)) else (shape, )
+            nbytes = int(numpy.prod(shape)) * dtype.itemsize
+            offset = int(math.ceil(1.0 * offset / align)) * align
+            self.fields.append((name, dtype, shape, offset, nbytes))
+            offset += nbytes
+        self.nbytes = int(math.ceil(1.0 * offset / align)) * align
+
+    def get_views(self, buffer, base=0):
+        """
+        在buffer上按字段生成numpy视图，不发生拷贝
+        输入1：buffer - 支持buffer协议的内存区域
+        输入2：base - 这个batch在buffer中的起始字节
+        输出：views - 字段名到numpy视图的dict
+        """
+        views = collections.OrderedDict()
+        for name, dtype, shape, offset, nbytes in self.fields:
+            views[name] = numpy.frombuffer(buffer, dtype=dtype, 
+                count=int(numpy.prod(shape)), offset=base+offset).reshape(shape)
+
+        return views
+
+    def copy_views(self, views, names=None):
+        """
+        把视图拷贝到一块新分配的内存中，每个字段的起始地址按align字节对齐
+        tf的py_func返回起始地址对齐的数组时直接使用它的内存，不再拷贝，从slot中取出数据只需要拷贝一次
+        输入1：views - 字段名到numpy视图的dict，例如Processor.get_batch_views的输出
+        输入2：names - 需要拷贝的字段，None时拷贝所有字段
+        输出：arrays - 字段名到numpy数组的dict
+        """
+        names = list(views.keys()) if names is None else names
+        offsets, offset = [], 0
+        for name in names:
+            offset = int(math.ceil(1.0 * offset / self.align)) * self.align
+            offsets.append(offset)
+            offset += views[name].nbytes
+        buffer = numpy.empty((offset + self.align, ), dtype='uint8')
+        base = int((-buffer.ctypes.data) % self.align)
+        
+        arrays = collections.OrderedDict()
+        for name, offset in zip(names, offsets):
+            view = views[name]
+            arrays[name] = buffer[base+offset: base+offset+view.nbytes].view(view.dtype).reshape(view.shape)
+            arrays[name][...] = view
+
+        return arrays
+
+
+"""
+共享内存类：生产者消费者模式下，用于存储和传递数据的共享内存区域
+"""
+class SharedMemory:
+    
+    def __init__(self, buffer_size, batch_schema, n_owners=1):
+        """
+        输入1：buffer_size - 环形缓冲区中slot的个数
+        输入2：batch_schema - 每个slot的结构，BatchSchema
+        输入3：n_owners - 生产者的个数，reserve时用owner区分不同的生产者
+        """
+        self.buffer_size = buffer_size
+        self.batch_schema = batch_schema
+        self.put_index = Value('i', 0)
+        self.get_index = Value('i', 0)
+        self.put_lock = mp.Lock()
+        # 持有put_lock的进程的pid，持有者退出时等待的生产者可以释放这个锁，recover_lock保证只释放一次
+        self.put_lock_owner = Value('l', 0, lock=False)
+        self.recover_lock = mp.Lock()
+
+        # free_slots[i]在第i个slot被消费者释放时被释放，full_slots[i]在第i个slot写完时被释放
+        # 等待的一方阻塞在信号量上，slot状态改变时立刻被唤醒
+        self.free_slots = [mp.Semaphore(1) for _ in range(self.buffer_size)]
+        self.full_slots = [mp.Semaphore(0) for _ in range(self.buffer_size)]
+        # get()借出的slot，在下一次get()时归还
+        self.get_lease = None
+        
+        # 每个生产者领取了但还没有commit的序号加1，以及是否已经拿到了对应的slot
+        # 保存在共享内存中，生产者退出后，用同一个owner重启的生产者会接着写这个序号
+        self.owner_tickets = Array('i', n_owners, lock=False)
+        self.owner_states = Array('i', n_owners, lock=False)
+        # 没有指定owner时，序号保存在进程自己的内存中
+        self.local_ticket = [0, 0]
+
+        self.cdatasets = Array('B', self.buffer_size * self.batch_schema.nbytes, lock=False)
+        self.slots = [self.batch_schema.get_views(self.cdatasets, index * self.batch_schema.nbytes) \
+            for index in range(self.buffer_size)]
+        
+    def reserve(self, timeout=None, owner=None):
+        """
+        申请一个空闲的slot，生产者直接在slot的视图上写入数据，写完后调用commit
+        先在put_lock中领取序号，再不持有锁地等待这个序号对应的slot，超时的时候序号保留，
+        下一次reserve继续等待同一个slot，这样每个slot仍然按照序号的顺序写入
+        领取序号时屏蔽SIGTERM，生产者被terminate时不会在持有put_lock的时候退出，
+        被kill的持有者由等待put_lock的生产者检查到并释放锁
+        输入1：timeout - 最多等待的秒数，None表示一直等待
+        输入2：owner - 生产者序号
+        输出1：index - slot的序号，超时返回None
+        输出2：slot - 字段名到numpy视图的dict，超时返回None
+        """
+        st = time.time()
+        ticket, state = self._get_ticket(owner)
+        if ticket == 0:
+            ticket, state = self._take_ticket(owner, timeout), 0
+            if ticket == 0:
+                return None, None
+        
+        index = ticket - 1
+        if state == 0:
+            remain = None if timeout is None else max(0.0, timeout - (time.time() - st))
+            if not self.free_slots[index % self.buffer_size].acquire(True, remain):
+                return None, None
+            self._set_ticket(owner, ticket, 1)
+
+        return index, self.slots[index % self.buffer_size]
+
+    def commit(self, index, owner=None):
+        """
+        标记slot已经写完，唤醒等待这个slot的消费者
+        输入1：index - reserve得到的slot序号
+        输入2：owner - 生产者序号，与reserve时相同
+        """
+        self._set_ticket(owner, 0, 0)
+        self.full_slots[index % self.buffer_size].release()
+
+    def acquire(self, timeout=None):
+        """
+        借出下一个写好的slot，在release之前生产者不会覆盖这个slot，可以零拷贝地读取
+        同时可以借出多个slot（最多buffer_size个），用于消费者做双缓冲
+        输入：timeout - 最多等待的秒数，None表示一直等待
+        输出1：index - slot的序号，超时返回None
+        输出2：data - 字段名到numpy视图的dict，超时返回None
+        """
+        # 向共享内存中消费数据
+        index = self.get_index.value
+        if not self.full_slots[index % self.buffer_size].acquire(True, timeout):
+            return None, None
+        self.get_index.value += 1
+
+        return index, self.slots[index % self.buffer_size]
+
+    def release(self, index):
+        """
+        归还借出的slot，生产者可以重新写入
+        输入：index - acquire得到的slot序号
+        """
+        self.free_slots[index % self.buffer_size].release()
+    
+    def _take_ticket(self, owner, timeout=None):
+        """
+        在put_lock中领取下一个序号，每次最多等待0.1秒，之间检查持有锁的进程是否已经退出
+        输入1：owner - 生产者序号
+        输入2：timeout - 最多等待的秒数，None表示一直等待
+        输出：ticket - 序号加1，超时返回0
+        """
+        st = time.time()
+        while True:
+            wait = 0.1 if timeout is None else min(0.1, max(0.0, timeout - (time.time() - st)))
+            old_mask = block_signals([signal.SIGTERM])
+            try:
+                if self.put_lock.acquire(True, wait):
+                    self.put_lock_owner.value = os.getpid()
+                    try:
+                        ticket = self.put_index.value + 1
+                        self._set_ticket(owner, ticket, 0)
+                        self.put_index.value += 1
+                    finally:
+                        self.put_lock_owner.value = 0
+                        self.put_lock.release()
+                    return ticket
+            finally:
+                restore_signals(old_mask)
+            
+            self._recover_put_lock()
+            if timeout is not None and time.time() - st >= timeout:
+                return 0
+
+    def _recover_put_lock(self):
+        """
+        持有put_lock的进程已经退出时（例如被kill），释放它持有的锁
+        """
+        pid = self.put_lock_owner.value
+        if pid <= 0 or is_process_alive(pid):
+            return
+        if not self.recover_lock.acquire(False):
+            return
+        try:
+            # 拿到recover_lock之后再检查一次，其他进程可能已经释放过这个锁
+            if self.put_lock_owner.value == pid:
+                print('WARNING: put_lock owner %d exited, release the lock' % (pid))
+                sys.stdout.flush()
+                self.put_lock_owner.value = 0
+                self.put_lock.release()
+        finally:
+            self.recover_lock.release()
+
+    def _get_ticket(self, owner):
+        if owner is None:
+            return self.local_ticket[0], self.local_ticket[1]
+        return self.owner_tickets[owner], self.owner_states[owner]
+
+    def _set_ticket(self, owner, ticket, state):
+        if owner is None:
+            self.local_ticket[0], self.local_ticket[1] = ticket, state
+        else:
+            self.owner_tickets[owner], self.owner_states[owner] = ticket, state
+
+    def get(self, timeout=None):
+        """
+        从共享内存读取数据，返回的视图在下一次调用get之前有效
+        输入：timeout - 最多等待的秒数，None表示一直等待
+        输出：data - 字段名到numpy视图的dict，超时返回None
+        """
+        if self.get_lease is not None:
+            self.release(self.get_lease)
+            self.get_lease = None
+        index, data = self.acquire(timeout)
+        self.get_lease = index
+
+        return data
+
+
+def is_process_alive(pid):
+    """
+    输入：pid - 进程号
+    输出：进程是否存在，已经退出但没有被回收的进程也认为存在
+    """
+    try:
+        os.kill(pid, 0)
+    except OSError as error:
+        return error.errno == errno.EPERM
+    return True
+
+def block_signals(signums):
+    """
+    屏蔽信号，屏蔽期间收到的信号在restore_signals之后处理，不支持的平台不做任何事情
+    输出：old_mask - 原来的屏蔽集合
+    """
+    if hasattr(signal, 'pthread_sigmask'):
+        return signal.pthread_sigmask(signal.SIG_BLOCK, signums)
+    return None
+
+def restore_signals(old_mask):
+    if old_mask is not None:
+        signal.pthread_sigmask(signal.SIG_SETMASK, old_mask)
+
+
+"""
+共享区域类：生产者消费者模式下，用于存储和传递数据的共享内存区域
+"""
+class SharedBlock:
+    
+    def __init__(self, dataset_size):
+        self.dataset_size = dataset_size
+        self.index = Value('i', 0)
+        self.get_lock = mp.Lock()
+        self.index_lock = mp.Lock()
+
+        self.cdatasets = Array('d', [0.0] * 2 * self.dataset_size)
+        self.cbuffer = self.cdatasets._obj._wrapper
+
+        init_array = numpy.ones((dataset_size, ), dtype='float32')
+        self.put(init_array)
+        self.put(init_array)
+        
+    def put(self, dataset):
+        """
+        将数据写入共享内存
+        输入：dataset - 写入新的数据
+        """
+        # 向共享内存中生产数据
+        index = self.index.value % 2
+        buffer_ptr = cast(self.cbuffer.get_address() + index * self.dataset_size * 8, POINTER(c_double))
+        data = numpy.ctypeslib.as_array(buffer_ptr, shape=(self.dataset_size, ))
+        data[:] = dataset
+        with self.index_lock:
+            self.index.value += 1
+
+    def get(self):
+        """
+        从共享内存读取数据
+        输出：data - 读取旧的数据
+        """
+        # 向共享内存中消费数据
+        with self.get_lock:
+            with self.index_lock:
+                index = (self.index.value + 1) % 2
+            buffer_ptr = cast(self.cbuffer.get_address() + index * self.dataset_size * 8, POINTER(c_double))
+            data = numpy.ctypeslib.as_array(buffer_ptr, shape=(self.dataset_size, ))
+
+        return data
@@ -0,0 +1,80 @@
+# -*- coding: utf8 -*-
+# description: shared image arena in object detection
+from __future__ import print_function
+import sys
+import time
+import numpy
+from multiprocessing.sharedctypes import Array
+from src.data.image_store import read_image
+
+
+"""
+图片区域类：所有解码后的图片连续地存放在一块共享内存中，用offset和shape索引
+在fork生产者之前建立，生产者只读地访问同一块内存，内存占用不随生产者的个数增加
+"""
+class ImageArena:
+
+    def __init__(self):
+        self.buffer = None
+        self.offsets = numpy.zeros((0, ), dtype='int64')
+        self.shapes = numpy.zeros((0, 3), dtype='int64')
+        self.path_index = {}
+        self.nbytes = 0
+
+    def build(self, image_paths, processor, image_sizes=None):
+        """
+        解码所有图片并拷贝到共享内存中
+        输入1：image_paths - 图片路径list
+        输入2：processor - 用于多线程解码的Processor
+        输入3：image_sizes - 每张图片的(width, height)，来自元数据索引，
+            已知时先分配共享内存，每个线程解码后直接拷贝进去，不需要同时保存所有解码出的图片
+        """
+        st = time.time()
+        if image_sizes is None:
+            images = processor._parallel_map(read_image, image_paths, name='decode images')
+            shapes = [image.shape for image in images]
+        else:
+            images = None
+            shapes = [(height, width, 3) for width, height in image_sizes]
+        
+        # 每张图片的起始位置和尺寸
+        sizes = numpy.array([numpy.prod(shape) for shape in shapes], dtype='int64')
+        self.offsets = numpy.zeros((len(shapes), ), dtype='int64')
+        self.offsets[1:] = numpy.cumsum(sizes)[:-1]
+        self.shapes = numpy.array(shapes, dtype='int64').reshape((-1, 3))
+        self.nbytes = int(sizes.sum())
+        self.path_index = dict((path, i) for i, path in enumerate(image_paths))
+        self.buffer = Array('B', max(self.nbytes, 1), lock=False)
+        data = numpy.frombuffer(self.buffer, dtype='uint8')
+        
+        def _copy(i):
+            image = images[i] if images is not None else read_image(image_paths[i])
+            # 元数据索引中的宽高已经按EXIF方向校正，与解码后的图片一致
+            if tuple(image.shape) != tuple(self.shapes[i]):
+                print(image_paths[i])
+                raise('ERROR: image size does not match image meta!')
+            data[self.offsets[i]: self.offsets[i]+sizes[i]] = image.reshape(-1)
+            if images is not None:
+                images[i] = None
+        
+        processor._parallel_map(_copy, list(range(len(image_paths))), name='build image arena')
+
+        print('build image arena: %d images, %.2fMB, time: %.2fs' % (
+            len(image_paths), self.nbytes / 1024.0 / 1024.0, time.time() - st))
+        sys.stdout.flush()
+
+    def get(self, image_path):
+        """
+        读取一张图片，返回共享内存上的只读视图，不发生拷贝
+        输入：image_path - 图片路径
+        输出：image - BGR图片，不在arena中时返回None
+        """
+        if image_path not in self.path_index:
+            return None
+        i = self.path_index[image_path]
+        shape = self.shapes[i]
+        image = numpy.frombuffer(self.buffer, dtype='uint8', 
+            count=int(shape[0] * shape[1] * shape[2]), offset=int(self.offsets[i])).reshape(shape)
+        image.flags.writeable = False
+
+        return image
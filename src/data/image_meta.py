@@ -0,0 +1,271 @@
+# -*- coding: utf8 -*-
+# description: header only image metadata index in object detection
+from __future__ import print_function
+import sys
+import os
+import time
+import struct
+import hashlib
+import numpy
+
+
+# 索引格式的版本，读取尺寸的方法改变时加1，旧版本的索引整体重建
+META_VERSION = 2
+
+
+"""
+图片元数据索引类：只读取JPEG/PNG的文件头得到宽、高和通道数，同时记录文件大小、修改时间和内容的md5
+保存在图片路径文件旁边，例如train.txt对应train_meta.npz，文件大小和修改时间不变的图片不会重新计算
+"""
+class ImageMetaIndex:
+
+    def __init__(self):
+        self.paths = numpy.zeros((0, ), dtype='U1')
+        self.widths = numpy.zeros((0, ), dtype='int32')
+        self.heights = numpy.zeros((0, ), dtype='int32')
+        self.channels = numpy.zeros((0, ), dtype='int32')
+        self.file_sizes = numpy.zeros((0, ), dtype='int64')
+        self.mtimes = numpy.zeros((0, ), dtype='float64')
+        self.md5s = numpy.zeros((0, ), dtype='U32')
+        self.path_index = {}
+
+    def build(self, image_paths, processor=None):
+        """
+        建立索引，已有索引中文件大小和修改时间没有变化的图片直接复用
+        输入1：image_paths - 图片路径list
+        输入2：processor - 用于多线程读取文件头的Processor，为None时单线程读取
+        输出：n_updated - 重新读取的图片个数
+        """
+        st = time.time()
+        stats = [os.stat(path) for path in image_paths]
+        is_updated = []
+        for path, stat in zip(image_paths, stats):
+            i = self.path_index.get(path)
+            is_updated.append(i is None or self.file_sizes[i] != stat.st_size or \
+                self.mtimes[i] != stat.st_mtime)
+
+        updated_paths = [path for path, flag in zip(image_paths, is_updated) if flag]
+        if processor:
+            updated_metas = processor._parallel_map(read_image_meta, updated_paths, name='read image headers')
+        else:
+            updated_metas = [read_image_meta(path) for path in updated_paths]
+
+        metas, k = [], 0
+        for path, stat, flag in zip(image_paths, stats, is_updated):
+            if flag:
+                metas.append(updated_metas[k])
+                k += 1
+            else:
+                i = self.path_index[path]
+                metas.append((self.widths[i], self.heights[i], self.channels[i], self.md5s[i]))
+
+        self.paths = numpy.array(image_paths, dtype='U')
+        self.widths = numpy.array([meta[0] for meta in metas], dtype='int32')
+        self.heights = numpy.array([meta[1] for meta in metas], dtype='int32')
+        self.channels = numpy.array([meta[2] for meta in metas], dtype='int32')
+        self.md5s = numpy.array([meta[3] for meta in metas], dtype='U32')
+        self.file_sizes = numpy.array([stat.st_size for stat in stats], dtype='int64')
+        self.mtimes = numpy.array([stat.st_mtime for stat in stats], dtype='float64')
+        self.path_index = dict((path, i) for i, path in enumerate(image_paths))
+
+        print('build image meta index: %d images, %d updated, time: %.2fs' % (
+            len(image_paths), len(updated_paths), time.time() - st))
+        sys.stdout.flush()
+
+        return len(updated_paths)
+
+    def validate(self, is_check_md5=False):
+        """
+        检查索引中的图片是否存在、是否被修改
+        输入：is_check_md5 - 是否重新计算内容的md5，否则只比较文件大小和修改时间
+        输出：invalid_paths - 不存在或者已经改变的图片路径list
+        """
+        invalid_paths = []
+        for i, path in enumerate(self.paths):
+            path = str(path)
+            if not os.path.exists(path):
+                invalid_paths.append(path)
+                continue
+            stat = os.stat(path)
+            if stat.st_size != self.file_sizes[i] or stat.st_mtime != self.mtimes[i]:
+                invalid_paths.append(path)
+            elif is_check_md5 and get_file_md5(path) != self.md5s[i]:
+                invalid_paths.append(path)
+
+        return invalid_paths
+
+    def get_size(self, image_path):
+        """
+        输入：image_path - 图片路径
+        输出：width, height - 图片的宽和高，不在索引中时返回None
+        """
+        i = self.path_index.get(image_path)
+        if i is None:
+            return None
+        return int(self.widths[i]), int(self.heights[i])
+
+    def load(self, meta_path):
+        with numpy.load(meta_path) as data:
+            # 版本1的索引没有按EXIF方向校正宽高，不能复用
+            if 'version' not in data or int(data['version']) != META_VERSION:
+                print('image meta index %s is outdated, rebuild it' % (meta_path))
+                return
+            self.paths = data['paths']
+            self.widths = data['widths']
+            self.heights = data['heights']
+            self.channels = data['channels']
+            self.file_sizes = data['file_sizes']
+            self.mtimes = data['mtimes']
+            self.md5s = data['md5s']
+        self.path_index = dict((str(path), i) for i, path in enumerate(self.paths))
+
+    def save(self, meta_path):
+        # 先写临时文件再重命名，避免中断时留下不完整的索引
+        tmp_path = meta_path + '.tmp'
+        with open(tmp_path, 'wb') as fw:
+            numpy.savez(fw, version=META_VERSION, paths=self.paths, widths=self.widths, heights=self.heights,
+                channels=self.channels, file_sizes=self.file_sizes, mtimes=self.mtimes, md5s=self.md5s)
+        os.rename(tmp_path, meta_path)
+
+
+def get_meta_path(image_paths_file):
+    """
+    图片路径文件对应的元数据索引路径，例如train.txt对应train_meta.npz
+    """
+    return os.path.splitext(image_paths_file)[0] + '_meta.npz'
+
+def load_meta_index(image_paths_file, image_paths, processor=None):
+    """
+    读取图片路径文件旁边的元数据索引，更新改变了的图片，有更新时写回
+    输入1：image_paths_file - 图片路径文件
+    输入2：image_paths - 图片路径list
+    输入3：processor - 用于多线程读取文件头的Processor
+    输出：meta_index - 元数据索引
+    """
+    meta_path = get_meta_path(image_paths_file)
+    meta_index = ImageMetaIndex()
+    if os.path.exists(meta_path):
+        meta_index.load(meta_path)
+    n_old = len(meta_index.paths)
+    n_updated = meta_index.build(image_paths, processor)
+    if n_updated > 0 or n_old != len(image_paths):
+        meta_index.save(meta_path)
+
+    return meta_index
+
+def read_image_meta(image_path):
+    """
+    读取一张图片的元数据
+    输出：(width, height, channels, md5)，不能从文件头得到尺寸时解码图片
+    """
+    size = read_image_size(image_path)
+    if size is None:
+        import cv2
+        image = cv2.imread(image_path, cv2.IMREAD_UNCHANGED)
+        if image is None:
+            print(image_path)
+            raise('ERROR: image cannot be decoded!')
+        size = (image.shape[1], image.shape[0], image.shape[2] if image.ndim == 3 else 1)
+
+    return size[0], size[1], size[2], get_file_md5(image_path)
+
+def read_image_size(image_path):
+    """
+    只读取文件头得到图片的尺寸，支持JPEG和PNG
+    JPEG的SOF段是存储的尺寸，EXIF方向为5~8（旋转90度）时cv2.imread解码出的图片宽高交换，这里同样交换，
+    与解码后的图片以及在解码后的图片上标注的标签一致
+    输入：image_path - 图片路径
+    输出：(width, height, channels)，不支持的格式返回None
+    """
+    with open(image_path, 'rb') as fo:
+        head = fo.read(26)
+        # PNG：签名之后的第一个块是IHDR
+        if head[0:8] == b'\x89PNG\r\n\x1a\n' and head[12:16] == b'IHDR':
+            width, height = struct.unpack('>II', head[16:24])
+            color_type = bytearray(head[25:26])[0]
+            channels = {0: 1, 2: 3, 3: 3, 4: 2, 6: 4}.get(color_type, 3)
+            return width, height, channels
+        # JPEG：跳过各个段，直到SOF段
+        if head[0:2] == b'\xff\xd8':
+            fo.seek(2)
+            orientation = 1
+            while True:
+                byte = fo.read(1)
+                while byte and byte != b'\xff':
+                    byte = fo.read(1)
+                while byte == b'\xff':
+                    byte = fo.read(1)
+                if not byte:
+                    return None
+                marker = bytearray(byte)[0]
+                if marker in [0x01, 0xd8] or 0xd0 <= marker <= 0xd7:
+                    continue
+                if marker == 0xd9:
+                    return None
+                length = struct.unpack('>H', fo.read(2))[0]
+                if marker in [0xc0, 0xc1, 0xc2, 0xc3, 0xc5, 0xc6, 0xc7,
+                    0xc9, 0xca, 0xcb, 0xcd, 0xce, 0xcf]:
+                    segment = fo.read(6)
+                    height, width = struct.unpack('>HH', segment[1:5])
+                    channels = bytearray(segment[5:6])[0]
+                    if orientation in [5, 6, 7, 8]:
+                        width, height = height, width
+                    return width, height, channels
+                if marker == 0xe1:
+                    # APP1段中的EXIF，在SOF段之前
+                    segment = fo.read(length - 2)
+                    orientation = read_exif_orientation(segment)
+                    continue
+                fo.seek(length - 2, 1)
+
+    return None
+
+def read_exif_orientation(segment):
+    """
+    从APP1段中读取EXIF的方向（tag 0x0112），只查找第一个IFD
+    输入：segment - APP1段的内容，不包括段长度
+    输出：orientation - 1~8，没有EXIF或者没有方向时返回1
+    """
+    if segment[0:6] != b'Exif\x00\x00' or len(segment) < 14:
+        return 1
+    tiff = segment[6:]
+    if tiff[0:2] == b'II':
+        order = '<'
+    elif tiff[0:2] == b'MM':
+        order = '>'
+    else:
+        return 1
+    ifd_offset = struct.unpack(order + 'I', tiff[4:8])[0]
+    if ifd_offset + 2 > len(tiff):
+        return 1
+    n_entries = struct.unpack(order + 'H', tiff[ifd_offset: ifd_offset+2])[0]
+    for i in range(n_entries):
+        start = ifd_offset + 2 + 12 * i
+        if start + 12 > len(tiff):
+            break
+        tag, dtype = struct.unpack(order + 'HH', tiff[start: start+4])
+        # 方向的类型是SHORT，值保存在value字段的前两个字节
+        if tag == 0x0112 and dtype == 3:
+            orientation = struct.unpack(order + 'H', tiff[start+8: start+10])[0]
+            return orientation if 1 <= orientation <= 8 else 1
+
+    return 1
+
+def get_file_md5(path):
+    md5 = hashlib.md5()
+    with open(path, 'rb') as fo:
+        for chunk in iter(lambda: fo.read(1024 * 1024), b''):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
+if __name__ == '__main__':
+    # python -m src.data.image_meta datasets/voc/train.txt datasets/voc/valid.txt
+    for image_paths_file in sys.argv[1:]:
+        with open(image_paths_file, 'r') as fo:
+            image_paths = [line.strip() for line in fo if line.strip()]
+        meta_index = load_meta_index(image_paths_file, image_paths)
+        invalid_paths = meta_index.validate(is_check_md5=True)
+        print('%s: %d images, %d invalid' % (image_paths_file, len(image_paths), len(invalid_paths)))
+        for path in invalid_paths:
+            print(path)
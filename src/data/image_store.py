@@ -0,0 +1,75 @@
+# -*- coding: utf8 -*-
+# description: lazy image store in object detection
+from __future__ import print_function
+import collections
+import threading
+import cv2
+
+
+"""
+图片存储类：按需解码图片，并用字节预算的LRU缓存保存最近使用的图片
+"""
+class ImageStore:
+
+    def __init__(self, max_bytes):
+        """
+        输入：max_bytes - 缓存的字节预算，超过预算时淘汰最久未使用的图片，0表示不缓存
+        注意：缓存属于各个进程自己，fork出的生产者各自拥有一份max_bytes的预算
+        """
+        self.max_bytes = max_bytes
+        self.cur_bytes = 0
+        self.cache = collections.OrderedDict()
+        self.n_hits = 0
+        self.n_misses = 0
+        # 多线程读取数据时保护cache，解码在锁外进行
+        self.lock = threading.Lock()
+
+    def get(self, image_path):
+        """
+        读取一张图片，命中缓存时直接返回，否则解码并放入缓存
+        输入：image_path - 图片路径
+        输出：image - BGR图片，numpy.array，调用方不能原地修改
+        """
+        with self.lock:
+            if image_path in self.cache:
+                image = self.cache.pop(image_path)
+                self.cache[image_path] = image
+                self.n_hits += 1
+                return image
+
+        image = read_image(image_path)
+
+        with self.lock:
+            self.n_misses += 1
+            if image.nbytes <= self.max_bytes and image_path not in self.cache:
+                self.cache[image_path] = image
+                self.cur_bytes += image.nbytes
+                while self.cur_bytes > self.max_bytes:
+                    _, old_image = self.cache.popitem(last=False)
+                    self.cur_bytes -= old_image.nbytes
+
+        return image
+
+    def get_stats(self):
+        """
+        输出：缓存的命中情况和占用内存，生产者打印耗时时一起打印，用于确定image_cache_size
+        """
+        n_requests = self.n_hits + self.n_misses
+        hit_rate = 1.0 * self.n_hits / n_requests if n_requests > 0 else 0.0
+        return 'cache images: %d, cache size: %.2fMB / %.2fMB, hit rate: %.4f' % (
+            len(self.cache), self.cur_bytes / 1024.0 / 1024.0,
+            self.max_bytes / 1024.0 / 1024.0, hit_rate)
+
+
+def read_image(image_path):
+    """
+    解码一张图片
+    输入：image_path - 图片路径
+    输出：image - BGR图片，numpy.array
+    """
+    image = cv2.imread(image_path)
+    if image is None:
+        print(image_path)
+        raise('ERROR: image cannot be decoded!')
+
+    return image
@@ -0,0 +1,133 @@
+# -*- coding: utf8 -*-
+# description: packed label manifest in object detection
+from __future__ import print_function
+import sys
+import os
+import numpy
+
+
+"""
+标签清单类：一个数据集的所有标签打包在一个npz文件中，读取时只需要打开一次文件
+paths - 图片路径，offsets - 每张图片的标签在labels中的起止位置，
+labels - 所有物体的标签，每一行为[class_id, x, y, w, h]，与Labels/*.txt中的格式相同
+label_sizes, label_mtimes - 写入清单时每个Labels/*.txt的大小和修改时间，用于发现过期的清单
+"""
+class LabelManifest:
+
+    def __init__(self, manifest_path):
+        with numpy.load(manifest_path) as data:
+            self.paths = data['paths']
+            self.offsets = data['offsets']
+            self.labels = data['labels']
+            # 旧的清单没有记录标签文件的状态，整体认为过期
+            self.label_sizes = data['label_sizes'] if 'label_sizes' in data else None
+            self.label_mtimes = data['label_mtimes'] if 'label_mtimes' in data else None
+        self.path_index = dict((str(path), i) for i, path in enumerate(self.paths))
+
+    def get(self, image_path):
+        """
+        读取一张图片的标签
+        输入：image_path - 图片路径
+        输出：label - 尺寸(n_objects, 5)，每一行为[class_id, x, y, w, h]
+        """
+        if image_path not in self.path_index:
+            print(image_path)
+            raise('ERROR: image path not in label manifest!')
+        i = self.path_index[image_path]
+
+        return self.labels[self.offsets[i]: self.offsets[i+1]]
+
+    def get_stale_paths(self, image_paths, is_check_labels=False):
+        """
+        检查清单是否过期：图片不在清单中，只在内存中查找，不访问文件系统
+        is_check_labels时还检查Labels/*.txt的大小、修改时间与写入清单时是否相同，
+        每个标签文件读取一次状态，不打开文件，标签文件不存在时只能使用清单中的标签
+        输入1：image_paths - 图片路径list
+        输入2：is_check_labels - 是否检查每个标签文件的状态，在网络文件系统上每张图片多一次元数据请求
+        输出：stale_paths - 标签过期的图片路径list
+        """
+        stale_paths = []
+        for image_path in image_paths:
+            i = self.path_index.get(image_path)
+            if i is None or (is_check_labels and self.label_mtimes is None):
+                stale_paths.append(image_path)
+                continue
+            if not is_check_labels:
+                continue
+            label_path = get_label_path(image_path)
+            if not os.path.exists(label_path):
+                continue
+            stat = os.stat(label_path)
+            if stat.st_size != self.label_sizes[i] or stat.st_mtime != self.label_mtimes[i]:
+                stale_paths.append(image_path)
+
+        return stale_paths
+
+
+def get_label_path(image_path):
+    """
+    图片对应的标签文件路径，例如Images/1.jpg对应Labels/1.txt
+    """
+    return image_path.replace('Images', 'Labels').replace('.jpg', '.txt')
+
+def get_manifest_path(image_paths_file):
+    """
+    图片路径文件对应的标签清单路径，例如train.txt对应train_labels.npz
+    """
+    return os.path.splitext(image_paths_file)[0] + '_labels.npz'
+
+def write_label_manifest(manifest_path, image_paths, labels):
+    """
+    写入标签清单
+    输入1：manifest_path - 标签清单路径
+    输入2：image_paths - 图片路径list
+    输入3：labels - 每张图片的标签list，每一个元素为[[class_id, x, y, w, h], ...]
+    同时记录每张图片的Labels/*.txt的大小和修改时间，标签文件不存在时记为-1
+    """
+    offsets = numpy.zeros((len(image_paths)+1, ), dtype='int64')
+    for i, label in enumerate(labels):
+        offsets[i+1] = offsets[i] + len(label)
+    packed_labels = numpy.zeros((offsets[-1], 5), dtype='float32')
+    for i, label in enumerate(labels):
+        if len(label) > 0:
+            packed_labels[offsets[i]: offsets[i+1]] = numpy.array(label, dtype='float32')
+    label_sizes = numpy.zeros((len(image_paths), ), dtype='int64') - 1
+    label_mtimes = numpy.zeros((len(image_paths), ), dtype='float64') - 1
+    for i, image_path in enumerate(image_paths):
+        label_path = get_label_path(image_path)
+        if os.path.exists(label_path):
+            stat = os.stat(label_path)
+            label_sizes[i], label_mtimes[i] = stat.st_size, stat.st_mtime
+
+    # 先写临时文件再重命名，避免中断时留下不完整的清单
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path, 'wb') as fw:
+        numpy.savez(fw, paths=numpy.array(image_paths, dtype='U'),
+            offsets=offsets, labels=packed_labels, label_sizes=label_sizes, label_mtimes=label_mtimes)
+    os.rename(tmp_path, manifest_path)
+    print('write %d labels of %d images to %s' % (offsets[-1], len(image_paths), manifest_path))
+
+def build_from_label_files(image_paths_file):
+    """
+    根据已有的Labels/*.txt生成标签清单，用于已经生成好的数据集
+    输入：image_paths_file - 图片路径文件
+    """
+    image_paths, labels = [], []
+    with open(image_paths_file, 'r') as fo:
+        for line in fo:
+            image_path = line.strip()
+            label = []
+            with open(get_label_path(image_path), 'r') as fl:
+                for label_line in fl:
+                    infos = label_line.strip().split(' ')
+                    label.append([int(infos[0])] + [float(t) for t in infos[1:5]])
+            image_paths.append(image_path)
+            labels.append(label)
+
+    write_label_manifest(get_manifest_path(image_paths_file), image_paths, labels)
+
+
+if __name__ == '__main__':
+    # python -m src.data.label_manifest datasets/voc/train.txt datasets/voc/valid.txt
+    for image_paths_file in sys.argv[1:]:
+        build_from_label_files(image_paths_file)
@@ -0,0 +1,139 @@
+# -*- coding: utf8 -*-
+# description: persistent letterbox cache in object detection
+from __future__ import print_function
+import sys
+import os
+import time
+import json
+import glob
+import hashlib
+import numpy
+
+
+"""
+letterbox缓存类：将letterbox之后的图片和变换后的标签写入磁盘，按内存映射的方式读取
+每个数据集对应一个images文件(n, image_y_size, image_x_size, 3)和一个labels文件(n, max_objects, 5)
+"""
+class LetterboxCache:
+
+    version = 1
+
+    def __init__(self, cache_dir, image_x_size, image_y_size, max_objects):
+        """
+        输入1：cache_dir - 缓存文件存放的目录
+        输入2：image_x_size, image_y_size - letterbox之后的图片尺寸
+        输入3：max_objects - 每张图片最多的物体数
+        """
+        self.cache_dir = cache_dir
+        self.image_x_size = image_x_size
+        self.image_y_size = image_y_size
+        self.max_objects = max_objects
+        self.images = {}
+        self.labels = {}
+
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+    def get_key(self, datasets):
+        """
+        计算缓存的key，图片尺寸、配置、路径列表、标签或图片内容变化时key都会变化
+        输入：datasets - 数据集，每一个元素是一个数据item
+        输出：key - 缓存的key
+        """
+        md5 = hashlib.md5()
+        config = {'version': self.version, 'image_x_size': self.image_x_size,
+            'image_y_size': self.image_y_size, 'max_objects': self.max_objects}
+        md5.update(json.dumps(config, sort_keys=True).encode('utf8'))
+        for item in datasets:
+            md5.update(item['image_path'].encode('utf8'))
+            md5.update(numpy.ascontiguousarray(item['label'], dtype='float32').tobytes())
+            # 图片内容改变时缓存也失效
+            if 'image_md5' in item:
+                md5.update(item['image_md5'].encode('utf8'))
+
+        return md5.hexdigest()[0:16]
+
+    def load(self, mode, datasets, processor):
+        """
+        读取某个数据集的缓存，缓存不存在或已经失效时重新生成
+        输入1：mode - 数据集名称，train/valid/traineval/test
+        输入2：datasets - 数据集，每一个元素是一个数据item
+        输入3：processor - 用于读取图片和做letterbox的Processor
+        """
+        key = self.get_key(datasets)
+        prefix = os.path.join(self.cache_dir, '%s_%s' % (mode, key))
+        images_path, labels_path = prefix + '.images.npy', prefix + '.labels.npy'
+
+        if not (os.path.exists(images_path) and os.path.exists(labels_path)):
+            self._remove_stale(mode)
+            self.build(datasets, images_path, labels_path, processor)
+
+        self.images[mode] = numpy.load(images_path, mmap_mode='r')
+        self.labels[mode] = numpy.load(labels_path, mmap_mode='r')
+        if self.images[mode].shape[0] != len(datasets) or \
+            self.labels[mode].shape[0] != len(datasets):
+            raise('ERROR: letterbox cache does not match datasets!')
+        print('read letterbox cache from %s' % (images_path))
+        sys.stdout.flush()
+
+    def build(self, datasets, images_path, labels_path, processor):
+        """
+        生成缓存文件，先写临时文件再重命名，避免中断时留下不完整的缓存
+        """
+        st = time.time()
+        n = len(datasets)
+        tmp_images_path = images_path + '.tmp'
+        tmp_labels_path = labels_path + '.tmp'
+        images = numpy.lib.format.open_memmap(tmp_images_path, mode='w+', dtype='uint8',
+            shape=(n, self.image_y_size, self.image_x_size, 3))
+        labels = numpy.lib.format.open_memmap(tmp_labels_path, mode='w+', dtype='float32',
+            shape=(n, self.max_objects, 5))
+
+        # 多线程解码和letterbox，每个线程直接写入自己负责的位置
+        def _convert(i):
+            item = datasets[i]
+            image = processor._get_image_from_path(item['image_path'])
+            label = numpy.array(item['label'], dtype='float32')
+            _, new_labels = processor.convert_batch_infos([image], [label], out=images[i:i+1])
+            labels[i] = new_labels[0]
+        
+        processor._parallel_map(_convert, list(range(n)), name='build letterbox cache')
+
+        images.flush()
+        labels.flush()
+        del images, labels
+        os.rename(tmp_images_path, images_path)
+        os.rename(tmp_labels_path, labels_path)
+
+        et = time.time()
+        print('build letterbox cache %s time: %.2fs' % (images_path, et - st))
+        sys.stdout.flush()
+
+    def get_batch(self, mode, indexs, out=None):
+        """
+        读取一个batch的缓存
+        输入1：mode - 数据集名称
+        输入2：indexs - 每条数据在整个数据集中的index
+        输入3：out - 预先分配的uint8数组，尺寸(len(indexs), image_y_size, image_x_size, 3)，为None时新分配
+               图片从内存映射直接读到out中，只拷贝一次，例如out为shared_memory中的slot
+        输出1：batch_images - uint8图片，即out
+        输出2：batch_labels - 变换后的标签，尺寸(batch_size, max_objects, 5)
+        """
+        if out is None:
+            out = numpy.empty((len(indexs), self.image_y_size, self.image_x_size, 3), dtype='uint8')
+        # mode为raise时numpy会先写到临时数组再拷贝到out，index都是合法的，使用clip避免这次拷贝
+        numpy.take(self.images[mode], indexs, axis=0, out=out, mode='clip')
+        batch_labels = numpy.array(self.labels[mode][indexs], dtype='float32')
+
+        return out, batch_labels
+
+    def get_image(self, mode, index):
+        """
+        读取一张缓存图片，返回内存映射上的只读视图，不发生拷贝
+        """
+        return self.images[mode][index]
+
+    def _remove_stale(self, mode):
+        for path in glob.glob(os.path.join(self.cache_dir, '%s_*.npy' % (mode))) + \
+            glob.glob(os.path.join(self.cache_dir, '%s_*.npy.tmp' % (mode))):
+            os.remove(path)
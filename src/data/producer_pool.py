@@ -0,0 +1,210 @@
+# -*- coding: utf8 -*-
+# description: supervised producer pool in object detection
+from __future__ import print_function
+import sys
+import os
+import time
+import signal
+import multiprocessing as mp
+from multiprocessing.sharedctypes import Array, Value
+
+
+"""
+生产者池类：启动n_processes个生产者进程，通过心跳监控生产者的状态
+生产者退出或者长时间没有心跳时，按指数退避的间隔重启，训练结束时统一关闭
+生产者由一个监督进程启动、监控和重启，监督进程在主进程创建tf.Session之前fork出来，
+之后主进程不再fork，不会在tf的线程中或者初始化CUDA之后fork
+重启的生产者使用相同的produce_index，会接着写旧的生产者在SharedMemory中没有写完的slot
+"""
+class ProducerPool:
+
+    def __init__(self, target, n_processes, env=None,
+        heartbeat_timeout=120.0, min_backoff=1.0, max_backoff=60.0, check_interval=1.0, name='producer'):
+        """
+        输入1：target - 生产者函数，调用方式为target(produce_index, heartbeat=heartbeat)，
+               生产者调用heartbeat(n_batches)报告进度，调用heartbeat(is_waiting=True)报告正在等待
+        输入2：n_processes - 生产者的个数
+        输入3：env - 生产者进程中需要设置的环境变量，例如{'CUDA_VISIBLE_DEVICES': ''}
+        输入4：heartbeat_timeout - 超过这个秒数没有心跳的生产者会被重启
+        输入5：min_backoff, max_backoff - 重启间隔的最小值和最大值，连续失败时间隔加倍
+        输入6：check_interval - 监督进程检查生产者状态的间隔秒数
+        """
+        self.target = target
+        self.n_processes = n_processes
+        self.env = env if env else {}
+        self.heartbeat_timeout = heartbeat_timeout
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.check_interval = check_interval
+        self.name = name
+
+        # 心跳时间、已经生产的batch数和开始等待空闲slot的时间（没有等待时为0），由生产者写入，由监督进程和主进程读取
+        # 等待中的生产者不更新心跳，也不会因为没有心跳被重启，消费者变慢时由消费者的watchdog报告
+        self.heartbeats = Array('d', self.n_processes, lock=False)
+        self.batch_counts = Array('l', self.n_processes, lock=False)
+        self.wait_times = Array('d', self.n_processes, lock=False)
+        # 生产者的pid（没有运行时为0）和重启次数，由监督进程写入，由主进程读取
+        self.pids = Array('l', self.n_processes, lock=False)
+        self.restarts = Array('l', self.n_processes, lock=False)
+        self.is_stopped = Value('i', 0, lock=False)
+        self.supervisor = None
+
+        # 只在监督进程中使用
+        self.processes = [None] * self.n_processes
+        self.failures = [0] * self.n_processes
+        self.start_counts = [0] * self.n_processes
+        self.restart_times = [0.0] * self.n_processes
+        
+        # 只在主进程中使用
+        self.stat_counts = [0] * self.n_processes
+        self.stat_time = time.time()
+
+    def start(self):
+        """
+        fork监督进程，由它启动所有生产者，需要在创建tf.Session之前调用
+        """
+        self.supervisor = mp.Process(target=self._supervise, name='%s_supervisor' % (self.name))
+        self.supervisor.start()
+        self.stat_time = time.time()
+
+    def check(self):
+        """
+        检查生产者的状态，在消费者中周期性地调用，只读取共享的状态，重启由监督进程完成
+        输出：n_alive - 正在运行的生产者个数
+        """
+        if self.supervisor is not None and not self.supervisor.is_alive() and not self.is_stopped.value:
+            print('%s_supervisor exit with code %s' % (self.name, str(self.supervisor.exitcode)))
+            raise('ERROR: producer supervisor exited!')
+
+        return sum([1 for pid in self.pids if pid > 0])
+
+    def stop(self, timeout=5.0):
+        """
+        关闭所有生产者，没有在timeout秒内退出的生产者被强制杀死
+        """
+        self.is_stopped.value = 1
+        if self.supervisor is None:
+            return
+        # 监督进程依次关闭每个生产者
+        self.supervisor.join(timeout * (self.n_processes + 1) + self.check_interval)
+        if self.supervisor.is_alive():
+            self.supervisor.kill()
+            self.supervisor.join()
+            for index in range(self.n_processes):
+                if self.pids[index] > 0:
+                    try:
+                        os.kill(self.pids[index], signal.SIGKILL)
+                    except OSError:
+                        pass
+                    self.pids[index] = 0
+
+    def get_stats(self):
+        """
+        获取每个生产者的状态，速度按照两次调用get_stats之间的batch数计算
+        输出：stats - 每个生产者的状态dict，包含pid、是否存活、重启次数、batch数、batches/sec
+              和已经等待空闲slot的秒数
+        """
+        now = time.time()
+        spend = max(now - self.stat_time, 1e-6)
+        stats = []
+        for index in range(self.n_processes):
+            n_batches = self.batch_counts[index]
+            stats.append({
+                'name': '%s%d' % (self.name, index),
+                'pid': self.pids[index] if self.pids[index] > 0 else None,
+                'alive': self.pids[index] > 0,
+                'restarts': self.restarts[index],
+                'batches': n_batches,
+                'batches_per_sec': 1.0 * (n_batches - self.stat_counts[index]) / spend,
+                'waiting': now - self.wait_times[index] if self.wait_times[index] > 0 else 0.0})
+            self.stat_counts[index] = n_batches
+        self.stat_time = now
+
+        return stats
+
+    def heartbeat(self, index, n_batches=0, is_waiting=False):
+        """
+        生产者调用，更新心跳时间和已经生产的batch数，is_waiting时只记录开始等待的时间
+        """
+        if is_waiting:
+            if self.wait_times[index] == 0:
+                self.wait_times[index] = time.time()
+            return
+        self.heartbeats[index] = time.time()
+        self.wait_times[index] = 0
+        self.batch_counts[index] += n_batches
+
+    def _supervise(self):
+        # 主进程退出之后监督进程也退出，关闭所有生产者
+        parent_pid = os.getppid()
+        for index in range(self.n_processes):
+            self._start_worker(index)
+        try:
+            while not self.is_stopped.value and os.getppid() == parent_pid:
+                self._check_workers()
+                time.sleep(self.check_interval)
+        finally:
+            for index in range(self.n_processes):
+                self._stop_worker(index)
+
+    def _check_workers(self):
+        """
+        在监督进程中检查每个生产者，退出或者卡住的生产者在退避时间之后重启
+        """
+        now = time.time()
+        for index in range(self.n_processes):
+            process = self.processes[index]
+            if process is None:
+                # 等待退避时间结束之后重启
+                if now >= self.restart_times[index]:
+                    self._start_worker(index)
+                continue
+
+            if not process.is_alive():
+                reason = 'exit with code %s' % (str(process.exitcode))
+            elif self.wait_times[index] == 0 and now - self.heartbeats[index] > self.heartbeat_timeout:
+                reason = 'no heartbeat in %.0fs' % (now - self.heartbeats[index])
+            else:
+                continue
+
+            self._stop_worker(index)
+            # 重启之后生产过数据的生产者，失败次数清零
+            if self.batch_counts[index] > self.start_counts[index]:
+                self.failures[index] = 0
+            backoff = min(self.min_backoff * (2 ** self.failures[index]), self.max_backoff)
+            self.failures[index] += 1
+            self.restarts[index] += 1
+            self.restart_times[index] = now + backoff
+            print('WARNING: %s%d %s, restart in %.1fs' % (self.name, index, reason, backoff))
+            sys.stdout.flush()
+
+    def _run(self, index):
+        os.environ.update(self.env)
+        self.heartbeat(index)
+        self.target(index, heartbeat=lambda n_batches=0, is_waiting=False: \
+            self.heartbeat(index, n_batches, is_waiting))
+
+    def _start_worker(self, index):
+        self.heartbeats[index] = time.time()
+        self.wait_times[index] = 0
+        self.start_counts[index] = self.batch_counts[index]
+        process = mp.Process(target=self._run, args=(index, ), name='%s%d' % (self.name, index))
+        process.daemon = True
+        process.start()
+        self.processes[index] = process
+        self.pids[index] = process.pid
+
+    def _stop_worker(self, index, timeout=5.0):
+        process = self.processes[index]
+        if process is None:
+            return
+        if process.is_alive():
+            process.terminate()
+            process.join(timeout)
+            if process.is_alive():
+                process.kill()
+                process.join()
+        else:
+            process.join()
+        self.processes[index] = None
+        self.pids[index] = 0
@@ -0,0 +1,191 @@
+# -*- coding: utf8 -*-
+# description: epoch sampler and aspect ratio bucket sampler in object detection
+from __future__ import print_function
+import numpy
+
+
+"""
+采样类：按epoch无放回地打乱数据，并把index空间分成n_shards份，每个生产者只采样自己的一份
+所有生产者使用相同的seed，每个epoch得到相同的排列，因此不同生产者之间不会重叠
+"""
+class EpochSampler:
+
+    def __init__(self, n_items, batch_size, n_shards=1, shard_index=0, seed=0):
+        """
+        输入1：n_items - 数据集的大小
+        输入2：batch_size - 每个batch的大小
+        输入3：n_shards - 分片的个数，一般等于生产者的个数
+        输入4：shard_index - 当前生产者负责的分片
+        输入5：seed - 随机种子
+        """
+        self.n_items = n_items
+        self.batch_size = batch_size
+        self.n_shards = n_shards
+        self.shard_index = shard_index
+        self.seed = seed
+
+        # 每个分片的大小相同，多出的数据在这个epoch中不使用
+        self.shard_size = int(self.n_items / self.n_shards)
+        self.n_batches = int(self.shard_size / self.batch_size)
+        if self.n_batches == 0:
+            raise('ERROR: shard size is smaller than batch size!')
+
+        self.epoch = 0
+        self.position = 0
+        self.shard_indexs = self._get_shard_indexs(self.epoch)
+
+    def next_batch(self):
+        """
+        获取下一个batch的index，一个epoch采样完之后重新打乱
+        输出1：batch_indexs - 每条数据在整个数据集中的index
+        输出2：epoch - 这个batch所在的epoch
+        输出3：position - 这个batch在当前分片中的序号
+        """
+        if self.position >= self.n_batches:
+            self.epoch += 1
+            self.position = 0
+            self.shard_indexs = self._get_shard_indexs(self.epoch)
+
+        start = self.position * self.batch_size
+        batch_indexs = self.shard_indexs[start: start+self.batch_size]
+        epoch, position = self.epoch, self.position
+        self.position += 1
+
+        return batch_indexs, epoch, position
+
+    def resume(self, epoch, position):
+        """
+        从指定的epoch和序号继续采样，重启的生产者用它接着旧的生产者采样
+        输入1：epoch - 下一个batch所在的epoch
+        输入2：position - 下一个batch在分片中的序号
+        """
+        self.epoch = epoch
+        self.position = position
+        self.shard_indexs = self._get_shard_indexs(self.epoch)
+
+    def _get_shard_indexs(self, epoch):
+        random_state = numpy.random.RandomState((self.seed * 100003 + epoch) % (2**32))
+        indexs = random_state.permutation(self.n_items)
+        return indexs[self.shard_index: self.shard_size*self.n_shards: self.n_shards]
+
+
+"""
+按宽高比分桶的采样类：与EpochSampler相同地按epoch打乱和分片，再在分片内把同一个桶的数据组成batch
+每个batch中的图片属于同一个桶，使用同一个输入尺寸，每个桶中不足一个batch的数据在这个epoch中不使用
+"""
+class BucketSampler:
+
+    def __init__(self, bucket_indexs, batch_size, n_shards=1, shard_index=0, seed=0, max_empty_epochs=100):
+        """
+        输入1：bucket_indexs - 每条数据所属的桶，numpy.array，尺寸(n_items, )
+        输入2：batch_size - 每个batch的大小
+        输入3：n_shards - 分片的个数，一般等于生产者的个数
+        输入4：shard_index - 当前生产者负责的分片
+        输入5：seed - 随机种子
+        输入6：max_empty_epochs - 最多连续跳过的没有batch的epoch数，超过时认为分片太小
+        """
+        self.bucket_indexs = numpy.asarray(bucket_indexs, dtype='int32')
+        self.n_items = self.bucket_indexs.shape[0]
+        self.batch_size = batch_size
+        self.n_shards = n_shards
+        self.shard_index = shard_index
+        self.seed = seed
+        self.max_empty_epochs = max_empty_epochs
+
+        # 分片中的数据不少于n_buckets*(batch_size-1)+1时，每个epoch都至少有一个batch，
+        # 否则打乱之后分片中的每个桶都可能不足一个batch，需要跳过这样的epoch
+        self.shard_size = int(self.n_items / self.n_shards)
+        n_buckets = numpy.unique(self.bucket_indexs).shape[0]
+        self.is_always_full = self.shard_size >= n_buckets * (self.batch_size - 1) + 1
+        self.epoch = 0
+        self.position = 0
+        self.shard_batches = self._get_shard_batches(self.epoch)
+        # 在构造时检查分片能否得到batch，不能时直接报错，而不是在生产者中卡住
+        self._skip_empty_epochs()
+
+    def next_batch(self):
+        """
+        获取下一个batch的index，一个epoch采样完之后重新打乱
+        输出1：batch_indexs - 每条数据在整个数据集中的index
+        输出2：epoch - 这个batch所在的epoch
+        输出3：position - 这个batch在当前分片中的序号
+        """
+        if self.position >= len(self.shard_batches):
+            self.epoch += 1
+            self.position = 0
+            self.shard_batches = self._get_shard_batches(self.epoch)
+            self._skip_empty_epochs()
+
+        batch_indexs = self.shard_batches[self.position]
+        epoch, position = self.epoch, self.position
+        self.position += 1
+
+        return batch_indexs, epoch, position
+
+    def resume(self, epoch, position):
+        """
+        从指定的epoch和序号继续采样，重启的生产者用它接着旧的生产者采样
+        输入1：epoch - 下一个batch所在的epoch
+        输入2：position - 下一个batch在分片中的序号
+        """
+        self.epoch = epoch
+        self.position = position
+        self.shard_batches = self._get_shard_batches(self.epoch)
+
+    def _skip_empty_epochs(self):
+        """
+        当前epoch的分片中没有batch时，跳到下一个有batch的epoch，
+        连续max_empty_epochs个epoch都没有batch时报错
+        """
+        n_empty_epochs = 0
+        while len(self.shard_batches) == 0:
+            n_empty_epochs += 1
+            if self.is_always_full or n_empty_epochs > self.max_empty_epochs:
+                raise('ERROR: no bucket in shard %d reaches batch size in %d epochs!' % (
+                    self.shard_index, n_empty_epochs))
+            self.epoch += 1
+            self.position = 0
+            self.shard_batches = self._get_shard_batches(self.epoch)
+
+    def _get_shard_batches(self, epoch):
+        random_state = numpy.random.RandomState((self.seed * 100003 + epoch) % (2**32))
+        indexs = random_state.permutation(self.n_items)
+        indexs = indexs[self.shard_index: self.shard_size*self.n_shards: self.n_shards]
+
+        # 桶内保持打乱后的顺序，所有桶的batch再一起打乱
+        shard_batches = []
+        shard_buckets = self.bucket_indexs[indexs]
+        for bucket in numpy.unique(shard_buckets):
+            bucket_items = indexs[shard_buckets == bucket]
+            n_batches = int(bucket_items.shape[0] / self.batch_size)
+            for i in range(n_batches):
+                shard_batches.append(bucket_items[i*self.batch_size: (i+1)*self.batch_size])
+        order = random_state.permutation(len(shard_batches))
+
+        return [shard_batches[i] for i in order]
+
+
+def get_fill_ratios(image_sizes, input_sizes):
+    """
+    计算每张图片letterbox到每个输入尺寸之后，图片内容占画布的比例，其余部分是填充
+    输入1：image_sizes - 每张图片的(width, height)，尺寸(n_items, 2)
+    输入2：input_sizes - 每个输入尺寸的(image_x_size, image_y_size)，尺寸(n_sizes, 2)
+    输出：fill_ratios - 尺寸(n_items, n_sizes)
+    """
+    image_sizes = numpy.array(image_sizes, dtype='float64').reshape((-1, 2))
+    input_sizes = numpy.array(input_sizes, dtype='float64').reshape((-1, 2))
+    image_ratios = image_sizes[:,0:1] / image_sizes[:,1:2]
+    input_ratios = (input_sizes[:,0] / input_sizes[:,1])[None,:]
+
+    return numpy.minimum(image_ratios / input_ratios, input_ratios / image_ratios)
+
+def assign_buckets(image_sizes, input_sizes):
+    """
+    把每张图片分到填充比例最小的桶，也就是宽高比最接近的桶
+    输入1：image_sizes - 每张图片的(width, height)
+    输入2：input_sizes - 每个桶的输入尺寸(image_x_size, image_y_size)
+    输出：bucket_indexs - 每张图片所属的桶，numpy.array，尺寸(n_items, )
+    """
+    fill_ratios = get_fill_ratios(image_sizes, input_sizes)
+
+    return numpy.argmax(fill_ratios, axis=1).astype('int32')
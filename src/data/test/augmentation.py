@@ -0,0 +1,63 @@
+# -*- coding: utf8 -*-
+# description: timings and box alignment of batch augmentation, run with `python -m src.data.test.augmentation`
+from __future__ import print_function
+import numpy
+from src.data.augmentation import Augmentation
+
+n_iter = 20
+batch_size = 32
+max_objects = 30
+image_x_size = 448
+image_y_size = 448
+
+
+# 灰色图片上画一个白色的框，增强之后标签中的框应该仍然覆盖这个白色区域
+def random_batch(n_batch):
+    images = []
+    labels = numpy.zeros((n_batch, max_objects, 5), dtype='float32')
+    for b in range(n_batch):
+        orig_h, orig_w = numpy.random.randint(200, 600, size=(2, ))
+        image = numpy.zeros((orig_h, orig_w, 3), dtype='uint8') + 64
+        w, h = numpy.random.uniform(0.2, 0.5, size=(2, ))
+        x, y = numpy.random.uniform(0.3, 0.7, size=(2, ))
+        left, right = int(round((x - w / 2.0) * orig_w)), int(round((x + w / 2.0) * orig_w))
+        top, bottom = int(round((y - h / 2.0) * orig_h)), int(round((y + h / 2.0) * orig_h))
+        image[top:bottom, left:right] = 255
+        images.append(image)
+        labels[b,0] = [1, 1.0 * (left + right) / 2.0 / orig_w, 1.0 * (top + bottom) / 2.0 / orig_h, 
+            1.0 * (right - left) / orig_w, 1.0 * (bottom - top) / orig_h]
+    return images, labels
+
+def check_boxes(images, labels):
+    n_boxes = 0
+    for image, label in zip(images, labels):
+        [_, x, y, w, h] = label[0]
+        if w == 0 or h == 0:
+            continue
+        left, right = int(round((x - w / 2.0) * image_x_size)), int(round((x + w / 2.0) * image_x_size))
+        top, bottom = int(round((y - h / 2.0) * image_y_size)), int(round((y + h / 2.0) * image_y_size))
+        # 去掉边缘上插值的像素
+        inner = image[top+2:bottom-2, left+2:right-2, 0]
+        if inner.size > 0 and inner.min() < 250:
+            raise Exception('ERROR: box does not match image!')
+        n_boxes += 1
+    return n_boxes
+
+def main():
+    numpy.random.seed(0)
+    augmentation = Augmentation(['random_resize', 'flip'], image_x_size, image_y_size)
+    out = numpy.empty((batch_size, image_y_size, image_x_size, 3), dtype='uint8')
+
+    n_boxes = 0
+    for i in range(n_iter):
+        batch_images, batch_labels = random_batch(batch_size)
+        new_images, new_labels = augmentation(batch_images, batch_labels, out=out)
+        n_boxes += check_boxes(new_images, new_labels)
+
+    print('%d boxes match the augmented images in %d batches' % (n_boxes, n_iter))
+    for name, spend in augmentation.get_timings():
+        print('%s: %.2fms per batch' % (name, spend))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+# -*- coding: utf8 -*-
+# description: square letterbox vs aspect ratio buckets, run with `python -m src.data.test.bucket [datasets/voc/train.txt]`
+from __future__ import print_function
+import sys
+import time
+import numpy
+from src.data.data_basic import Processor
+from src.data.sampler import BucketSampler, assign_buckets, get_fill_ratios
+
+n_images = 2000
+n_iter = 20
+batch_size = 32
+max_objects = 30
+image_x_size = 448
+image_y_size = 448
+bucket_sizes = [(448, 448), (320, 448), (448, 320)]
+
+
+# 模拟文档页面：大部分是竖版A4，少部分是横版和接近正方形的图片
+def random_image_sizes(n):
+    kinds = numpy.random.choice(3, size=(n, ), p=[0.7, 0.2, 0.1])
+    widths = numpy.random.randint(600, 1200, size=(n, ))
+    ratios = numpy.where(kinds == 0, 1.414, numpy.where(kinds == 1, 0.707, 1.0))
+    ratios = ratios * numpy.random.uniform(0.95, 1.05, size=(n, ))
+    heights = (widths * ratios).astype('int64')
+    return numpy.stack([widths, heights], axis=1)
+
+def random_batch(image_sizes):
+    images, labels = [], []
+    for w, h in image_sizes:
+        images.append(numpy.random.randint(0, 256, size=(h, w, 3)).astype('uint8'))
+        label = numpy.zeros((max_objects, 5), dtype='float32')
+        n_objects = numpy.random.randint(0, max_objects+1)
+        label[0:n_objects,0] = numpy.random.randint(1, 21, size=(n_objects, ))
+        label[0:n_objects,1:5] = numpy.random.random((n_objects, 4))
+        labels.append(label)
+    return images, labels
+
+def main():
+    numpy.random.seed(0)
+    processor = Processor(
+        image_x_size=image_x_size, image_y_size=image_y_size, max_objects=max_objects,
+        n_classes=20, cell_x_size=7, cell_y_size=7, n_boxes=5, batch_size=batch_size,
+        n_channel=3, n_processes=1, n_iters=n_iter, buffer_size=2, bucket_sizes=bucket_sizes)
+    image_sizes = random_image_sizes(n_images)
+    bucket_indexs = assign_buckets(image_sizes, bucket_sizes)
+
+    # 填充像素的比例，以及每张图片输入网络的像素个数，卷积的计算量与它成正比
+    square_fill_ratios = get_fill_ratios(image_sizes, [(image_x_size, image_y_size)])[:,0]
+    bucket_fill_ratios = get_fill_ratios(image_sizes, bucket_sizes)[numpy.arange(n_images), bucket_indexs]
+    bucket_pixels = numpy.array([x * y for x, y in bucket_sizes], dtype='float64')[bucket_indexs]
+    for bucket, (x, y) in enumerate(bucket_sizes):
+        print('bucket %dx%d: %d images' % (x, y, numpy.sum(bucket_indexs == bucket)))
+    print('padded pixels: square %.2f%%, buckets %.2f%%' % (
+        100.0 * (1.0 - numpy.mean(square_fill_ratios)), 100.0 * (1.0 - numpy.mean(bucket_fill_ratios))))
+    print('input pixels per image: square %d, buckets %d, estimated conv images/sec gain: %.2fx' % (
+        image_x_size * image_y_size, numpy.mean(bucket_pixels),
+        image_x_size * image_y_size / numpy.mean(bucket_pixels)))
+
+    # 每个batch中的图片属于同一个桶
+    sampler = BucketSampler(bucket_indexs, batch_size, seed=0)
+    batches = [sampler.next_batch()[0] for _ in range(n_iter)]
+    for batch_indexs in batches:
+        if numpy.unique(bucket_indexs[batch_indexs]).shape[0] != 1:
+            raise Exception('ERROR: batch contains different buckets!')
+
+    # 分片中每个桶都不足一个batch时，构造时报错，而不是在next_batch中一直重新打乱
+    small_bucket_indexs = numpy.array([0] * 16 + [1] * 15 + [2] * 15 + [3] * 15, dtype='int32')
+    try:
+        BucketSampler(small_bucket_indexs, 16, n_shards=2, shard_index=0, seed=0).next_batch()
+    except Exception:
+        print('small shards rejected')
+    else:
+        raise Exception('ERROR: small shards are not rejected!')
+    # 分片足够大时，跳过没有batch的epoch之后每个batch仍然属于同一个桶
+    for shard_index in range(2):
+        sampler = BucketSampler(bucket_indexs[0:120], batch_size, n_shards=2, shard_index=shard_index, seed=0)
+        for _ in range(n_iter):
+            batch_indexs = sampler.next_batch()[0]
+            if numpy.unique(bucket_indexs[batch_indexs]).shape[0] != 1:
+                raise Exception('ERROR: batch contains different buckets!')
+
+    # 生产者中letterbox的速度
+    square_out = numpy.empty((batch_size, image_y_size, image_x_size, 3), dtype='uint8')
+    bucket_outs = [numpy.empty((batch_size, y, x, 3), dtype='uint8') for x, y in bucket_sizes]
+    square_time, bucket_time = 0.0, 0.0
+    for batch_indexs in batches:
+        batch_images, batch_labels = random_batch(image_sizes[batch_indexs])
+
+        st = time.time()
+        processor.convert_batch_infos(batch_images, batch_labels, out=square_out)
+        square_time += time.time() - st
+
+        st = time.time()
+        processor.convert_batch_infos(batch_images, batch_labels,
+            out=bucket_outs[bucket_indexs[batch_indexs[0]]])
+        bucket_time += time.time() - st
+
+    print('square letterbox: %.2f images/sec' % (n_iter * batch_size / square_time))
+    print('bucket letterbox: %.2f images/sec' % (n_iter * batch_size / bucket_time))
+
+    # 给出数据集时，用真实的训练步骤测量分桶前后每秒训练的图片数，分桶时检测头需要是conv
+    if len(sys.argv) > 1:
+        from src.model.test.input_mode import run_train_steps
+        square_stats = run_train_steps(sys.argv[1], head='conv')
+        bucket_stats = run_train_steps(sys.argv[1], head='conv', bucket_sizes=bucket_sizes)
+        print()
+        for name, stats in [('square', square_stats), ('buckets', bucket_stats)]:
+            print('%s training: mean data time %.2fms, mean model time %.2fms, %.2f images/sec, batches: %s' % (
+                name, 1000.0 * stats['data_time'], 1000.0 * stats['model_time'], stats['images_per_sec'],
+                ', '.join(['%dx%d %d' % (x, y, n) for (x, y), n in sorted(stats['size_counts'].items())])))
+        print('measured images/sec gain: %.2fx' % (bucket_stats['images_per_sec'] / square_stats['images_per_sec']))
+
+
+if __name__ == '__main__':
+    main()
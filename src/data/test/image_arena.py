@@ -0,0 +1,75 @@
+# -*- coding: utf8 -*-
+# description: producer memory with per process image cache vs shared image arena, run with `python -m src.data.test.image_arena`
+from __future__ import print_function
+import os
+import shutil
+import tempfile
+import numpy
+import cv2
+import multiprocessing as mp
+from src.data.data_basic import Processor
+
+n_images = 300
+n_processes = 4
+
+
+def get_memory(pid):
+    """
+    读取进程的私有内存和按比例分摊的共享内存（MB）
+    """
+    infos = {}
+    with open('/proc/%d/smaps_rollup' % (pid), 'r') as fo:
+        for line in fo:
+            items = line.split()
+            if len(items) >= 2 and items[0].endswith(':'):
+                infos[items[0][:-1]] = float(items[1]) / 1024.0
+    return infos['Private_Clean'] + infos['Private_Dirty'], infos['Pss']
+
+# producer module: 读取所有图片，然后报告自己的内存
+def produce(processor, image_paths, queue, event):
+    for _ in range(2):
+        for image_path in image_paths:
+            image = processor._get_image_from_path(image_path)
+            int(image[0,0,0])
+    queue.put(get_memory(os.getpid()))
+    event.wait()
+
+def run(name, image_paths, **kwargs):
+    processor = Processor(
+        image_x_size=448, image_y_size=448, max_objects=30, n_classes=20, cell_x_size=7, 
+        cell_y_size=7, n_boxes=5, batch_size=32, n_channel=3, n_processes=n_processes, 
+        n_iters=1, buffer_size=2, **kwargs)
+    if processor.image_arena:
+        processor.image_arena.build(image_paths, processor)
+    
+    queue, event = mp.Queue(), mp.Event()
+    producers = [mp.Process(target=produce, args=(processor, image_paths, queue, event)) \
+        for _ in range(n_processes)]
+    for producer in producers:
+        producer.start()
+    memories = numpy.array([queue.get() for _ in producers])
+    parent_private, parent_pss = get_memory(os.getpid())
+    event.set()
+    for producer in producers:
+        producer.join()
+    print('%-6s\tproducer private: %.2fMB each, total pss: %.2fMB' % (
+        name, memories[:,0].mean(), memories[:,1].sum() + parent_pss))
+
+def main():
+    numpy.random.seed(0)
+    image_dir = tempfile.mkdtemp()
+    image_paths = []
+    for i in range(n_images):
+        image = numpy.random.randint(0, 256, size=(375, 500, 3)).astype('uint8')
+        image_paths.append(os.path.join(image_dir, '%d.png' % (i)))
+        cv2.imwrite(image_paths[-1], image)
+    
+    try:
+        run('lazy', image_paths, image_cache_size=1024, image_store_mode='lazy')
+        run('arena', image_paths, image_cache_size=1024, image_store_mode='arena')
+    finally:
+        shutil.rmtree(image_dir)
+
+
+if __name__ == '__main__':
+    main()
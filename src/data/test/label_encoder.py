@@ -0,0 +1,60 @@
+# -*- coding: utf8 -*-
+# description: batch label encoder vs per image label loop, run with `python -m src.data.test.label_encoder`
+from __future__ import print_function
+import time
+import numpy
+from src.data.data_basic import Processor
+
+n_iter = 20
+batch_size = 32
+max_objects = 30
+n_classes = 20
+
+
+def random_labels(n_batch):
+    labels = numpy.zeros((n_batch, max_objects, 5), dtype='float32')
+    for b in range(n_batch):
+        n_objects = numpy.random.randint(0, max_objects+1)
+        labels[b,0:n_objects,0] = numpy.random.randint(1, n_classes+1, size=(n_objects, ))
+        labels[b,0:n_objects,1:5] = numpy.random.random((n_objects, 4))
+        # 一部分图片的物体挤在同一个cell中，覆盖max_objects溢出的情况
+        if b % 4 == 0:
+            labels[b,0:n_objects,1:3] = 0.5
+    return labels
+
+def process_labels_loop(processor, batch_labels):
+    results = [processor._process_label(label) for label in batch_labels]
+    return [numpy.array([result[k] for result in results], dtype='float32') for k in range(6)]
+
+def main():
+    numpy.random.seed(0)
+    processor = Processor(
+        image_x_size=448, image_y_size=448, max_objects=max_objects, n_classes=n_classes,
+        cell_x_size=7, cell_y_size=7, n_boxes=5, batch_size=batch_size, n_channel=3,
+        n_processes=1, n_iters=n_iter, buffer_size=2)
+    names = ['coord_true', 'object_mask', 'class_true',
+        'unpos_coord_true', 'unpos_object_mask', 'object_nums']
+
+    loop_time, batch_time = 0.0, 0.0
+    for i in range(n_iter):
+        batch_labels = random_labels(batch_size)
+
+        st = time.time()
+        loop_results = process_labels_loop(processor, batch_labels)
+        loop_time += time.time() - st
+
+        st = time.time()
+        batch_results = processor.convert_batch_labels(batch_labels)
+        batch_time += time.time() - st
+
+        for name, loop_result, batch_result in zip(names, loop_results, batch_results):
+            if loop_result.dtype != batch_result.dtype or not numpy.array_equal(loop_result, batch_result):
+                raise Exception('ERROR: %s is different at iter %d!' % (name, i))
+
+    print('outputs are identical in %d batches' % (n_iter))
+    print('loop encoder: %.2fms per batch' % (1000.0 * loop_time / n_iter))
+    print('batch encoder: %.2fms per batch' % (1000.0 * batch_time / n_iter))
+
+
+if __name__ == '__main__':
+    main()
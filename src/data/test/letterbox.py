@@ -0,0 +1,96 @@
+# -*- coding: utf8 -*-
+# description: batch letterbox vs per image letterbox, run with `python -m src.data.test.letterbox`
+from __future__ import print_function
+import time
+import numpy
+import cv2
+from src.data.data_basic import Processor
+
+n_iter = 20
+batch_size = 32
+max_objects = 30
+image_x_size = 448
+image_y_size = 448
+
+
+# 旧的实现：每张图片新分配画布，标签逐个物体变换
+def convert_batch_infos_loop(batch_images, batch_labels):
+    new_batch_images, new_batch_labels = [], []
+    for i, image in enumerate(batch_images):
+        orig_h, orig_w = image.shape[0], image.shape[1]
+        canvas_image = numpy.zeros((image_y_size, image_x_size, 3), dtype='uint8') + 128
+        if 1.0 * orig_h / orig_w >= 1.0 * image_y_size / image_x_size:
+            new_h = int(round(image_y_size))
+            new_w = int(round(1.0 * orig_w / orig_h * new_h))
+            resized_image = cv2.resize(image, (new_w, new_h))
+            start_x = int((image_x_size - new_w) / 2.0)
+            canvas_image[:, start_x: start_x+new_w, :] = resized_image
+        else:
+            new_w = int(round(image_x_size))
+            new_h = int(round(1.0 * orig_h / orig_w * new_w))
+            resized_image = cv2.resize(image, (new_w, new_h))
+            start_y = int((image_y_size - new_h) / 2.0)
+            canvas_image[start_y: start_y+new_h, :, :] = resized_image
+        new_batch_images.append(canvas_image)
+        
+        new_label = numpy.array(batch_labels[i], dtype='float32')
+        for j in range(max_objects):
+            [index, x, y, w, h] = [float(t) for t in batch_labels[i][j]]
+            if x == 0 and y == 0 and w == 0 and h == 0:
+                break
+            x = 1.0 * (x * new_w + (image_x_size - new_w) / 2.0) / image_x_size
+            y = 1.0 * (y * new_h + (image_y_size - new_h) / 2.0) / image_y_size
+            w = 1.0 * w * new_w / image_x_size
+            h = 1.0 * h * new_h / image_y_size
+            new_label[j] = [index, x, y, w, h]
+        new_batch_labels.append(new_label)
+
+    return numpy.array(new_batch_images, dtype='uint8'), numpy.array(new_batch_labels, dtype='float32')
+
+def random_batch(n_batch):
+    images, labels = [], []
+    for b in range(n_batch):
+        orig_h, orig_w = numpy.random.randint(200, 600, size=(2, ))
+        images.append(numpy.random.randint(0, 256, size=(orig_h, orig_w, 3)).astype('uint8'))
+        label = numpy.zeros((max_objects, 5), dtype='float32')
+        n_objects = numpy.random.randint(0, max_objects+1)
+        label[0:n_objects,0] = numpy.random.randint(1, 21, size=(n_objects, ))
+        label[0:n_objects,1:5] = numpy.random.random((n_objects, 4))
+        labels.append(label)
+    return images, labels
+
+def main():
+    numpy.random.seed(0)
+    processor = Processor(
+        image_x_size=image_x_size, image_y_size=image_y_size, max_objects=max_objects, 
+        n_classes=20, cell_x_size=7, cell_y_size=7, n_boxes=5, batch_size=batch_size, 
+        n_channel=3, n_processes=1, n_iters=n_iter, buffer_size=2)
+    out = numpy.empty((batch_size, image_y_size, image_x_size, 3), dtype='uint8')
+
+    loop_time, batch_time = 0.0, 0.0
+    for i in range(n_iter):
+        batch_images, batch_labels = random_batch(batch_size)
+        orig_labels = numpy.array(batch_labels)
+
+        st = time.time()
+        loop_images, loop_labels = convert_batch_infos_loop(batch_images, batch_labels)
+        loop_time += time.time() - st
+
+        st = time.time()
+        new_images, new_labels = processor.convert_batch_infos(batch_images, batch_labels, out=out)
+        batch_time += time.time() - st
+
+        if not numpy.array_equal(loop_images, new_images):
+            raise Exception('ERROR: images are different at iter %d!' % (i))
+        if not numpy.array_equal(loop_labels, new_labels):
+            raise Exception('ERROR: labels are different at iter %d!' % (i))
+        if not numpy.array_equal(orig_labels, numpy.array(batch_labels)):
+            raise Exception('ERROR: input labels are modified at iter %d!' % (i))
+
+    print('outputs are identical in %d batches' % (n_iter))
+    print('loop letterbox: %.2fms per batch' % (1000.0 * loop_time / n_iter))
+    print('batch letterbox: %.2fms per batch' % (1000.0 * batch_time / n_iter))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+# -*- coding: utf8 -*-
+# description: handoff latency of shared memory, run with `python -m src.data.test.shm_latency`
+from __future__ import print_function
+import time
+import numpy
+import multiprocessing as mp
+from multiprocessing.sharedctypes import Array, Value
+from src.data.data_basic import BatchSchema, SharedMemory
+
+buffer_size = 5
+n_iter = 50
+batch_size = 32
+produce_time = 0.05
+
+
+# 旧的实现：等待时每100ms轮询一次
+class PollingSharedMemory:
+
+    def __init__(self, buffer_size, batch_schema):
+        self.buffer_size = buffer_size
+        self.batch_schema = batch_schema
+        self.put_index = Value('i', 0)
+        self.get_index = Value('i', 0)
+        self.put_lock = mp.Lock()
+        self.cdatasets = Array('B', self.buffer_size * self.batch_schema.nbytes, lock=False)
+        self.slot_states = Array('i', self.buffer_size, lock=False)
+        self.slots = [self.batch_schema.get_views(self.cdatasets, index * self.batch_schema.nbytes) \
+            for index in range(self.buffer_size)]
+
+    def reserve(self, timeout=None):
+        with self.put_lock:
+            while self.put_index.value - self.get_index.value >= self.buffer_size - 1:
+                time.sleep(0.1)
+            index = self.put_index.value
+            self.put_index.value += 1
+        return index, self.slots[index % self.buffer_size]
+
+    def commit(self, index):
+        self.slot_states[index % self.buffer_size] = 1
+
+    def get(self, timeout=None):
+        index = self.get_index.value % self.buffer_size
+        while self.put_index.value - self.get_index.value <= 0 or self.slot_states[index] == 0:
+            time.sleep(0.1)
+        data = self.slots[index]
+        self.slot_states[index] = 0
+        self.get_index.value += 1
+        return data
+
+
+# producer module: 每produce_time秒生产一个batch，并记录写完的时间
+def produce(shared_memory):
+    while True:
+        time.sleep(produce_time)
+        index, slot = shared_memory.reserve()
+        slot['images'][:] = index % 255
+        slot['stamp'][0] = time.time()
+        shared_memory.commit(index)
+
+# consumer module: 消费者比生产者快，统计从写完到被读取之间的延迟
+def consume(shared_memory):
+    latencies = []
+    for i in range(n_iter):
+        data = shared_memory.get()
+        latencies.append(time.time() - data['stamp'][0])
+    return numpy.array(latencies) * 1000.0
+
+def run(name, shared_memory):
+    producer = mp.Process(target=produce, args=(shared_memory, ))
+    producer.daemon = True
+    producer.start()
+    latencies = consume(shared_memory)
+    producer.terminate()
+    producer.join()
+    print('%-10s\tmean: %.2fms\tp50: %.2fms\tp99: %.2fms\tmax: %.2fms' % (
+        name, latencies.mean(), numpy.percentile(latencies, 50),
+        numpy.percentile(latencies, 99), latencies.max()))
+
+def main():
+    batch_schema = BatchSchema([
+        ('stamp', 'float64', (1, )),
+        ('images', 'uint8', (batch_size, 448, 448, 3))])
+    run('polling', PollingSharedMemory(buffer_size, batch_schema))
+    run('blocking', SharedMemory(buffer_size, batch_schema))
+
+
+if __name__ == '__main__':
+    main()
@@ -25,3 +25,77 @@ def cal_feel_field(layer):
         layer = layer.prev_layer
 
     return [int(y_field), int(x_field)]
+
+def cal_conv_infos(input_shape, y_size, x_size, y_stride, x_stride, n_filter, batch_normal):
+    """
+    卷积层的输出尺寸、乘加次数和可训练参数的个数，ConvLayer和src.network.backbone共用
+    输入1：input_shape - 输入的尺寸(y, x, n_channel)
+    输入2：y_size, x_size, y_stride, x_stride, n_filter, batch_normal - 卷积层的配置
+    输出1：output_shape - 输出的尺寸[y, x, n_filter]
+    输出2：calculation - 乘加次数
+    输出3：n_params - 可训练参数的个数，batch normalization有scale和beta两组参数
+    """
+    output_shape = [int(input_shape[0]/y_stride), int(input_shape[1]/x_stride), n_filter]
+    calculation = output_shape[0] * output_shape[1] * output_shape[2] * input_shape[2] * y_size * x_size
+    n_params = y_size * x_size * input_shape[2] * n_filter + (2 * n_filter if batch_normal else n_filter)
+
+    return output_shape, calculation, n_params
+
+def cal_pool_infos(input_shape, y_size, x_size, y_stride, x_stride):
+    """
+    池化层的输出尺寸、计算次数和可训练参数的个数，PoolLayer和src.network.backbone共用
+    """
+    output_shape = [int(input_shape[0]/y_stride), int(input_shape[1]/x_stride), input_shape[2]]
+    calculation = output_shape[0] * output_shape[1] * output_shape[2] * y_size * x_size
+
+    return output_shape, calculation, 0
+
+def cal_dense_infos(input_shape, hidden_dim, batch_normal):
+    """
+    全连接层的输出尺寸、乘加次数和可训练参数的个数，DenseLayer和src.network.backbone共用
+    输入1：input_shape - 输入的尺寸[n_inputs]
+    """
+    output_shape = [hidden_dim]
+    calculation = hidden_dim * input_shape[0]
+    n_params = input_shape[0] * hidden_dim + (2 * hidden_dim if batch_normal else hidden_dim)
+
+    return output_shape, calculation, n_params
+
+def cal_layer_feel_field(ltype, y_size, x_size, input_shape, prev_layers):
+    """
+    卷积层和池化层的感受野，ConvLayer、PoolLayer和src.network.backbone共用
+    输入1：ltype, y_size, x_size, input_shape - 当前层的类型、核的尺寸和输入尺寸
+    输入2：prev_layers - 之前每一层的(ltype, y_size, x_size, input_shape)，从近到远排列，只计算conv和pool
+    输出：feel_field - [y, x]
+    """
+    if ltype == 'conv':
+        feel_field = [
+            min(input_shape[0], 1 + int((y_size+1)/2)),
+            min(input_shape[1], 1 + int((x_size+1)/2))]
+    else:
+        feel_field = [
+            min(input_shape[0], 1 * int(y_size)),
+            min(input_shape[1], 1 * int(x_size))]
+    for prev_ltype, prev_y_size, prev_x_size, prev_input_shape in prev_layers:
+        if prev_ltype == 'conv':
+            feel_field[0] = min(prev_input_shape[0], feel_field[0] + int((prev_y_size+1)/2))
+            feel_field[1] = min(prev_input_shape[1], feel_field[1] + int((prev_x_size+1)/2))
+        elif prev_ltype == 'pool':
+            feel_field[0] = min(prev_input_shape[0], feel_field[0] * int(prev_y_size))
+            feel_field[1] = min(prev_input_shape[1], feel_field[1] * int(prev_x_size))
+
+    return feel_field
+
+def get_prev_layers(layer):
+    """
+    从layer.prev_layer开始，按从近到远的顺序取出之前每一层的(ltype, y_size, x_size, input_shape)，
+    用于cal_layer_feel_field
+    """
+    prev_layers = []
+    layer = layer.prev_layer
+    while layer:
+        if layer.ltype in ['conv', 'pool']:
+            prev_layers.append((layer.ltype, layer.y_size, layer.x_size, layer.input_shape))
+        layer = layer.prev_layer
+
+    return prev_layers
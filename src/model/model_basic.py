@@ -1,558 +1,745 @@
-# -*- coding: utf8 -*-
-# author: ronniecao
-# time: 2018/01/08
-# description: model managering in table detection
-from __future__ import print_function
-import sys
-import os
-import time
-import math
-import numpy
-import random
-import matplotlib.pyplot as plt
-from ctypes import c_double, cast, POINTER
-import cv2
-import tensorflow as tf
-from src.layer.conv_layer import ConvLayer
-from src.layer.pool_layer import PoolLayer
-import src.tools.utils as utils
-
-
-class Model():
-    
-    def __init__(self, 
-        n_channel, 
-        max_objects,
-        image_x_size, 
-        image_y_size, 
-        cell_x_size, 
-        cell_y_size,
-        n_classes,
-        box_per_cell, 
-        batch_size, 
-        buffer_size, 
-        is_valid=False, 
-        update_function='momentum', 
-        learning_rate=0.01,
-        is_lr_decay=False,
-        is_observe=False):
-
-        # 设置参数
-        self.image_x_size = image_x_size
-        self.image_y_size = image_y_size
-        self.n_channel = n_channel
-        self.max_objects = max_objects
-        self.cell_x_size = cell_x_size
-        self.cell_y_size = cell_y_size
-        self.n_classes = n_classes + 1
-        self.n_boxes = box_per_cell
-        self.batch_size = batch_size
-        self.buffer_size = buffer_size
-        self.is_valid = is_valid
-        self.update_function = update_function
-        self.learning_rate = learning_rate
-        self.is_lr_decay = is_lr_decay
-        self.is_observe = is_observe
-        self.class_types = ['background', 
-            'aeroplane', 'bicycle', 'bird', 'boat', 'bottle', 'bus', 'car', 'cat', 'chair', 'cow', 
-            'diningtable', 'dog', 'horse', 'motorbike', 'person', 'pottedplant', 'sheep', 'sofa', 'train', 'tvmonitor']
-        
-        self.index_size = (self.batch_size)
-        self.image_size = (self.batch_size, self.image_y_size, self.image_x_size, self.n_channel)
-        self.coord_true_size = (self.batch_size, self.cell_y_size, self.cell_x_size, self.max_objects, 4)
-        self.object_mask_size = (self.batch_size, self.cell_y_size, self.cell_x_size, self.max_objects)
-        self.class_true_size = (self.batch_size, self.cell_y_size, self.cell_x_size, self.max_objects, self.n_classes)
-        self.unpos_coord_true_size = (self.batch_size, self.max_objects, 4)
-        self.unpos_object_mask_size = (self.batch_size, self.max_objects)
-        self.object_nums_size = (self.batch_size, self.cell_y_size, self.cell_x_size)
-        
-        # 输入变量
-        self.images = tf.placeholder(
-            dtype=tf.float32, 
-            shape=[self.batch_size, self.image_y_size, self.image_x_size, 3], 
-            name='images')
-        self.coord_true = tf.placeholder(
-            dtype=tf.float32, 
-            shape=[self.batch_size, self.cell_y_size, self.cell_x_size, self.max_objects, 4], 
-            name='coord_true')
-        self.object_mask = tf.placeholder(
-            dtype=tf.float32, 
-            shape=[self.batch_size, self.cell_y_size, self.cell_x_size, self.max_objects], 
-            name='object_mask')
-        self.class_true = tf.placeholder(
-            dtype=tf.float32,
-            shape=[self.batch_size, self.cell_y_size, self.cell_x_size, self.max_objects, self.n_classes],
-            name='class_true')
-        self.unpos_coord_true = tf.placeholder(
-            dtype=tf.float32,
-            shape=[self.batch_size, self.max_objects, 4],
-            name='unpos_coord_true')
-        self.unpos_object_mask = tf.placeholder(
-            dtype=tf.float32,
-            shape=[self.batch_size, self.max_objects],
-            name='unpos_object_mask')
-        self.object_nums = tf.placeholder(
-            dtype=tf.int32,
-            shape=[self.batch_size, self.cell_y_size, self.cell_x_size],
-            name='object_nums')
-        self.place_holders = {
-            'images': self.images, 'coord_true': self.coord_true, 
-            'object_mask': self.object_mask, 'class_true': self.class_true,
-            'unpos_coord_true': self.unpos_coord_true, 'unpos_object_mask': self.unpos_object_mask, 
-            'object_nums': self.object_nums}
-        
-        self.global_step = tf.Variable(0, dtype=tf.float32, name='global_step')
-
-    def train_init(self, network, backup_dir):
-        time.sleep(5)
-
-        # 构建会话
-        gpu_options = tf.GPUOptions(allow_growth=True)
-        self.sess = tf.Session(config=tf.ConfigProto(
-            gpu_options=gpu_options, allow_soft_placement=True))
-        
-        if self.update_function == 'momentum':
-            self.optimizer = tf.train.MomentumOptimizer(learning_rate=self.learning_rate, momentum=0.9)
-        elif self.update_function == 'adam':
-            self.optimizer = tf.train.AdamOptimizer(learning_rate=self.learning_rate)
-        elif self.update_function == 'adadelta':
-            self.optimizer = tf.train.AdadeltaOptimizer(learning_rate=self.learning_rate)
-
-        # 构建模型和优化器
-        self.network = network
-        # 先计算loss
-        with tf.name_scope('cal_loss_and_eval'):
-            self.avg_loss, self.coord_loss, self.noobject_loss, self.object_loss, self.class_loss, \
-                self.weight_decay_loss, self.iou_value, self.object_value, self.noobject_value, self.class_value = \
-                    self.network.get_loss(
-                        self.place_holders['images'],
-                        self.place_holders['coord_true'], 
-                        self.place_holders['object_mask'],
-                        self.place_holders['class_true'],
-                        self.place_holders['unpos_coord_true'],
-                        self.place_holders['unpos_object_mask'],
-                        self.place_holders['object_nums'],
-                        self.global_step, 'gpu0')
-
-        # 然后求误差并更新参数
-        with tf.name_scope('optimize'):
-            self.optimizer_handle = self.optimizer.minimize(self.avg_loss,
-                global_step=self.global_step)
-            
-        # 模型保存器
-        self.saver = tf.train.Saver(
-            var_list=tf.global_variables(), write_version=tf.train.SaverDef.V2, max_to_keep=500)
-        # 模型初始化
-        self.sess.run(tf.global_variables_initializer())
-        self.valid_logits = self.network.get_inference(self.place_holders['images']) 
-        
-    def train(self, processor, network, backup_dir, logs_dir, n_iters=500000):
-        self.train_init(network, backup_dir)
-        # model_path = os.path.join(backup_dir, 'model_50000.ckpt')
-        # self.saver.restore(self.sess, model_path)
-        
-        # 训练开始前保存1次模型
-        model_path = os.path.join(backup_dir, 'model_0.ckpt')
-        self.saver.save(self.sess, model_path)
-                
-        # 模型训练
-        process_images = 0
-        
-        start_time = time.time()
-        data_spend, model_spend, max_valid_value, max_train_value = 0.0, 0.0, 0.0, 0.0
-        
-        print('\nstart training ...\n')
-        for n_iter in range(1, n_iters+4):
-            # 获取数据
-            st = time.time()
-            data = processor.shared_memory.get()
-            
-            # 将shared_memory中的数据取出
-            accum_size = 0
-            
-            batch_image_indexs = numpy.reshape(
-                data[accum_size: accum_size+numpy.prod(self.index_size)], self.index_size)
-            accum_size += numpy.prod(self.index_size)
-            
-            batch_images = numpy.reshape(
-                data[accum_size: accum_size+numpy.prod(self.image_size)], self.image_size)
-            accum_size += numpy.prod(self.image_size)
-            
-            batch_coord_true = numpy.reshape(
-                data[accum_size: accum_size+numpy.prod(self.coord_true_size)], self.coord_true_size)
-            accum_size += numpy.prod(self.coord_true_size)
-            
-            batch_object_mask = numpy.reshape(
-                data[accum_size: accum_size+numpy.prod(self.object_mask_size)], self.object_mask_size)
-            accum_size += numpy.prod(self.object_mask_size)
-
-            batch_class_true = numpy.reshape(
-                data[accum_size: accum_size+numpy.prod(self.class_true_size)], self.class_true_size)
-            accum_size += numpy.prod(self.class_true_size)
-
-            batch_unpos_coord_true = numpy.reshape(
-                data[accum_size: accum_size+numpy.prod(self.unpos_coord_true_size)], 
-                self.unpos_coord_true_size)
-            accum_size += numpy.prod(self.unpos_coord_true_size)
-
-            batch_unpos_object_mask = numpy.reshape(
-                data[accum_size: accum_size+numpy.prod(self.unpos_object_mask_size)],
-                self.unpos_object_mask_size)
-            accum_size += numpy.prod(self.unpos_object_mask_size)
-
-            batch_object_nums = numpy.reshape(
-                data[accum_size: accum_size+numpy.prod(self.object_nums_size)], self.object_nums_size)
-            accum_size += numpy.prod(self.object_nums_size)
-            
-            et = time.time()
-            data_time = et - st
-
-            st = time.time()
-            feed_dict = {}
-            
-            # 生成feed_dict
-            feed_dict[self.place_holders['images']] = batch_images
-            feed_dict[self.place_holders['coord_true']] = batch_coord_true
-            feed_dict[self.place_holders['object_mask']] = batch_object_mask
-            feed_dict[self.place_holders['class_true']] = batch_class_true
-            feed_dict[self.place_holders['unpos_coord_true']] = batch_unpos_coord_true
-            feed_dict[self.place_holders['unpos_object_mask']] = batch_unpos_object_mask
-            feed_dict[self.place_holders['object_nums']] = batch_object_nums
-                
-            et = time.time()
-            feed_time = et - st
-
-            # 生成训练图像
-            if self.is_observe and n_iter <= 10:
-                self.write_train_images(batch_images, batch_coord_true, batch_class_true, logs_dir, n_iter)
-            
-            st = time.time()
-            [_, avg_loss, coord_loss, noobject_loss, object_loss, class_loss, \
-                weight_decay_loss, iou_value, object_value, noobject_value, class_value] = self.sess.run(
-                    fetches=[
-                        self.optimizer_handle, self.avg_loss, self.coord_loss, 
-                        self.noobject_loss, self.object_loss, self.class_loss, 
-                        self.weight_decay_loss, self.iou_value, self.object_value, 
-                        self.noobject_value, self.class_value], 
-                    feed_dict=feed_dict)
-            et = time.time()
-            model_time = et - st
-           
-            process_images += self.batch_size
-            
-            end_time = time.time()
-            spend = (end_time - start_time) / 3600.0
-            
-            print('[%d] data time: %.4fs, model time: %.4fs, spend: %.4fh, image_nums: %d' % (
-                n_iter, data_time, model_time, spend, process_images))
-
-            # 每1轮训练观测一次train_loss    
-            print('[%d] train loss: %.6f, coord loss: %.6f, noobject loss: %.6f, '
-                'object loss: %.6f, class loss: %.6f, weight loss: %.6f' % (
-                n_iter, avg_loss, coord_loss, noobject_loss, object_loss, class_loss,
-                weight_decay_loss))
-            sys.stdout.flush()
-            
-            # 每1轮观测一次训练集evaluation
-            print('[%d] inner IOU: %.6f, object: %.6f, noobject: %.6f, class: %.6f\n' % (
-                n_iter, iou_value, object_value, noobject_value, class_value))
-            sys.stdout.flush()
-
-            # 每固定轮数验证一次模型
-            valid_freq = 1000
-            need_valid = False
-            for t in range(-3,4,1):
-                if (n_iter+t) % valid_freq == 0: # and n_iter >= 10:
-                    need_valid = True
-                    break
-            
-            if need_valid and self.is_valid:
-                # 观测一次basic验证集evaluation
-                mAP = self.valid_model(processor, model_path, logs_dir, mode='valid')
-                print('[%d] valid mAP: %.4f\n' % (n_iter, mAP))
-                valid_value = mAP
-
-                if valid_value >= max_valid_value:
-                    max_valid_value = valid_value
-                    print('update best valid mAP: %.4f\n' % (max_valid_value))
-            
-            # 每固定轮数保存一次模型
-            if n_iter % 5000 == 0:
-                model_path = os.path.join(backup_dir, 'model_%d.ckpt' % (n_iter))
-                self.saver.save(self.sess, model_path)
-            
-            sys.stdout.flush()
-        
-        self.sess.close()
-
-    def valid_init(self, processor, network):
-        # 构建会话
-        gpu_options = tf.GPUOptions(allow_growth=True)
-        self.sess = tf.Session(config=tf.ConfigProto(
-            gpu_options=gpu_options, allow_soft_placement=True))
-        self.network = network
-        self.valid_logits = self.network.get_inference(self.place_holders['images'])
-        
-    def valid_all_models(self, processor, network, backup_dir, logs_dir, n_iters=100000):
-        
-        # 验证backup_dir中的每一个模型
-        for n_iter in range(n_iters):
-            if (n_iter <= 1000 and n_iter % 200 == 0) or (1000 < n_iter <= 10000 and n_iter % 2000 == 0) \
-                or (n_iter > 10000 and n_iter % 20000 == 0):
-                model_path = os.path.join(backup_dir, 'model_%d.ckpt' % (n_iter))
-                # 读取模型
-                self.valid_saver = tf.train.Saver(write_version=tf.train.SaverDef.V2)
-                assert(os.path.exists(model_path+'.index'))
-                self.valid_saver.restore(self.sess, model_path)
-                print('read model from %s' % (model_path))
-                
-                precision_array, recall_array, f1_array, overlap = self.valid_model(
-                    processor, model_path, logs_dir, mode='valid')
-                print('[%d] p@0.5: %.6f, r@0.5: %.6f, f1@0.5: %.6f\n' % (
-                    precision_array[4], recall_array[4], f1_array[4]))
-                sys.stdout.flush()
-
-    def valid_model(self, processor, model_path, output_dir, mode='valid'):
-        mAPs = []
-        for k in range(self.n_classes-1):
-            mAPs.append([])
-
-        for i in range(int(processor.n_valid / self.batch_size) - 1):
-            # 获取数据并进行数据增强
-            batch_images, batch_datasets = processor.dataset_producer(
-                mode=mode, indexs=[i*self.batch_size+t for t in range(self.batch_size)])
-            batch_images = numpy.reshape(batch_images, 
-                (self.batch_size, self.image_y_size, self.image_x_size, 3))
-            
-            [logits] = self.sess.run(
-                fetches=[self.valid_logits],
-                feed_dict={self.place_holders['images']: batch_images})
-            
-            # 获得预测的框
-            preds_objects = self.get_pred_boxes(logits, batch_datasets, self.batch_size)
-
-            # 获得真实的框
-            trues_objects = self.get_true_boxes(batch_datasets, self.batch_size)
-            n_trues = numpy.zeros((self.n_classes-1), dtype='int32')
-            for true_objects in trues_objects:
-                for true_object in true_objects:
-                    n_trues[true_object['class']-1] += 1
-    
-            precisions = numpy.zeros((self.n_classes-1, 11), dtype='float32')
-            recalls = numpy.zeros((self.n_classes-1, 11), dtype='float32')
-            for j in range(0, 11):
-                best_prob = 1.0 * j / 10.0
-                n_true_positives, n_false_positives = self.get_truepositive_falsepositive(
-                    trues_objects, preds_objects, true_iou=0.5, true_prob=best_prob)
-                for k in range(self.n_classes-1):
-                    precision = 1.0 * n_true_positives[k] / (n_true_positives[k] + n_false_positives[k]) if \
-                        n_true_positives[k] + n_false_positives[k] > 0 else 0.0
-                    recall = 1.0 * n_true_positives[k] / n_trues[k] if n_trues[k] > 0 else 0.0
-                    precisions[k][j] = precision
-                    recalls[k][j] = recall
-
-            for k in range(self.n_classes-1):
-                AP = 0.0
-                print(precisions[k], recalls[k])
-                for j in range(1, 11):
-                    AP += (precisions[k][j-1] - precisions[k][j]) * (recalls[k][j] - recalls[k][j-1])
-                mAPs[k].append(AP)
-        
-        mAP = 0.0
-        for k in range(self.n_classes-1):
-            mAP += 1.0 * sum(mAPs[k]) / len(mAPs[k])
-        mAP /= (self.n_classes-1)
-
-        return mAP
-    
-    def test_model(self, processor, network, model_path, output_dir):
-        
-        if not os.path.exists(os.path.join(output_dir, 'predictions')):
-            os.mkdir(os.path.join(output_dir, 'predictions'))
-        for i in range(int(processor.n_test_basic / self.batch_size)-1):
-            # 获取数据并进行数据增强
-            batch_images, batch_datasets = processor.dataset_producer(
-                mode='test_basic', indexs=[i*self.batch_size+t for t in range(self.batch_size)])
-            
-            [logits] = self.sess.run(
-                fetches=[self.deploy_logits], 
-                feed_dict={self.images: batch_images})
-            
-            # 获得预测的框
-            preds_boxes = self.get_pred_boxes(logits, batch_datasets, self.batch_size, is_text=True)
-            
-            for j in range(self.batch_size):
-                docid = batch_datasets[j]['docid']
-                pageid = int(batch_datasets[j]['pageid'])
-                output_path = os.path.join(output_dir, 'predictions', '%s_%d.png' % (
-                    docid, pageid))
-                image_path = batch_datasets[j]['path']
-                show_path = batch_datasets[j]['content']['orig_image_path']
-                print(show_path)
-                image = cv2.imread(show_path)
-                
-                # 画预测的框
-                for box in preds_boxes[j]:
-                    [left, top, right, bottom] = [int(t) for t in box]
-                    cv2.rectangle(image, (left, top), (right, bottom), (238, 192, 126), 2) # blue
-                
-                cv2.imwrite(output_path, image)
-        self.test_sess.close()
-        print('Test Finish!')
-    
-    def get_pred_boxes(self, logits, batch_datasets, batch_size, is_text=True):
-        conf_preds = numpy.reshape(logits[:,:,:,:,0:1], (
-            batch_size, self.cell_y_size, self.cell_x_size, self.n_boxes, 1))
-        box_preds = self.get_direct_position_py(numpy.reshape(logits[:,:,:,:,1:5], (
-            batch_size, self.cell_y_size, self.cell_x_size, self.n_boxes, 4)))
-        class_preds = numpy.reshape(logits[:,:,:,:,5:], (
-            batch_size, self.cell_y_size, self.cell_x_size, self.n_boxes, self.n_classes))
-       
-        pred_objects = []
-        for j in range(batch_size):
-            # 获得预测的preds
-            preds = []
-            for x in range(self.cell_x_size):
-                for y in range(self.cell_y_size):
-                    for n in range(self.n_boxes):
-                        prob = conf_preds[j,y,x,n,0]
-                        box = box_preds[j,y,x,n,0:4]
-                        index = numpy.argmax(class_preds[j,y,x,n,:])
-                        if prob >= self.network.pred_thresh:
-                            preds.append([box, prob, index])
-            
-            # 排序并去除多余的box
-            preds = sorted(preds, key=lambda x: x[1], reverse=True)
-            for x in range(len(preds)):
-                if preds[x][1] < self.network.pred_thresh:
-                    continue
-                for y in range(x+1, len(preds)):
-                    iou = self.calculate_iou_py(preds[x][0], preds[y][0], mode='xywh')
-                    if iou > self.network.nms_thresh:
-                        preds[y][1] = 0.0
-            
-            # 画预测的框
-            boxes = []
-            for k in range(len(preds)):
-                if preds[k][1] >= self.network.pred_thresh:
-                    [x, y, w, h] = preds[k][0]
-                    index = preds[k][2]
-                    left = int(round(min(max(0.0, x - w / 2.0), 0.9999) * self.image_x_size))
-                    top = int(round(min(max(0.0, y - h / 2.0), 0.9999) * self.image_y_size))
-                    right = int(round(min(max(0.0, x + w / 2.0), 0.9999) * self.image_x_size))
-                    bottom = int(round(min(max(0.0, y + h / 2.0), 0.9999) * self.image_y_size))
-
-                    boxes.append({'box': [left, top, right, bottom],
-                        'prob': preds[k][1], 'class': int(index)})
-            
-            pred_objects.append(boxes)
-        
-        return pred_objects
-    
-    def get_true_boxes(self, batch_datasets, batch_size, is_text=True):
-        true_objects = []
-        
-        for j in range(batch_size):
-            label = batch_datasets[j]['label']
-
-            true_boxes = []
-            for index, x, y, w, h in label:
-                if x == 0.0 and y == 0.0 and w == 0.0 and h == 0.0:
-                    continue
-                left = int(round(min(max(0.0, x - w / 2.0), 0.9999) * self.image_x_size))
-                top = int(round(min(max(0.0, y - h / 2.0), 0.9999) * self.image_y_size))
-                right = int(round(min(max(0.0, x + w / 2.0), 0.9999) * self.image_x_size))
-                bottom = int(round(min(max(0.0, y + h / 2.0), 0.9999) * self.image_y_size))
-                
-                true_boxes.append({'box': [left, top, right, bottom],
-                    'prob': 1.0, 'class': int(index)})
-
-            true_objects.append(true_boxes)
-
-        return true_objects
-
-    def get_truepositive_falsepositive(self, true_objects, pred_objects, true_iou=0.5, true_prob=0.5):
-        """
-        获取每个预测框对应的真实框的pair对
-        """
-        n_true_positives = numpy.zeros((self.n_classes-1,), dtype='int32')
-        n_false_positives = numpy.zeros((self.n_classes-1,), dtype='int32')
-        for i in range(self.batch_size):
-            for p in range(len(pred_objects[i])):
-                best_n, best_iou = -1, true_iou
-                for t in range(len(true_objects[i])):
-                    iou = self.calculate_iou_py(pred_objects[i][p]['box'], true_objects[i][t]['box'], mode='ltrb')
-                    is_class_right = pred_objects[i][p]['class'] == true_objects[i][t]['class']
-                    if iou >= true_iou and is_class_right and pred_objects[i][p]['prob'] >= true_prob:
-                        best_iou = iou
-                        best_n = t
-                if best_n != -1:
-                    n_true_positives[pred_objects[i][p]['class']-1] += 1
-                else:
-                    n_false_positives[pred_objects[i][p]['class']-1] += 1
-
-        return n_true_positives, n_false_positives
-
-    def get_direct_position_py(self, coord_pred):
-        # 计算bx
-        offset_x = numpy.reshape(range(0, self.cell_x_size), newshape=(1, 1, self.cell_x_size, 1, 1))
-        offset_x = numpy.tile(offset_x, (self.batch_size, self.cell_y_size, 1, self.n_boxes, 1))
-        offset_x = numpy.array(offset_x, dtype='float')
-        x_pred = (coord_pred[:,:,:,:,0:1] + offset_x) / self.cell_x_size
-        
-        # 计算by
-        offset_y = numpy.reshape(range(0, self.cell_y_size), newshape=(1, self.cell_y_size, 1, 1, 1))
-        offset_y = numpy.tile(offset_y, (self.batch_size, 1, self.cell_x_size, self.n_boxes, 1))
-        offset_y = numpy.array(offset_y, dtype='float')
-        y_pred = (coord_pred[:,:,:,:,1:2] + offset_y) / self.cell_y_size
-        
-        new_coord_pred = numpy.concatenate([x_pred, y_pred, coord_pred[:,:,:,:,2:4]], axis=4)
-        
-        return new_coord_pred
-    
-    def calculate_iou_py(self, box_pred, box_label, mode='xywh'):
-        if mode == 'xywh':
-            box1 = [box_pred[0] - box_pred[2] / 2.0, box_pred[1] - box_pred[3] / 2.0,
-                box_pred[0] + box_pred[2] / 2.0, box_pred[1] + box_pred[3] / 2.0]
-            box2 = [box_label[0] - box_label[2] / 2.0, box_label[1] - box_label[3] / 2.0,
-                box_label[0] + box_label[2] / 2.0, box_label[1] + box_label[3] / 2.0]
-        elif mode == 'ltrb':
-            box1 = box_pred
-            box2 = box_label
-        left = max(box1[0], box2[0])
-        top = max(box1[1], box2[1])
-        right = min(box1[2], box2[2])
-        bottom = min(box1[3], box2[3])
-        if right <= left or bottom <= top:
-            iou = 0.0
-        else:
-            inter_area = (right - left) * (bottom - top)
-            box1_area = (box1[2] - box1[0]) * (box1[3] - box1[1])
-            box2_area = (box2[2] - box2[0]) * (box2[3] - box2[1])
-            iou = inter_area / (box1_area + box2_area - inter_area + 1e-6)
-        
-        return iou
-    
-    def write_train_images(self, batch_images, batch_coord_true, batch_class_true, logs_dir, index):
-        if not os.path.exists(os.path.join(logs_dir, 'train')):
-            os.mkdir(os.path.join(logs_dir, 'train'))
-
-        for b in range(self.batch_size):
-            image = numpy.array(batch_images[b]*255, dtype='uint8')
-            for i in range(self.cell_y_size):
-                for j in range(self.cell_x_size):
-                    for n in range(self.max_objects):
-                        if sum(batch_coord_true[b,i,j,n,:]) == 0.0:
-                            continue
-                        [x, y, w, h] = batch_coord_true[b,i,j,n,:]
-                        class_type = int(numpy.argmax(batch_class_true[b,i,j,n,:]))
-                        left = int(round((x - w / 2.0) * self.image_x_size))
-                        top = int(round((y - h / 2.0) * self.image_y_size))
-                        right = int(round((x + w / 2.0) * self.image_x_size))
-                        bottom = int(round((y + h / 2.0) * self.image_y_size))
-                        cv2.rectangle(image, (left, top), (right, bottom), (71, 99, 255), 2) # red
-                        cv2.rectangle(image, (left, top-15), (left+80, top), (71, 99, 255), -1) # red
-                        cv2.putText(image, self.class_types[class_type], (left, top), cv2.FONT_HERSHEY_COMPLEX, 0.4, (255, 255, 255), 1)
-                
-            output_path = os.path.join(logs_dir, 'train', '%d_%d.png' % (index, b))
-            cv2.imwrite(output_path, image)
+# -*- coding: utf8 -*-
+# author: ronniecao
+# time: 2018/01/08
+# description: model managering in table detection
+from __future__ import print_function
+import sys
+import os
+import time
+import math
+import numpy
+import random
+import threading
+import matplotlib.pyplot as plt
+from ctypes import c_double, cast, POINTER
+import cv2
+import tensorflow as tf
+from src.layer.conv_layer import ConvLayer
+from src.layer.pool_layer import PoolLayer
+import src.tools.utils as utils
+
+
+class Model():
+    
+    def __init__(self, 
+        n_channel, 
+        max_objects,
+        image_x_size, 
+        image_y_size, 
+        cell_x_size, 
+        cell_y_size,
+        n_classes,
+        box_per_cell, 
+        batch_size, 
+        buffer_size, 
+        is_valid=False, 
+        update_function='momentum', 
+        learning_rate=0.01,
+        is_lr_decay=False,
+        is_observe=False,
+        image_dtype='float32',
+        is_sparse_class=False,
+        input_mode='feed',
+        n_prefetch=2,
+        input_sizes=None,
+        inference_size=None,
+        assign_mode='network'):
+
+        # 设置参数
+        self.image_x_size = image_x_size
+        self.image_y_size = image_y_size
+        self.n_channel = n_channel
+        self.max_objects = max_objects
+        self.cell_x_size = cell_x_size
+        self.cell_y_size = cell_y_size
+        self.n_classes = n_classes + 1
+        self.n_boxes = box_per_cell
+        self.batch_size = batch_size
+        self.buffer_size = buffer_size
+        self.is_valid = is_valid
+        self.update_function = update_function
+        self.learning_rate = learning_rate
+        self.is_lr_decay = is_lr_decay
+        self.is_observe = is_observe
+        self.image_dtype = image_dtype
+        self.is_sparse_class = is_sparse_class
+        # feed：每一步通过feed_dict传入数据，dataset：用tf.data在后台线程中读取shared_memory
+        self.input_mode = input_mode
+        self.n_prefetch = n_prefetch
+        # 分桶或者多尺度时训练图片的尺寸随batch变化，inference_size为验证和测试时的输入尺寸，
+        # 例如对延迟敏感的请求使用较小的尺寸，这些尺寸与默认尺寸不同时placeholder的宽和高不固定
+        self.input_sizes = [tuple(size) for size in input_sizes] if input_sizes else None
+        self.inference_size = tuple(inference_size) if inference_size else (self.image_x_size, self.image_y_size)
+        # producer时loss使用生产者计算好的anchor box目标，需要额外的输入
+        self.assign_mode = assign_mode
+        sizes = set((self.input_sizes if self.input_sizes else []) + [self.inference_size])
+        self.class_types = ['background', 
+            'aeroplane', 'bicycle', 'bird', 'boat', 'bottle', 'bus', 'car', 'cat', 'chair', 'cow', 
+            'diningtable', 'dog', 'horse', 'motorbike', 'person', 'pottedplant', 'sheep', 'sofa', 'train', 'tvmonitor']
+        
+        # 输入变量，batch的维度不固定，同一个图可以训练、验证最后一个不完整的batch以及单张图片的推理
+        # uint8的图片在网络中转换成float32并归一化，cell的个数随输入尺寸变化，有多个输入尺寸时也不固定
+        if sizes != set([(self.image_x_size, self.image_y_size)]):
+            image_shape = [None, None, None, 3]
+            cell_y_size, cell_x_size = None, None
+        else:
+            image_shape = [None, self.image_y_size, self.image_x_size, 3]
+            cell_y_size, cell_x_size = self.cell_y_size, self.cell_x_size
+        self.images = tf.placeholder(
+            dtype=tf.uint8 if self.image_dtype == 'uint8' else tf.float32, 
+            shape=image_shape, 
+            name='images')
+        self.coord_true = tf.placeholder(
+            dtype=tf.float32, 
+            shape=[None, cell_y_size, cell_x_size, self.max_objects, 4], 
+            name='coord_true')
+        self.object_mask = tf.placeholder(
+            dtype=tf.float32, 
+            shape=[None, cell_y_size, cell_x_size, self.max_objects], 
+            name='object_mask')
+        # 稀疏时class_true为类别序号，在网络中展开成one-hot
+        if self.is_sparse_class:
+            self.class_true = tf.placeholder(
+                dtype=tf.int32,
+                shape=[None, cell_y_size, cell_x_size, self.max_objects],
+                name='class_true')
+        else:
+            self.class_true = tf.placeholder(
+                dtype=tf.float32,
+                shape=[None, cell_y_size, cell_x_size, self.max_objects, self.n_classes],
+                name='class_true')
+        self.unpos_coord_true = tf.placeholder(
+            dtype=tf.float32,
+            shape=[None, self.max_objects, 4],
+            name='unpos_coord_true')
+        self.unpos_object_mask = tf.placeholder(
+            dtype=tf.float32,
+            shape=[None, self.max_objects],
+            name='unpos_object_mask')
+        self.object_nums = tf.placeholder(
+            dtype=tf.int32,
+            shape=[None, cell_y_size, cell_x_size],
+            name='object_nums')
+        self.place_holders = {
+            'images': self.images, 'coord_true': self.coord_true, 
+            'object_mask': self.object_mask, 'class_true': self.class_true,
+            'unpos_coord_true': self.unpos_coord_true, 'unpos_object_mask': self.unpos_object_mask, 
+            'object_nums': self.object_nums}
+        if self.assign_mode == 'producer':
+            self.anchor_mask = tf.placeholder(
+                dtype=tf.float32,
+                shape=[None, cell_y_size, cell_x_size, self.n_boxes],
+                name='anchor_mask')
+            self.anchor_coord = tf.placeholder(
+                dtype=tf.float32,
+                shape=[None, cell_y_size, cell_x_size, 4],
+                name='anchor_coord')
+            if self.is_sparse_class:
+                self.anchor_class = tf.placeholder(
+                    dtype=tf.int32,
+                    shape=[None, cell_y_size, cell_x_size],
+                    name='anchor_class')
+            else:
+                self.anchor_class = tf.placeholder(
+                    dtype=tf.float32,
+                    shape=[None, cell_y_size, cell_x_size, self.n_classes],
+                    name='anchor_class')
+            self.object_coord = tf.placeholder(
+                dtype=tf.float32,
+                shape=[None, self.max_objects, 4],
+                name='object_coord')
+            self.object_cells = tf.placeholder(
+                dtype=tf.int32,
+                shape=[None, self.max_objects],
+                name='object_cells')
+            self.object_anchors = tf.placeholder(
+                dtype=tf.float32,
+                shape=[None, self.max_objects, self.n_boxes],
+                name='object_anchors')
+            self.place_holders.update({
+                'anchor_mask': self.anchor_mask, 'anchor_coord': self.anchor_coord,
+                'anchor_class': self.anchor_class, 'object_coord': self.object_coord,
+                'object_cells': self.object_cells, 'object_anchors': self.object_anchors})
+        
+        self.global_step = tf.Variable(0, dtype=tf.float32, name='global_step')
+
+    def train_init(self, network, backup_dir, processor=None, 
+        producer_pool=None, stall_timeout=60.0, max_stalls=10):
+        time.sleep(5)
+        
+        # 训练时网络的输入，dataset模式下用tf.data的输出代替placeholder
+        if self.input_mode == 'dataset':
+            self.inputs = self.get_dataset_inputs(processor, producer_pool, stall_timeout, max_stalls)
+        else:
+            self.inputs = self.place_holders
+
+        # 构建会话
+        gpu_options = tf.GPUOptions(allow_growth=True)
+        self.sess = tf.Session(config=tf.ConfigProto(
+            gpu_options=gpu_options, allow_soft_placement=True))
+        
+        if self.update_function == 'momentum':
+            self.optimizer = tf.train.MomentumOptimizer(learning_rate=self.learning_rate, momentum=0.9)
+        elif self.update_function == 'adam':
+            self.optimizer = tf.train.AdamOptimizer(learning_rate=self.learning_rate)
+        elif self.update_function == 'adadelta':
+            self.optimizer = tf.train.AdadeltaOptimizer(learning_rate=self.learning_rate)
+
+        # 构建模型和优化器
+        self.network = network
+        self.network.check_input_size(self.inference_size)
+        if self.assign_mode == 'producer':
+            if network.assign_mode != 'producer' or (processor and \
+                not numpy.array_equal(processor.prior_sizes, network.prior_sizes)):
+                raise('ERROR: anchor boxes of processor and network are different!')
+            targets = dict((name, self.inputs[name]) for name in [
+                'anchor_mask', 'anchor_coord', 'anchor_class', 
+                'object_coord', 'object_cells', 'object_anchors'])
+        else:
+            targets = None
+        # 先计算loss
+        with tf.name_scope('cal_loss_and_eval'):
+            self.avg_loss, self.coord_loss, self.noobject_loss, self.object_loss, self.class_loss, \
+                self.weight_decay_loss, self.iou_value, self.object_value, self.noobject_value, self.class_value = \
+                    self.network.get_loss(
+                        self.inputs['images'],
+                        self.inputs['coord_true'], 
+                        self.inputs['object_mask'],
+                        self.inputs['class_true'],
+                        self.inputs['unpos_coord_true'],
+                        self.inputs['unpos_object_mask'],
+                        self.inputs['object_nums'],
+                        self.global_step, 'gpu0', targets=targets)
+
+        # 然后求误差并更新参数
+        with tf.name_scope('optimize'):
+            self.optimizer_handle = self.optimizer.minimize(self.avg_loss,
+                global_step=self.global_step)
+            
+        # 模型保存器
+        self.saver = tf.train.Saver(
+            var_list=tf.global_variables(), write_version=tf.train.SaverDef.V2, max_to_keep=500)
+        # 模型初始化
+        self.sess.run(tf.global_variables_initializer())
+        if self.input_mode == 'dataset':
+            self.sess.run(self.dataset_iterator.initializer)
+        self.valid_logits = self.network.get_inference(self.place_holders['images']) 
+
+    def get_dataset_inputs(self, processor, producer_pool=None, stall_timeout=60.0, max_stalls=10):
+        """
+        用tf.data从shared_memory中读取训练数据，代替placeholder
+        py_func在tf的后台线程中借出slot、拷贝出数据后马上归还slot，n_prefetch个线程并行拷贝，
+        拷贝出的数组起始地址按64字节对齐，py_func直接使用它们的内存，每个batch只拷贝一次，
+        prefetch使数据的拷贝和模型的计算重叠，分桶时只拷贝这个batch的输入尺寸的图片和标签
+        输出：inputs - 字段名到tensor的dict，data_time为这个batch等待生产者的时间
+        """
+        names = list(self.place_holders.keys()) + ['sample_infos', 'image_shape']
+        fields = dict((name, (dtype, shape)) for name, dtype, shape, _, _ in processor.batch_schema.fields)
+        # shared_memory的acquire不是线程安全的，借出slot时加锁，拷贝时不加锁
+        fetch_lock = threading.Lock()
+
+        def _fetch_batch(_):
+            st = time.time()
+            with fetch_lock:
+                lease, data = self.acquire_batch(processor, producer_pool, stall_timeout, max_stalls)
+            data_time = time.time() - st
+            arrays = processor.batch_schema.copy_views(processor.get_batch_views(data), names)
+            outputs = [arrays[name] for name in names]
+            processor.shared_memory.release(lease)
+            
+            return outputs + [numpy.array(data_time, dtype='float32')]
+
+        output_types = [tf.as_dtype(fields[name][0]) for name in names] + [tf.float32]
+        dataset = tf.data.Dataset.from_tensors(0).repeat()
+        dataset = dataset.map(
+            lambda t: tf.py_func(_fetch_batch, [t], output_types, stateful=True), 
+            num_parallel_calls=self.n_prefetch)
+        dataset = dataset.prefetch(self.n_prefetch)
+        self.dataset_iterator = dataset.make_initializable_iterator()
+        values = self.dataset_iterator.get_next()
+        
+        inputs = {}
+        for name, value in zip(names, values[:-1]):
+            if name in self.place_holders:
+                value.set_shape(self.place_holders[name].shape)
+            else:
+                value.set_shape(fields[name][1])
+            inputs[name] = value
+        inputs['data_time'] = values[-1]
+        inputs['data_time'].set_shape(())
+
+        return inputs
+        
+    def train_step(self, processor, fetches, input_names=None, 
+        producer_pool=None, stall_timeout=60.0, max_stalls=10):
+        """
+        运行一步训练
+        输入1：processor - 数据处理器，feed模式下从它的shared_memory中借出slot
+        输入2：fetches - 需要运行的tensor的list
+        输入3：input_names - 需要额外取出的输入字段，例如生成训练图像时的images
+        输出1：results - fetches的结果
+        输出2：inputs - sample_infos、image_shape和input_names中的字段
+        输出3：data_time - 等待生产者的时间，dataset模式下与计算重叠
+        输出4：model_time - 运行模型的时间，dataset模式下包括从prefetch的队列中取出数据
+        """
+        input_names = ['sample_infos', 'image_shape'] + list(input_names or [])
+        if self.input_mode == 'dataset':
+            # 数据在tf的后台线程中读取，data time为这个batch等待生产者的时间，与计算重叠
+            st = time.time()
+            values = self.sess.run(fetches=list(fetches) + [
+                self.inputs[name] for name in input_names] + [self.inputs['data_time']])
+            model_time = time.time() - st
+            results, data_time = values[0:len(fetches)], values[-1]
+            inputs = dict(zip(input_names, values[len(fetches):-1]))
+        else:
+            # 获取数据
+            st = time.time()
+            lease, data = self.acquire_batch(processor, producer_pool, stall_timeout, max_stalls)
+            
+            # 将shared_memory中的数据取出，每个字段都是slot上的视图，训练完这一步之后再归还slot
+            # 图片和标签按这个batch的输入尺寸取出
+            views = processor.get_batch_views(data)
+            feed_dict = {}
+            for name in self.place_holders:
+                feed_dict[self.place_holders[name]] = views[name]
+            data_time = time.time() - st
+            # 额外取出的字段在归还slot之前拷贝出来
+            inputs = dict((name, numpy.array(views[name])) for name in input_names)
+            
+            st = time.time()
+            results = self.sess.run(fetches=fetches, feed_dict=feed_dict)
+            model_time = time.time() - st
+            processor.shared_memory.release(lease)
+        
+        return results, inputs, data_time, model_time
+
+    def train(self, processor, network, backup_dir, logs_dir, n_iters=500000,
+        producer_pool=None, stall_timeout=60.0, max_stalls=10):
+        self.train_init(network, backup_dir, processor, producer_pool, stall_timeout, max_stalls)
+        # model_path = os.path.join(backup_dir, 'model_50000.ckpt')
+        # self.saver.restore(self.sess, model_path)
+        
+        # 训练开始前保存1次模型
+        model_path = os.path.join(backup_dir, 'model_0.ckpt')
+        self.saver.save(self.sess, model_path)
+                
+        # 模型训练
+        process_images = 0
+        
+        start_time = time.time()
+        data_spend, model_spend, max_valid_value, max_train_value = 0.0, 0.0, 0.0, 0.0
+        # 每个输入尺寸的模型耗时和batch数
+        size_spends = {}
+        
+        print('\nstart training ...\n')
+        for n_iter in range(1, n_iters+4):
+            fetches = [
+                self.optimizer_handle, self.avg_loss, self.coord_loss, 
+                self.noobject_loss, self.object_loss, self.class_loss, 
+                self.weight_decay_loss, self.iou_value, self.object_value, 
+                self.noobject_value, self.class_value]
+            is_write_images = self.is_observe and n_iter <= 10
+            input_names = ['images', 'coord_true', 'class_true'] if is_write_images else []
+            
+            results, inputs, data_time, model_time = self.train_step(
+                processor, fetches, input_names, producer_pool, stall_timeout, max_stalls)
+            [produce_index, epoch, position] = inputs['sample_infos']
+            [image_y_size, image_x_size] = inputs['image_shape']
+            
+            # 生成训练图像
+            if is_write_images:
+                self.write_train_images(inputs['images'], inputs['coord_true'], 
+                    inputs['class_true'], logs_dir, n_iter)
+            
+            [_, avg_loss, coord_loss, noobject_loss, object_loss, class_loss, \
+                weight_decay_loss, iou_value, object_value, noobject_value, class_value] = results[0:11]
+            data_spend += data_time
+            model_spend += model_time
+            size_spend = size_spends.setdefault((int(image_x_size), int(image_y_size)), [0.0, 0])
+            size_spend[0] += model_time
+            size_spend[1] += 1
+           
+            process_images += self.batch_size
+            
+            end_time = time.time()
+            spend = (end_time - start_time) / 3600.0
+            
+            print('[%d] data time: %.4fs, model time: %.4fs, spend: %.4fh, image_nums: %d, '
+                'producer: %d, epoch: %d, position: %d, input: %dx%d' % (
+                n_iter, data_time, model_time, spend, process_images, produce_index, epoch, position,
+                image_x_size, image_y_size))
+
+            # 每1轮训练观测一次train_loss    
+            print('[%d] train loss: %.6f, coord loss: %.6f, noobject loss: %.6f, '
+                'object loss: %.6f, class loss: %.6f, weight loss: %.6f' % (
+                n_iter, avg_loss, coord_loss, noobject_loss, object_loss, class_loss,
+                weight_decay_loss))
+            sys.stdout.flush()
+            
+            # 每1轮观测一次训练集evaluation
+            print('[%d] inner IOU: %.6f, object: %.6f, noobject: %.6f, class: %.6f\n' % (
+                n_iter, iou_value, object_value, noobject_value, class_value))
+            sys.stdout.flush()
+
+            # 每100轮观测一次平均的data time和model time，用于比较feed和dataset两种输入方式
+            if n_iter % 100 == 0:
+                print('[%d] input mode: %s, mean data time: %.4fs, mean model time: %.4fs' % (
+                    n_iter, self.input_mode, data_spend / 100.0, model_spend / 100.0))
+                for (image_x_size, image_y_size), (size_time, n_batches) in sorted(size_spends.items()):
+                    print('[%d] input %dx%d: %d batches, mean model time: %.4fs, %.2f images/sec' % (
+                        n_iter, image_x_size, image_y_size, n_batches, size_time / n_batches, 
+                        self.batch_size * n_batches / max(size_time, 1e-6)))
+                print()
+                data_spend, model_spend, size_spends = 0.0, 0.0, {}
+                sys.stdout.flush()
+
+            # 每100轮观测一次生产者的速度
+            if producer_pool and n_iter % 100 == 0:
+                for stat in producer_pool.get_stats():
+                    print('[%d] %s pid: %s, alive: %s, restarts: %d, batches: %d, '
+                        'speed: %.2f batches/sec, waiting: %.0fs' % (
+                        n_iter, stat['name'], str(stat['pid']), str(stat['alive']),
+                        stat['restarts'], stat['batches'], stat['batches_per_sec'], stat['waiting']))
+                print()
+                sys.stdout.flush()
+
+            # 每固定轮数验证一次模型
+            valid_freq = 1000
+            need_valid = False
+            for t in range(-3,4,1):
+                if (n_iter+t) % valid_freq == 0: # and n_iter >= 10:
+                    need_valid = True
+                    break
+            
+            if need_valid and self.is_valid:
+                # 观测一次basic验证集evaluation
+                mAP = self.valid_model(processor, model_path, logs_dir, mode='valid')
+                print('[%d] valid mAP: %.4f\n' % (n_iter, mAP))
+                valid_value = mAP
+
+                if valid_value >= max_valid_value:
+                    max_valid_value = valid_value
+                    print('update best valid mAP: %.4f\n' % (max_valid_value))
+            
+            # 每固定轮数保存一次模型
+            if n_iter % 5000 == 0:
+                model_path = os.path.join(backup_dir, 'model_%d.ckpt' % (n_iter))
+                self.saver.save(self.sess, model_path)
+            
+            sys.stdout.flush()
+        
+        self.sess.close()
+
+    def acquire_batch(self, processor, producer_pool=None, stall_timeout=60.0, max_stalls=10):
+        """
+        从shared_memory借出一个batch，同时检查生产者的状态
+        连续max_stalls次在stall_timeout秒内没有拿到数据时认为生产者已经全部卡住
+        """
+        if producer_pool is None:
+            return processor.shared_memory.acquire()
+
+        n_stalls = 0
+        while True:
+            producer_pool.check()
+            lease, data = processor.shared_memory.acquire(timeout=stall_timeout)
+            if lease is not None:
+                return lease, data
+            n_stalls += 1
+            print('WARNING: no batch in %.0fs, stall %d / %d' % (
+                stall_timeout, n_stalls, max_stalls))
+            for stat in producer_pool.get_stats():
+                print('%s pid: %s, alive: %s, restarts: %d, batches: %d, waiting: %.0fs' % (
+                    stat['name'], str(stat['pid']), str(stat['alive']), 
+                    stat['restarts'], stat['batches'], stat['waiting']))
+            sys.stdout.flush()
+            if n_stalls >= max_stalls:
+                raise('ERROR: producers stalled!')
+
+    def valid_init(self, processor, network):
+        # 构建会话
+        gpu_options = tf.GPUOptions(allow_growth=True)
+        self.sess = tf.Session(config=tf.ConfigProto(
+            gpu_options=gpu_options, allow_soft_placement=True))
+        self.network = network
+        self.network.check_input_size(self.inference_size)
+        self.valid_logits = self.network.get_inference(self.place_holders['images'])
+        
+    def valid_all_models(self, processor, network, backup_dir, logs_dir, n_iters=100000):
+        
+        # 验证backup_dir中的每一个模型
+        for n_iter in range(n_iters):
+            if (n_iter <= 1000 and n_iter % 200 == 0) or (1000 < n_iter <= 10000 and n_iter % 2000 == 0) \
+                or (n_iter > 10000 and n_iter % 20000 == 0):
+                model_path = os.path.join(backup_dir, 'model_%d.ckpt' % (n_iter))
+                # 读取模型
+                self.valid_saver = tf.train.Saver(write_version=tf.train.SaverDef.V2)
+                assert(os.path.exists(model_path+'.index'))
+                self.valid_saver.restore(self.sess, model_path)
+                print('read model from %s' % (model_path))
+                
+                precision_array, recall_array, f1_array, overlap = self.valid_model(
+                    processor, model_path, logs_dir, mode='valid')
+                print('[%d] p@0.5: %.6f, r@0.5: %.6f, f1@0.5: %.6f\n' % (
+                    precision_array[4], recall_array[4], f1_array[4]))
+                sys.stdout.flush()
+
+    def valid_model(self, processor, model_path, output_dir, mode='valid'):
+        # 在整个验证集上累计每个类别的真实框个数，以及每个概率阈值下的true positive和false positive个数，
+        # 最后只计算一次AP，每张图片的权重相同，结果与batch_size无关
+        n_trues = numpy.zeros((self.n_classes-1, ), dtype='int64')
+        n_true_positives = numpy.zeros((self.n_classes-1, 11), dtype='int64')
+        n_false_positives = numpy.zeros((self.n_classes-1, 11), dtype='int64')
+
+        # 按index读取数据，使用当前batch时在后台准备下一个batch，最后一个不完整的batch也参与验证
+        batch_indexs_list = [list(range(i, min(i+self.batch_size, processor.n_valid))) \
+            for i in range(0, processor.n_valid, self.batch_size)]
+        image_x_size, image_y_size = self.inference_size
+        for batch_images, batch_datasets in processor.iter_batches(
+            mode, batch_indexs_list, image_size=self.inference_size):
+            n_batch = len(batch_datasets)
+            batch_images = numpy.reshape(batch_images, 
+                (n_batch, image_y_size, image_x_size, 3))
+            
+            [logits] = self.sess.run(
+                fetches=[self.valid_logits],
+                feed_dict={self.place_holders['images']: batch_images})
+            
+            # 获得预测的框
+            preds_objects = self.get_pred_boxes(logits, batch_datasets, n_batch)
+
+            # 获得真实的框
+            trues_objects = self.get_true_boxes(batch_datasets, n_batch)
+            for true_objects in trues_objects:
+                for true_object in true_objects:
+                    n_trues[true_object['class']-1] += 1
+    
+            for j in range(0, 11):
+                best_prob = 1.0 * j / 10.0
+                batch_true_positives, batch_false_positives = self.get_truepositive_falsepositive(
+                    trues_objects, preds_objects, true_iou=0.5, true_prob=best_prob)
+                n_true_positives[:,j] += batch_true_positives
+                n_false_positives[:,j] += batch_false_positives
+
+        precisions = numpy.zeros((self.n_classes-1, 11), dtype='float32')
+        recalls = numpy.zeros((self.n_classes-1, 11), dtype='float32')
+        for j in range(0, 11):
+            for k in range(self.n_classes-1):
+                precision = 1.0 * n_true_positives[k][j] / (n_true_positives[k][j] + n_false_positives[k][j]) if \
+                    n_true_positives[k][j] + n_false_positives[k][j] > 0 else 0.0
+                recall = 1.0 * n_true_positives[k][j] / n_trues[k] if n_trues[k] > 0 else 0.0
+                precisions[k][j] = precision
+                recalls[k][j] = recall
+
+        mAP = 0.0
+        for k in range(self.n_classes-1):
+            AP = 0.0
+            print(precisions[k], recalls[k])
+            for j in range(1, 11):
+                AP += (precisions[k][j-1] - precisions[k][j]) * (recalls[k][j] - recalls[k][j-1])
+            mAP += AP
+        mAP /= (self.n_classes-1)
+
+        return mAP
+    
+    def test_model(self, processor, network, model_path, output_dir):
+        
+        if not os.path.exists(os.path.join(output_dir, 'predictions')):
+            os.mkdir(os.path.join(output_dir, 'predictions'))
+        for i in range(0, processor.n_test_basic, self.batch_size):
+            # 获取数据并进行数据增强
+            batch_images, batch_datasets = processor.dataset_producer(
+                mode='test_basic', indexs=list(range(i, min(i+self.batch_size, processor.n_test_basic))))
+            
+            [logits] = self.sess.run(
+                fetches=[self.deploy_logits], 
+                feed_dict={self.images: batch_images})
+            
+            # 获得预测的框
+            preds_boxes = self.get_pred_boxes(logits, batch_datasets, len(batch_datasets), is_text=True)
+            
+            for j in range(len(batch_datasets)):
+                docid = batch_datasets[j]['docid']
+                pageid = int(batch_datasets[j]['pageid'])
+                output_path = os.path.join(output_dir, 'predictions', '%s_%d.png' % (
+                    docid, pageid))
+                image_path = batch_datasets[j]['path']
+                show_path = batch_datasets[j]['content']['orig_image_path']
+                print(show_path)
+                image = cv2.imread(show_path)
+                
+                # 画预测的框
+                for box in preds_boxes[j]:
+                    [left, top, right, bottom] = [int(t) for t in box]
+                    cv2.rectangle(image, (left, top), (right, bottom), (238, 192, 126), 2) # blue
+                
+                cv2.imwrite(output_path, image)
+        self.test_sess.close()
+        print('Test Finish!')
+    
+    def get_pred_boxes(self, logits, batch_datasets, batch_size, is_text=True):
+        # cell的个数由网络输出决定，随输入尺寸变化，框的像素坐标按inference_size计算
+        cell_y_size, cell_x_size = logits.shape[1], logits.shape[2]
+        image_x_size, image_y_size = self.inference_size
+        conf_preds = numpy.reshape(logits[:,:,:,:,0:1], (
+            batch_size, cell_y_size, cell_x_size, self.n_boxes, 1))
+        box_preds = self.get_direct_position_py(numpy.reshape(logits[:,:,:,:,1:5], (
+            batch_size, cell_y_size, cell_x_size, self.n_boxes, 4)))
+        class_preds = numpy.reshape(logits[:,:,:,:,5:], (
+            batch_size, cell_y_size, cell_x_size, self.n_boxes, self.n_classes))
+       
+        pred_objects = []
+        for j in range(batch_size):
+            # 获得预测的preds
+            preds = []
+            for x in range(cell_x_size):
+                for y in range(cell_y_size):
+                    for n in range(self.n_boxes):
+                        prob = conf_preds[j,y,x,n,0]
+                        box = box_preds[j,y,x,n,0:4]
+                        index = numpy.argmax(class_preds[j,y,x,n,:])
+                        if prob >= self.network.pred_thresh:
+                            preds.append([box, prob, index])
+            
+            # 排序并去除多余的box
+            preds = sorted(preds, key=lambda x: x[1], reverse=True)
+            for x in range(len(preds)):
+                if preds[x][1] < self.network.pred_thresh:
+                    continue
+                for y in range(x+1, len(preds)):
+                    iou = self.calculate_iou_py(preds[x][0], preds[y][0], mode='xywh')
+                    if iou > self.network.nms_thresh:
+                        preds[y][1] = 0.0
+            
+            # 画预测的框
+            boxes = []
+            for k in range(len(preds)):
+                if preds[k][1] >= self.network.pred_thresh:
+                    [x, y, w, h] = preds[k][0]
+                    index = preds[k][2]
+                    left = int(round(min(max(0.0, x - w / 2.0), 0.9999) * image_x_size))
+                    top = int(round(min(max(0.0, y - h / 2.0), 0.9999) * image_y_size))
+                    right = int(round(min(max(0.0, x + w / 2.0), 0.9999) * image_x_size))
+                    bottom = int(round(min(max(0.0, y + h / 2.0), 0.9999) * image_y_size))
+
+                    boxes.append({'box': [left, top, right, bottom],
+                        'prob': preds[k][1], 'class': int(index)})
+            
+            pred_objects.append(boxes)
+        
+        return pred_objects
+    
+    def get_true_boxes(self, batch_datasets, batch_size, is_text=True):
+        true_objects = []
+        image_x_size, image_y_size = self.inference_size
+        
+        for j in range(batch_size):
+            label = batch_datasets[j]['label']
+
+            true_boxes = []
+            for index, x, y, w, h in label:
+                if x == 0.0 and y == 0.0 and w == 0.0 and h == 0.0:
+                    continue
+                left = int(round(min(max(0.0, x - w / 2.0), 0.9999) * image_x_size))
+                top = int(round(min(max(0.0, y - h / 2.0), 0.9999) * image_y_size))
+                right = int(round(min(max(0.0, x + w / 2.0), 0.9999) * image_x_size))
+                bottom = int(round(min(max(0.0, y + h / 2.0), 0.9999) * image_y_size))
+                
+                true_boxes.append({'box': [left, top, right, bottom],
+                    'prob': 1.0, 'class': int(index)})
+
+            true_objects.append(true_boxes)
+
+        return true_objects
+
+    def get_truepositive_falsepositive(self, true_objects, pred_objects, true_iou=0.5, true_prob=0.5):
+        """
+        获取每个预测框对应的真实框的pair对
+        """
+        n_true_positives = numpy.zeros((self.n_classes-1,), dtype='int32')
+        n_false_positives = numpy.zeros((self.n_classes-1,), dtype='int32')
+        for i in range(len(pred_objects)):
+            for p in range(len(pred_objects[i])):
+                best_n, best_iou = -1, true_iou
+                for t in range(len(true_objects[i])):
+                    iou = self.calculate_iou_py(pred_objects[i][p]['box'], true_objects[i][t]['box'], mode='ltrb')
+                    is_class_right = pred_objects[i][p]['class'] == true_objects[i][t]['class']
+                    if iou >= true_iou and is_class_right and pred_objects[i][p]['prob'] >= true_prob:
+                        best_iou = iou
+                        best_n = t
+                if best_n != -1:
+                    n_true_positives[pred_objects[i][p]['class']-1] += 1
+                else:
+                    n_false_positives[pred_objects[i][p]['class']-1] += 1
+
+        return n_true_positives, n_false_positives
+
+    def get_direct_position_py(self, coord_pred):
+        cell_y_size, cell_x_size = coord_pred.shape[1], coord_pred.shape[2]
+        # 计算bx
+        offset_x = numpy.reshape(range(0, cell_x_size), (1, 1, cell_x_size, 1, 1))
+        offset_x = numpy.array(offset_x, dtype='float')
+        x_pred = (coord_pred[:,:,:,:,0:1] + offset_x) / cell_x_size
+        
+        # 计算by
+        offset_y = numpy.reshape(range(0, cell_y_size), (1, cell_y_size, 1, 1, 1))
+        offset_y = numpy.array(offset_y, dtype='float')
+        y_pred = (coord_pred[:,:,:,:,1:2] + offset_y) / cell_y_size
+        
+        new_coord_pred = numpy.concatenate([x_pred, y_pred, coord_pred[:,:,:,:,2:4]], axis=4)
+        
+        return new_coord_pred
+    
+    def calculate_iou_py(self, box_pred, box_label, mode='xywh'):
+        if mode == 'xywh':
+            box1 = [box_pred[0] - box_pred[2] / 2.0, box_pred[1] - box_pred[3] / 2.0,
+                box_pred[0] + box_pred[2] / 2.0, box_pred[1] + box_pred[3] / 2.0]
+            box2 = [box_label[0] - box_label[2] / 2.0, box_label[1] - box_label[3] / 2.0,
+                box_label[0] + box_label[2] / 2.0, box_label[1] + box_label[3] / 2.0]
+        elif mode == 'ltrb':
+            box1 = box_pred
+            box2 = box_label
+        left = max(box1[0], box2[0])
+        top = max(box1[1], box2[1])
+        right = min(box1[2], box2[2])
+        bottom = min(box1[3], box2[3])
+        if right <= left or bottom <= top:
+            iou = 0.0
+        else:
+            inter_area = (right - left) * (bottom - top)
+            box1_area = (box1[2] - box1[0]) * (box1[3] - box1[1])
+            box2_area = (box2[2] - box2[0]) * (box2[3] - box2[1])
+            iou = inter_area / (box1_area + box2_area - inter_area + 1e-6)
+        
+        return iou
+    
+    def write_train_images(self, batch_images, batch_coord_true, batch_class_true, logs_dir, index):
+        if not os.path.exists(os.path.join(logs_dir, 'train')):
+            os.mkdir(os.path.join(logs_dir, 'train'))
+
+        for b in range(len(batch_images)):
+            if self.image_dtype == 'uint8':
+                image = numpy.array(batch_images[b], dtype='uint8')
+            else:
+                image = numpy.array(batch_images[b]*255, dtype='uint8')
+            # 分桶时每个batch的图片尺寸和cell的个数不同
+            image_y_size, image_x_size = image.shape[0], image.shape[1]
+            for i in range(batch_coord_true.shape[1]):
+                for j in range(batch_coord_true.shape[2]):
+                    for n in range(self.max_objects):
+                        if sum(batch_coord_true[b,i,j,n,:]) == 0.0:
+                            continue
+                        [x, y, w, h] = batch_coord_true[b,i,j,n,:]
+                        if self.is_sparse_class:
+                            class_type = int(batch_class_true[b,i,j,n])
+                        else:
+                            class_type = int(numpy.argmax(batch_class_true[b,i,j,n,:]))
+                        left = int(round((x - w / 2.0) * image_x_size))
+                        top = int(round((y - h / 2.0) * image_y_size))
+                        right = int(round((x + w / 2.0) * image_x_size))
+                        bottom = int(round((y + h / 2.0) * image_y_size))
+                        cv2.rectangle(image, (left, top), (right, bottom), (71, 99, 255), 2) # red
+                        cv2.rectangle(image, (left, top-15), (left+80, top), (71, 99, 255), -1) # red
+                        cv2.putText(image, self.class_types[class_type], (left, top), cv2.FONT_HERSHEY_COMPLEX, 0.4, (255, 255, 255), 1)
+                
+            output_path = os.path.join(logs_dir, 'train', '%d_%d.png' % (index, b))
+            cv2.imwrite(output_path, image)
@@ -0,0 +1,85 @@
+# -*- coding: utf8 -*-
+# description: feed_dict vs tf.data input, run with `python -m src.model.test.input_mode datasets/voc/train.txt`
+from __future__ import print_function
+import sys
+import time
+import tensorflow as tf
+from src.data.data_basic import Processor
+from src.data.producer_pool import ProducerPool
+from src.network.network_basic import Network
+from src.model.model_basic import Model
+
+n_iter = 50
+n_warmup = 5
+batch_size = 8
+n_processes = 2
+max_objects = 30
+n_classes = 20
+
+
+def run_train_steps(image_paths_file, input_mode='feed', head='dense', bucket_sizes=None, image_scales=None):
+    """
+    用真实的训练步骤计时，生产者、shared_memory、网络和优化器与训练时一致，前n_warmup步包含初始化的时间，不计入
+    输入1：image_paths_file - 训练集的图片路径文件
+    输入2：input_mode - feed或者dataset
+    输入3：head, bucket_sizes, image_scales - 与detect_basic中的配置相同
+    输出：stats - 平均的data_time和model_time，以及每秒训练的图片数和每个输入尺寸的batch数
+    """
+    processor = Processor(
+        image_x_size=448, image_y_size=448, max_objects=max_objects, n_classes=n_classes,
+        cell_x_size=7, cell_y_size=7, n_boxes=5, batch_size=batch_size, n_channel=3,
+        n_processes=n_processes, n_iters=n_iter, buffer_size=4, image_dtype='uint8',
+        is_sparse_class=True, bucket_sizes=bucket_sizes, image_scales=image_scales)
+    processor.init_datasets(mode='train', train_image_paths_file=image_paths_file,
+        test_image_paths_file=image_paths_file, traineval_image_paths_file=image_paths_file)
+
+    with tf.Graph().as_default():
+        network = Network(
+            n_channel=3, n_classes=n_classes, image_x_size=448, image_y_size=448,
+            max_objects=max_objects, cell_x_size=7, cell_y_size=7, pool_mode='max', box_per_cell=5,
+            batch_size=batch_size, object_scale=1, noobject_scale=0.5, coord_scale=5, class_scale=1,
+            input_sizes=processor.input_sizes, head=head)
+        model = Model(
+            n_channel=3, max_objects=max_objects, image_x_size=448, image_y_size=448,
+            cell_x_size=7, cell_y_size=7, n_classes=n_classes, box_per_cell=5, batch_size=batch_size,
+            buffer_size=4, image_dtype='uint8', is_sparse_class=True, input_mode=input_mode,
+            input_sizes=processor.input_sizes)
+        # 监督进程在创建tf.Session之前启动
+        producer_pool = ProducerPool(target=processor.dataset_producer_based_shm,
+            n_processes=n_processes, env={'CUDA_VISIBLE_DEVICES': ''})
+        producer_pool.start()
+        try:
+            model.train_init(network, None, processor, producer_pool)
+            fetches = [model.optimizer_handle, model.avg_loss]
+            data_spend, model_spend, size_counts = 0.0, 0.0, {}
+            for i in range(n_warmup + n_iter):
+                if i == n_warmup:
+                    st = time.time()
+                _, inputs, data_time, model_time = model.train_step(
+                    processor, fetches, producer_pool=producer_pool)
+                if i >= n_warmup:
+                    data_spend += data_time
+                    model_spend += model_time
+                    image_y_size, image_x_size = inputs['image_shape']
+                    size = (int(image_x_size), int(image_y_size))
+                    size_counts[size] = size_counts.get(size, 0) + 1
+            spend = time.time() - st
+            model.sess.close()
+        finally:
+            producer_pool.stop()
+
+    return {'data_time': data_spend / n_iter, 'model_time': model_spend / n_iter,
+        'images_per_sec': batch_size * n_iter / spend, 'size_counts': size_counts}
+
+def main():
+    image_paths_file = sys.argv[1]
+    results = [(input_mode, run_train_steps(image_paths_file, input_mode=input_mode)) \
+        for input_mode in ['feed', 'dataset']]
+    print()
+    for input_mode, stats in results:
+        print('%s: mean data time %.2fms, mean model time %.2fms, %.2f images/sec' % (
+            input_mode, 1000.0 * stats['data_time'], 1000.0 * stats['model_time'], stats['images_per_sec']))
+
+
+if __name__ == '__main__':
+    main()
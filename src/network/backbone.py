@@ -0,0 +1,201 @@
+# -*- coding: utf8 -*-
+# description: declarative backbone specification and cost estimator in object detection
+from __future__ import print_function
+import sys
+import src.layer.utils as layer_utils
+
+
+"""
+网络结构配置：每一层是一个dict，按顺序排列
+conv - size, stride, n_filter, activation（默认leaky_relu）, batch_normal（默认True）
+pool - size, stride
+dense - hidden_dim, activation（默认leaky_relu）, batch_normal（默认False），输入为前一层输出展开后的向量
+name省略时按类型自动编号，例如conv1、pool1，与手写网络结构时的名字一致，已有的模型可以直接恢复
+"""
+YOLO_BACKBONE = [
+    {'type': 'conv', 'size': 7, 'stride': 2, 'n_filter': 32},
+    {'type': 'pool', 'size': 2, 'stride': 2},
+    {'type': 'conv', 'size': 3, 'stride': 1, 'n_filter': 96},
+    {'type': 'pool', 'size': 2, 'stride': 2},
+    {'type': 'conv', 'size': 1, 'stride': 1, 'n_filter': 64},
+    {'type': 'conv', 'size': 3, 'stride': 1, 'n_filter': 128},
+    {'type': 'conv', 'size': 1, 'stride': 1, 'n_filter': 128},
+    {'type': 'conv', 'size': 3, 'stride': 1, 'n_filter': 256},
+    {'type': 'pool', 'size': 2, 'stride': 2},
+    {'type': 'conv', 'size': 1, 'stride': 1, 'n_filter': 128},
+    {'type': 'conv', 'size': 3, 'stride': 1, 'n_filter': 256},
+    {'type': 'conv', 'size': 1, 'stride': 1, 'n_filter': 256},
+    {'type': 'conv', 'size': 3, 'stride': 1, 'n_filter': 512},
+    {'type': 'pool', 'size': 2, 'stride': 2},
+    {'type': 'conv', 'size': 1, 'stride': 1, 'n_filter': 256},
+    {'type': 'conv', 'size': 3, 'stride': 1, 'n_filter': 256},
+    {'type': 'conv', 'size': 3, 'stride': 1, 'n_filter': 512},
+    {'type': 'pool', 'size': 2, 'stride': 2},
+    {'type': 'conv', 'size': 3, 'stride': 1, 'n_filter': 512},
+    {'type': 'conv', 'size': 3, 'stride': 1, 'n_filter': 1024}]
+
+
+def get_head_specs(head, cell_y_size, cell_x_size, n_boxes, n_classes):
+    """
+    检测头的配置，接在骨干网络之后
+    输入1：head - dense：两层全连接，conv：1x1卷积
+    输入2：cell_y_size, cell_x_size, n_boxes, n_classes - 全连接的检测头输出所有cell的预测
+    输出：head_specs - 检测头每一层的配置
+    """
+    n_outputs = n_boxes * (5 + n_classes)
+    if head == 'conv':
+        return [{'type': 'conv', 'size': 1, 'stride': 1, 'n_filter': n_outputs,
+            'activation': 'none', 'batch_normal': False}]
+    elif head == 'dense':
+        return [
+            {'type': 'dense', 'hidden_dim': 1024},
+            {'type': 'dense', 'hidden_dim': cell_y_size * cell_x_size * n_outputs, 'activation': 'none'}]
+    else:
+        raise('ERROR: wrong head in network!')
+
+def get_layer_specs(layer_specs):
+    """
+    补全每一层配置中的默认值和名字
+    输入：layer_specs - 每一层的配置
+    输出：new_layer_specs - 补全之后的配置，不修改输入
+    """
+    defaults = {
+        'conv': {'activation': 'leaky_relu', 'batch_normal': True},
+        'pool': {},
+        'dense': {'activation': 'leaky_relu', 'batch_normal': False}}
+    counts = {}
+    new_layer_specs = []
+    for spec in layer_specs:
+        if spec['type'] not in defaults:
+            raise('ERROR: wrong layer type in layer specs!')
+        new_spec = dict(defaults[spec['type']])
+        new_spec.update(spec)
+        counts[spec['type']] = counts.get(spec['type'], 0) + 1
+        if 'name' not in new_spec:
+            new_spec['name'] = '%s%d' % (spec['type'], counts[spec['type']])
+        new_layer_specs.append(new_spec)
+
+    return new_layer_specs
+
+def get_layer_infos(layer_specs, input_shape):
+    """
+    不建立任何tf的op，计算每一层的尺寸和代价，与ConvLayer/PoolLayer/DenseLayer使用src.layer.utils中的同一组函数
+    输入1：layer_specs - 每一层的配置
+    输入2：input_shape - 输入图片的尺寸(image_y_size, image_x_size, n_channel)
+    输出：layer_infos - 每一层的dict，包括name, type, input_shape, output_shape,
+          calculation（乘加次数）, n_params（可训练参数个数）, memory（一张图片的输出占用的字节数）, feel_field（感受野）
+    """
+    layer_specs = get_layer_specs(layer_specs)
+    layer_infos = []
+    # 之前的卷积层和池化层，从近到远排列，用于计算感受野
+    prev_layers = []
+    shape = list(input_shape)
+    for spec in layer_specs:
+        info = {'name': spec['name'], 'type': spec['type'], 'spec': spec}
+        if spec['type'] == 'conv':
+            info['input_shape'] = shape
+            info['output_shape'], info['calculation'], info['n_params'] = layer_utils.cal_conv_infos(
+                shape, spec['size'], spec['size'], spec['stride'], spec['stride'],
+                spec['n_filter'], spec['batch_normal'])
+        elif spec['type'] == 'pool':
+            info['input_shape'] = shape
+            info['output_shape'], info['calculation'], info['n_params'] = layer_utils.cal_pool_infos(
+                shape, spec['size'], spec['size'], spec['stride'], spec['stride'])
+        elif spec['type'] == 'dense':
+            n_inputs = 1
+            for dim in shape:
+                n_inputs *= dim
+            info['input_shape'] = [n_inputs]
+            info['output_shape'], info['calculation'], info['n_params'] = layer_utils.cal_dense_infos(
+                info['input_shape'], spec['hidden_dim'], spec['batch_normal'])
+        # 输出按float32计算
+        n_outputs = 1
+        for dim in info['output_shape']:
+            n_outputs *= dim
+        info['memory'] = 4 * n_outputs
+        # 全连接层的感受野为整个输入
+        if spec['type'] == 'dense':
+            info['feel_field'] = [None, None]
+        else:
+            info['feel_field'] = layer_utils.cal_layer_feel_field(
+                spec['type'], spec['size'], spec['size'], shape, prev_layers)
+            prev_layers.insert(0, (spec['type'], spec['size'], spec['size'], shape))
+        layer_infos.append(info)
+        shape = info['output_shape']
+
+    return layer_infos
+
+def print_layer_infos(layer_infos, batch_size=1):
+    """
+    打印每一层的代价和总的代价，memory为batch_size张图片训练时保存的所有层的输出
+    """
+    print('\n%-10s\t%-20s\t%-20s\t%-12s\t%-12s\t%-12s\t%s' % (
+        'Name', 'Input', 'Output', 'Field', 'Calculation', 'Params', 'Memory'))
+    for info in layer_infos:
+        print('%-10s\t%-20s\t%-20s\t%-12s\t%-12s\t%-12s\t%s' % (
+            info['name'],
+            '(%s)' % (', '.join([str(dim) for dim in info['input_shape']])),
+            '(%s)' % (', '.join([str(dim) for dim in info['output_shape']])),
+            '(%d, %d)' % tuple(info['feel_field']) if info['feel_field'][0] else '-',
+            '%.2fM' % (info['calculation'] / 1024.0 / 1024.0),
+            '%.2fM' % (info['n_params'] / 1024.0 / 1024.0),
+            '%.2fMB' % (batch_size * info['memory'] / 1024.0 / 1024.0)))
+    print('calculation: %.2fM, params: %.2fM, memory: %.2fMB\n' % (
+        sum([info['calculation'] for info in layer_infos]) / 1024.0 / 1024.0,
+        sum([info['n_params'] for info in layer_infos]) / 1024.0 / 1024.0,
+        batch_size * sum([info['memory'] for info in layer_infos]) / 1024.0 / 1024.0))
+
+def build_layers(layer_specs, input_shape, pool_mode='max', weight_decay=None):
+    """
+    根据配置建立ConvLayer/PoolLayer/DenseLayer，只在这里引入tensorflow
+    输入1：layer_specs - 每一层的配置
+    输入2：input_shape - 输入图片的尺寸(image_y_size, image_x_size, n_channel)
+    输入3：pool_mode - 池化的方式
+    输入4：weight_decay - 卷积层和全连接层的weight_decay
+    输出：layers - 每一层的对象，顺序与配置一致
+    """
+    from src.layer.conv_layer import ConvLayer
+    from src.layer.pool_layer import PoolLayer
+    from src.layer.dense_layer import DenseLayer
+
+    layers = []
+    for spec in get_layer_specs(layer_specs):
+        prev_layer = layers[-1] if layers else None
+        if spec['type'] == 'conv':
+            layer = ConvLayer(
+                x_size=spec['size'], y_size=spec['size'], x_stride=spec['stride'], y_stride=spec['stride'],
+                n_filter=spec['n_filter'], activation=spec['activation'], batch_normal=spec['batch_normal'],
+                weight_decay=weight_decay, name=spec['name'],
+                input_shape=None if prev_layer else tuple(input_shape), prev_layer=prev_layer)
+        elif spec['type'] == 'pool':
+            layer = PoolLayer(
+                x_size=spec['size'], y_size=spec['size'], x_stride=spec['stride'], y_stride=spec['stride'],
+                mode=pool_mode, resp_normal=False, name=spec['name'],
+                input_shape=None if prev_layer else tuple(input_shape), prev_layer=prev_layer)
+        elif spec['type'] == 'dense':
+            # 前一层不是全连接层时，输入为展开后的向量
+            if prev_layer and prev_layer.ltype == 'dense':
+                layer = DenseLayer(
+                    hidden_dim=spec['hidden_dim'], activation=spec['activation'],
+                    batch_normal=spec['batch_normal'], weight_decay=weight_decay, name=spec['name'],
+                    prev_layer=prev_layer)
+            else:
+                n_inputs = 1
+                for dim in (prev_layer.output_shape if prev_layer else input_shape):
+                    n_inputs *= dim
+                layer = DenseLayer(
+                    hidden_dim=spec['hidden_dim'], activation=spec['activation'],
+                    batch_normal=spec['batch_normal'], weight_decay=weight_decay, name=spec['name'],
+                    input_shape=[n_inputs])
+        layers.append(layer)
+
+    return layers
+
+
+if __name__ == '__main__':
+    # python -m src.network.backbone conv 448 448
+    head = sys.argv[1] if len(sys.argv) > 1 else 'dense'
+    image_x_size = int(sys.argv[2]) if len(sys.argv) > 2 else 448
+    image_y_size = int(sys.argv[3]) if len(sys.argv) > 3 else 448
+    layer_specs = YOLO_BACKBONE + get_head_specs(head, 7, 7, 5, 21)
+    print_layer_infos(get_layer_infos(layer_specs, (image_y_size, image_x_size, 3)))
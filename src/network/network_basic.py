@@ -1,427 +1,496 @@
-# -*- coding: utf8 -*-
-# author: ronniecao
-# time: 2018/03/10
-# description: network structure in object detection
-from __future__ import print_function
-import sys
-import os
-import time
-import math
-import numpy
-import matplotlib.pyplot as plt
-import cv2
-import tensorflow as tf
-from src.layer.conv_layer import ConvLayer
-from src.layer.pool_layer import PoolLayer
-from src.layer.dense_layer import DenseLayer
-
-
-class Network:
-
-    def __init__(self, 
-        n_channel, 
-        n_classes, 
-        image_x_size, 
-        image_y_size,
-        max_objects, 
-        cell_x_size, 
-        cell_y_size, 
-        pool_mode, 
-        box_per_cell, 
-        batch_size, 
-        object_scale, 
-        noobject_scale, 
-        coord_scale,
-        class_scale,
-        noobject_thresh=0.6, 
-        recall_thresh=0.5, 
-        pred_thresh=0.5, 
-        nms_thresh=0.4,
-        is_weight_decay=False,
-        weight_decay_scale=0.0): 
-        
-        # 设置参数
-        self.n_channel = n_channel
-        self.n_classes = n_classes + 1
-        self.image_x_size = image_x_size
-        self.image_y_size = image_y_size
-        self.max_objects = max_objects
-        self.cell_x_size = cell_x_size
-        self.cell_y_size = cell_y_size
-        self.pool_mode = pool_mode
-        self.n_boxes = box_per_cell
-        self.batch_size = batch_size
-        self.object_scale = float(object_scale)
-        self.noobject_scale = float(noobject_scale)
-        self.coord_scale = float(coord_scale)
-        self.class_scale = float(class_scale)
-        self.noobject_thresh = noobject_thresh
-        self.recall_thresh = recall_thresh
-        self.pred_thresh = pred_thresh
-        self.nms_thresh = nms_thresh
-        self.is_weight_decay = is_weight_decay
-        self.weight_decay_scale = float(weight_decay_scale)
-
-        # 全局变量
-        grid_x = numpy.array(range(0, self.cell_x_size), dtype='float32')
-        grid_x = numpy.reshape(grid_x, newshape=(1, 1, self.cell_x_size, 1, 1))
-        grid_x = numpy.tile(grid_x, (self.batch_size, self.cell_y_size, 1, self.n_boxes, 1))
-        self.grid_x = tf.constant(grid_x, dtype=tf.float32)
-       
-        grid_y = numpy.array(range(0, self.cell_y_size), dtype='float32')
-        grid_y = numpy.reshape(grid_y, newshape=(1, self.cell_y_size, 1, 1, 1))
-        grid_y = numpy.tile(grid_y, (self.batch_size, 1, self.cell_x_size, self.n_boxes, 1))
-        self.grid_y = tf.constant(grid_y, dtype=tf.float32)
-        
-        prior_w = numpy.array([1.0, 0.8, 0.6, 0.4, 0.2], dtype='float32')
-        prior_w = numpy.reshape(prior_w, newshape=(1, 1, 1, self.n_boxes, 1))
-        prior_w = numpy.tile(prior_w, (self.batch_size, self.cell_y_size, self.cell_x_size, 1, 1))
-        self.prior_w = tf.constant(prior_w, dtype=tf.float32)
-        
-        prior_h = numpy.array([0.2, 0.4, 0.6, 0.8, 1.0], dtype='float32')
-        prior_h = numpy.reshape(prior_h, newshape=(1, 1, 1, self.n_boxes, 1))
-        prior_h = numpy.tile(prior_h, (self.batch_size, self.cell_y_size, self.cell_x_size, 1, 1))
-        self.prior_h = tf.constant(prior_h, dtype=tf.float32)
-        
-        # 网络结构
-        print('\n%-10s\t%-25s\t%-20s\t%-20s\t%s' % ('Name', 'Filter', 'Input', 'Output', 'Field')) 
-        self.conv_layer1 = ConvLayer(
-            x_size=7, y_size=7, x_stride=2, y_stride=2, n_filter=32, activation='leaky_relu', 
-            batch_normal=True, weight_decay=self.weight_decay_scale, name='conv1',
-            input_shape=(self.image_y_size, self.image_x_size, self.n_channel))
-        self.pool_layer1 = PoolLayer(
-            x_size=2, y_size=2, x_stride=2, y_stride=2, mode=self.pool_mode, resp_normal=False, 
-            name='pool1', prev_layer=self.conv_layer1)
-        
-        self.conv_layer2 = ConvLayer(
-            x_size=3, y_size=3, x_stride=1, y_stride=1, n_filter=96, activation='leaky_relu', 
-            batch_normal=True, weight_decay=self.weight_decay_scale, name='conv2', prev_layer=self.pool_layer1) 
-        self.pool_layer2 = PoolLayer(
-            x_size=2, y_size=2, x_stride=2, y_stride=2, mode=self.pool_mode, resp_normal=False, 
-            name='pool2', prev_layer=self.conv_layer2)
-        
-        self.conv_layer3 = ConvLayer(
-            x_size=1, y_size=1, x_stride=1, y_stride=1, n_filter=64, activation='leaky_relu', 
-            batch_normal=True, weight_decay=self.weight_decay_scale, name='conv3', prev_layer=self.pool_layer2)
-        self.conv_layer4 = ConvLayer(
-            x_size=3, y_size=3, x_stride=1, y_stride=1, n_filter=128, activation='leaky_relu', 
-            batch_normal=True, weight_decay=self.weight_decay_scale, name='conv4', prev_layer=self.conv_layer3) 
-        self.conv_layer5 = ConvLayer(
-            x_size=1, y_size=1, x_stride=1, y_stride=1, n_filter=128, activation='leaky_relu', 
-            batch_normal=True, weight_decay=self.weight_decay_scale, name='conv5', prev_layer=self.conv_layer4) 
-        self.conv_layer6 = ConvLayer(
-            x_size=3, y_size=3, x_stride=1, y_stride=1, n_filter=256, activation='leaky_relu', 
-            batch_normal=True, weight_decay=self.weight_decay_scale, name='conv6', prev_layer=self.conv_layer5)
-        self.pool_layer3 = PoolLayer(
-            x_size=2, y_size=2, x_stride=2, y_stride=2, mode=self.pool_mode, resp_normal=False, 
-            name='pool3', prev_layer=self.conv_layer6)
-        
-        self.conv_layer7 = ConvLayer(
-            x_size=1, y_size=1, x_stride=1, y_stride=1, n_filter=128, activation='leaky_relu', 
-            batch_normal=True, weight_decay=self.weight_decay_scale, name='conv7', prev_layer=self.pool_layer3)
-        self.conv_layer8 = ConvLayer(
-            x_size=3, y_size=3, x_stride=1, y_stride=1, n_filter=256, activation='leaky_relu', 
-            batch_normal=True, weight_decay=self.weight_decay_scale, name='conv8', prev_layer=self.conv_layer7) 
-        self.conv_layer9 = ConvLayer(
-            x_size=1, y_size=1, x_stride=1, y_stride=1, n_filter=256, activation='leaky_relu', 
-            batch_normal=True, weight_decay=self.weight_decay_scale, name='conv9', prev_layer=self.conv_layer8) 
-        self.conv_layer10 = ConvLayer(
-            x_size=3, y_size=3, x_stride=1, y_stride=1, n_filter=512, activation='leaky_relu', 
-            batch_normal=True, weight_decay=self.weight_decay_scale, name='conv10', prev_layer=self.conv_layer9)
-        self.pool_layer4 = PoolLayer(
-            x_size=2, y_size=2, x_stride=2, y_stride=2, mode=self.pool_mode, resp_normal=False, 
-            name='pool4', prev_layer=self.conv_layer10)
-        
-        self.conv_layer11 = ConvLayer(
-            x_size=1, y_size=1, x_stride=1, y_stride=1, n_filter=256, activation='leaky_relu', 
-            batch_normal=True, weight_decay=self.weight_decay_scale, name='conv11', prev_layer=self.pool_layer4)
-        self.conv_layer12 = ConvLayer(
-            x_size=3, y_size=3, x_stride=1, y_stride=1, n_filter=256, activation='leaky_relu', 
-            batch_normal=True, weight_decay=self.weight_decay_scale, name='conv12', prev_layer=self.conv_layer11) 
-        self.conv_layer13 = ConvLayer(
-            x_size=3, y_size=3, x_stride=1, y_stride=1, n_filter=512, activation='leaky_relu', 
-            batch_normal=True, weight_decay=self.weight_decay_scale, name='conv13', prev_layer=self.conv_layer12) 
-        self.pool_layer5 = PoolLayer(
-            x_size=2, y_size=2, x_stride=2, y_stride=2, mode=self.pool_mode, resp_normal=False, 
-            name='pool5', prev_layer=self.conv_layer13)
-        
-        self.conv_layer14 = ConvLayer(
-            x_size=3, y_size=3, x_stride=1, y_stride=1, n_filter=512, activation='leaky_relu', 
-            batch_normal=True, weight_decay=self.weight_decay_scale, name='conv14', prev_layer=self.pool_layer5) 
-        self.conv_layer15 = ConvLayer(
-            x_size=3, y_size=3, x_stride=1, y_stride=1, n_filter=1024, activation='leaky_relu', 
-            batch_normal=True, weight_decay=self.weight_decay_scale, name='conv15', prev_layer=self.conv_layer14) 
-        
-        self.dense_layer1 = DenseLayer(
-            hidden_dim=1024, activation='leaky_relu', batch_normal=False, weight_decay=self.weight_decay_scale, 
-            name='dense1', input_shape=[7*7*1024])
-        self.dense_layer2 = DenseLayer(
-            hidden_dim=self.cell_y_size*self.cell_x_size*self.n_boxes*(5+self.n_classes), 
-            activation='none', batch_normal=False, weight_decay=self.weight_decay_scale, 
-            name='dense2', prev_layer=self.dense_layer1)
-        
-        self.layers = [
-            self.conv_layer1, self.pool_layer1, 
-            self.conv_layer2, self.pool_layer2,
-            self.conv_layer3, self.conv_layer4, self.conv_layer5, self.conv_layer6, self.pool_layer3,
-            self.conv_layer7, self.conv_layer8, self.conv_layer9, self.conv_layer10, self.pool_layer4,
-            self.conv_layer11, self.conv_layer12, self.conv_layer13, self.pool_layer5,
-            self.conv_layer14, self.conv_layer15,
-            self.dense_layer1, self.dense_layer2]
-
-        self.calculation = sum([layer.calculation for layer in self.layers])
-        print('calculation: %.2fM\n' % (self.calculation / 1024.0 / 1024.0))
-
-    def get_loss(self, images, coord_true, object_mask, class_true, 
-        unpos_coord_true, unpos_object_mask, object_nums, global_step, name):
-        
-        self.images = tf.stop_gradient(images)
-        self.coord_true = coord_true
-        self.object_mask = object_mask
-        self.class_true = class_true
-        self.unpos_coord_true = unpos_coord_true
-        self.unpos_object_mask = unpos_object_mask
-        self.object_nums = object_nums
-        self.global_step = global_step
-
-        # 待输出的中间变量
-        self.logits = self.inference(self.images, is_training=tf.constant(True))
-        self.loss, self.noobject_loss, self.object_loss, self.coord_loss, self.class_loss, \
-            self.iou_value, self.object_value, self.noobject_value, self.class_value = self.calculate_loss(self.logits)
-        self.weight_decay_loss = tf.constant(0.0)
-        
-        tf.add_to_collection('losses_%s' % (name), self.loss)
-
-        if self.is_weight_decay:
-            for layer in self.layers:
-                if layer.ltype =='conv' and layer.weight_decay:
-                    weight_decay_loss = tf.multiply(tf.nn.l2_loss(layer.weight), layer.weight_decay)
-                    self.weight_decay_loss += weight_decay_loss
-                    tf.add_to_collection('losses_%s' % (name), weight_decay_loss)
-        
-        self.avg_loss = tf.add_n(tf.get_collection('losses_%s' % (name)))
-        self.noobject_loss /= self.batch_size
-        self.object_loss /= self.batch_size
-        self.coord_loss /= self.batch_size
-        self.class_loss /= self.batch_size
-            
-        return self.avg_loss, self.noobject_loss, self.object_loss, self.coord_loss, self.class_loss, \
-            self.weight_decay_loss, self.iou_value, self.object_value, self.noobject_value, self.class_value
-
-    def get_inference(self, images):
-       
-        self.logits = self.inference(self.images, is_training=tf.constant(False))
-        return self.logits
-
-    def inference(self, images, is_training=True):
-        with tf.name_scope('inference'):
-            # 数据流
-            hidden_state = images
-            for layer in self.layers[:-2]:
-                hidden_state = layer.get_output(input=hidden_state, is_training=is_training)
-            hidden_state = tf.reshape(hidden_state, (self.batch_size, 7*7*1024))
-            for layer in self.layers[-2:]:
-                hidden_state = layer.get_output(input=hidden_state, is_training=is_training)
-            logits = hidden_state
-            
-            # 网络输出 
-            logits = tf.reshape(logits, shape=(
-                self.batch_size, self.cell_y_size, self.cell_x_size, self.n_boxes, 5+self.n_classes))
-            logits1 = tf.sigmoid(tf.reshape(logits[:,:,:,:,0:5], shape=[
-                self.batch_size, self.cell_y_size, self.cell_x_size, self.n_boxes, 5]))
-            logits2 = tf.nn.softmax(tf.reshape(logits[:,:,:,:,5:], shape=[
-                self.batch_size, self.cell_y_size, self.cell_x_size, self.n_boxes, self.n_classes]))
-            logits = tf.concat([logits1, logits2], axis=4)
-        
-        return logits
-    
-    def calculate_loss(self, logits):
-        with tf.name_scope('detection'):
-            # 获取class_pred和box_pred
-            conf_pred = logits[:,:,:,:,0:1]
-            coord_pred = logits[:,:,:,:,1:5]
-            class_pred = logits[:,:,:,:,5:5+self.n_classes]
-
-            with tf.name_scope('data'):
-                # 获得扩展后的coord_pred和coord_true
-                coord_pred_convert = self.get_direct_position(coord_pred)
-                coord_pred_iter = tf.tile(
-                    tf.reshape(coord_pred_convert, shape=[
-                        self.batch_size, self.cell_y_size, self.cell_x_size, self.n_boxes, 1, 4]), 
-                    [1, 1, 1, 1, self.max_objects, 1]) 
-                coord_true_iter = tf.reshape(self.coord_true[:,:,:,:,0:4], shape=[
-                    self.batch_size, self.cell_y_size, self.cell_x_size, 1, self.max_objects, 4])
-                coord_true_iter = tf.tile(coord_true_iter, [1, 1, 1, self.n_boxes, 1, 1])
-                class_true_iter = tf.reshape(self.class_true[:,:,:,:,0:self.n_classes], shape=[
-                    self.batch_size, self.cell_y_size, self.cell_x_size, 1, self.max_objects, self.n_classes])
-                class_true_iter = tf.tile(class_true_iter, [1, 1, 1, self.n_boxes, 1, 1])
-                
-                # 获得扩展后的unpos_coord_true
-                unpos_coord_true_iter = tf.reshape(self.unpos_coord_true[:,:,0:4], shape=[
-                    self.batch_size, 1, 1, 1, self.max_objects, 4])
-                unpos_coord_true_iter = tf.tile(unpos_coord_true_iter, [
-                    1, self.cell_y_size, self.cell_x_size, self.n_boxes, 1, 1])
-                
-                # 获得shift_coord_true，将x和y改成0，w和h不变
-                shift_xy = tf.zeros(shape=(
-                    self.batch_size, self.cell_y_size, self.cell_x_size, self.max_objects, 2))
-                shift_coord_true = tf.concat(
-                    [shift_xy, self.coord_true[:,:,:,:,2:4]], axis=4)
-                shift_coord_true_iter = tf.reshape(shift_coord_true, shape=(
-                    self.batch_size, self.cell_y_size, self.cell_x_size, 1, self.max_objects, 4))
-                shift_coord_true_iter = tf.tile(shift_coord_true_iter, (
-                    1, 1, 1, self.n_boxes, 1, 1))
-                
-                # 获得pseudo_coord_pred，将x和y改成0，w和h变为base
-                pseudo_xy = tf.zeros(shape=(
-                    self.batch_size, self.cell_y_size, self.cell_x_size, self.n_boxes, 2)) 
-                pseudo_coord_pred = tf.concat([pseudo_xy, self.prior_w, self.prior_h], axis=4)
-                pseudo_coord_pred_iter = tf.reshape(pseudo_coord_pred, shape=(
-                    self.batch_size, self.cell_y_size, self.cell_x_size, self.n_boxes, 1, 4))
-                pseudo_coord_pred_iter = tf.tile(pseudo_coord_pred_iter, (
-                    1, 1, 1, 1, self.max_objects, 1))
-
-                # 计算IOU mask, 尺寸为(1,2,2,2,3,1)
-                # 根据pseudo_iou_tensor计算得到iou_tensor_pred_mask
-                pseudo_iou_tensor = self.calculate_iou(
-                    pseudo_coord_pred_iter, shift_coord_true_iter, mode='xywh')
-                pseudo_iou_tensor = tf.reshape(pseudo_iou_tensor, shape=[
-                    self.batch_size, self.cell_y_size, self.cell_x_size, 
-                    self.n_boxes, self.max_objects, 1])
-                iou_tensor_max = tf.reduce_max(pseudo_iou_tensor, 3, keep_dims=True) 
-                iou_tensor_mask = tf.cast((pseudo_iou_tensor >= iou_tensor_max), dtype=tf.float32) 
-                iou_tensor_mask *= tf.reshape(self.object_mask, shape=(
-                    self.batch_size, self.cell_y_size, self.cell_x_size, 1, self.max_objects, 1))
-                iou_tensor_pred_mask = tf.reduce_max(iou_tensor_mask, axis=4)
-                # 计算得到iou_tensor
-                iou_tensor = self.calculate_iou(coord_pred_iter, coord_true_iter)
-                iou_tensor = tf.reshape(iou_tensor, shape=[
-                    self.batch_size, self.cell_y_size, self.cell_x_size, self.n_boxes, self.max_objects, 1])
-                
-            with tf.name_scope('noobject'):
-                # 根据iou_tensor计算得到iou_anyobject_mask
-                noobject_mask = tf.ones(
-                    (self.batch_size, self.cell_y_size, self.cell_x_size, 
-                    self.n_boxes, 1), dtype=tf.float32) - iou_tensor_pred_mask
-            
-                # 计算anyobject_output
-                zeros_label = tf.zeros(shape=(
-                    self.batch_size, self.cell_y_size, self.cell_x_size, self.n_boxes, 1))
-                noobject_output = (zeros_label - conf_pred) * tf.stop_gradient(noobject_mask)
-                noobject_loss = self.noobject_scale * tf.nn.l2_loss(noobject_output)
-
-                # 计算noobject_value
-                noobject_value = tf.reduce_sum(
-                    conf_pred * noobject_mask, axis=[0,1,2,3,4]) / (
-                        tf.reduce_sum(noobject_mask, axis=[0,1,2,3,4]))
-            
-            with tf.name_scope('object'):
-                # 计算object_output
-                ones_label = tf.ones(shape=(
-                    self.batch_size, self.cell_y_size, self.cell_x_size, self.n_boxes, 1))
-                object_output = (ones_label - conf_pred) * tf.stop_gradient(iou_tensor_pred_mask)
-                object_loss = self.object_scale * tf.nn.l2_loss(object_output) ** 2
-
-                # 计算object_value
-                conf_pred_iter = tf.tile(tf.reshape(conf_pred, shape=[
-                    self.batch_size, self.cell_y_size, self.cell_x_size, self.n_boxes, 1, 1]),
-                    [1, 1, 1, 1, self.max_objects, 1])
-                object_value = tf.reduce_sum(
-                    conf_pred * iou_tensor_pred_mask, axis=[0,1,2,3,4]) / (
-                        tf.reduce_sum(iou_tensor_pred_mask, axis=[0,1,2,3,4]))
-            
-            with tf.name_scope('coord'):
-                # 计算coord_output
-                iou_tensor_pred_mask_copy = tf.reshape(iou_tensor_pred_mask, shape=(
-                    self.batch_size, self.cell_y_size, self.cell_x_size, self.n_boxes, 1, 1))
-                coord_label_matrix = iou_tensor_max * iou_tensor_pred_mask_copy
-                coord_label_max = tf.reduce_max(coord_label_matrix, axis=4, keep_dims=True)
-                coord_label_mask = tf.cast(
-                    coord_label_matrix >= coord_label_max, dtype=tf.float32) * iou_tensor_pred_mask_copy
-                coord_label = tf.reduce_max(coord_label_mask * coord_true_iter, axis=4)
-                coord_label = tf.stop_gradient(self.get_inverse_position(coord_label))
-                coord_output = (coord_label - coord_pred) * tf.stop_gradient(iou_tensor_pred_mask)
-                coord_loss = self.coord_scale * tf.nn.l2_loss(coord_output)
-
-                # 计算iou_value
-                iou_value = tf.reduce_sum(
-                    iou_tensor * iou_tensor_mask, axis=[0,1,2,3,4]) / (
-                    tf.reduce_sum(self.object_mask, axis=[0,1,2,3]))
-
-            with tf.name_scope('class'):
-                # 计算class_loss和class_value
-                class_label = tf.reduce_max(coord_label_mask * class_true_iter, axis=4)
-                class_label = tf.stop_gradient(class_label)
-                class_output = (class_label - class_pred) * tf.stop_gradient(iou_tensor_pred_mask)
-                class_loss = self.class_scale * tf.nn.l2_loss(class_output)
-
-                # 计算class_value
-                class_value = tf.reduce_sum(
-                    class_label * class_pred * iou_tensor_pred_mask, axis=[0,1,2,3,4]) / (
-                    tf.reduce_sum(self.object_mask, axis=[0,1,2,3]))
-            
-            loss = (noobject_loss + object_loss + coord_loss + class_loss) / self.batch_size
-
-            return loss, noobject_loss, object_loss, coord_loss, class_loss, \
-                iou_value, object_value, noobject_value, class_value
-    
-    def get_direct_position(self, coord_pred):
-        """
-        将相对anchor box的预测框转化为绝对预测框
-        输入：相对anchor box的预测框，尺寸(batch_size, cell_y_size, cell_x_size, n_boxes, 4)
-        输出：绝对预测框，尺寸(batch_size, cell_y_size, cell_x_size, n_boxes, 4)
-        """
-        with tf.name_scope('direct_position'):
-            x_pred = (coord_pred[:,:,:,:,0:1] + self.grid_x) / self.cell_x_size
-            y_pred = (coord_pred[:,:,:,:,1:2] + self.grid_y) / self.cell_y_size
-            w_pred = coord_pred[:,:,:,:,2:3]
-            h_pred = coord_pred[:,:,:,:,3:4]
-            
-            new_coord_pred = tf.concat([x_pred, y_pred, w_pred, h_pred], axis=4)
-        
-        return new_coord_pred
-              
-    def get_inverse_position(self, coord_true):
-        """
-        将绝对真实框转化为相对标记框label
-        输入：绝对真实框，尺寸(batch_size, cell_y_size, cell_x_size, n_boxes, 4)
-        输出：相对标记框，尺寸(batch_size, cell_y_size, cell_x_size, n_boxes, 4)
-        """
-        with tf.name_scope('inverse_position'):
-            x_pred = (coord_true[:,:,:,:,0:1] * self.cell_x_size - self.grid_x)
-            y_pred = (coord_true[:,:,:,:,1:2] * self.cell_y_size - self.grid_y)
-            w_pred = coord_true[:,:,:,:,2:3]
-            h_pred = coord_true[:,:,:,:,3:4]
-            
-            coord_label = tf.concat([x_pred, y_pred, w_pred, h_pred], axis=4)
-        
-        return coord_label
-
-    def calculate_iou(self, box_pred, box_true, mode='xywh'):
-        with tf.name_scope('iou'):
-            if mode == 'xywh':
-                box1 = tf.stack([
-                    box_pred[:,:,:,:,:,0] - box_pred[:,:,:,:,:,2] / 2.0,
-                    box_pred[:,:,:,:,:,1] - box_pred[:,:,:,:,:,3] / 2.0,
-                    box_pred[:,:,:,:,:,0] + box_pred[:,:,:,:,:,2] / 2.0,
-                    box_pred[:,:,:,:,:,1] + box_pred[:,:,:,:,:,3] / 2.0])
-                box1 = tf.transpose(box1, perm=[1, 2, 3, 4, 5, 0])
-                box2 = tf.stack([
-                    box_true[:,:,:,:,:,0] - box_true[:,:,:,:,:,2] / 2.0,
-                    box_true[:,:,:,:,:,1] - box_true[:,:,:,:,:,3] / 2.0,
-                    box_true[:,:,:,:,:,0] + box_true[:,:,:,:,:,2] / 2.0,
-                    box_true[:,:,:,:,:,1] + box_true[:,:,:,:,:,3] / 2.0])
-                box2 = tf.transpose(box2, perm=[1, 2, 3, 4, 5, 0])
-            
-            left_top = tf.maximum(box1[:,:,:,:,:,0:2], box2[:,:,:,:,:,0:2])
-            right_bottom = tf.minimum(box1[:,:,:,:,:,2:4], box2[:,:,:,:,:,2:4])
-            intersection = right_bottom - left_top
-            inter_area = intersection[:,:,:,:,:,0] * intersection[:,:,:,:,:,1]
-            mask = tf.cast(intersection[:,:,:,:,:,0] > 0, tf.float32) * \
-                tf.cast(intersection[:,:,:,:,:,1] > 0, tf.float32)
-            inter_area = inter_area * mask
-            box1_area = (box1[:,:,:,:,:,2]-box1[:,:,:,:,:,0]) * (box1[:,:,:,:,:,3]-box1[:,:,:,:,:,1])
-            box2_area = (box2[:,:,:,:,:,2]-box2[:,:,:,:,:,0]) * (box2[:,:,:,:,:,3]-box2[:,:,:,:,:,1])
-            iou = inter_area / (box1_area + box2_area - inter_area + 1e-6)
-        
-        return iou
+# -*- coding: utf8 -*-
+# author: ronniecao
+# time: 2018/03/10
+# description: network structure in object detection
+from __future__ import print_function
+import sys
+import os
+import time
+import math
+import numpy
+import matplotlib.pyplot as plt
+import cv2
+import tensorflow as tf
+import src.network.backbone as backbone_tools
+
+
+class Network:
+
+    def __init__(self, 
+        n_channel, 
+        n_classes, 
+        image_x_size, 
+        image_y_size,
+        max_objects, 
+        cell_x_size, 
+        cell_y_size, 
+        pool_mode, 
+        box_per_cell, 
+        batch_size, 
+        object_scale, 
+        noobject_scale, 
+        coord_scale,
+        class_scale,
+        noobject_thresh=0.6, 
+        recall_thresh=0.5, 
+        pred_thresh=0.5, 
+        nms_thresh=0.4,
+        is_weight_decay=False,
+        weight_decay_scale=0.0,
+        input_sizes=None,
+        assign_mode='network',
+        head='dense',
+        backbone=None): 
+        
+        # 设置参数
+        self.n_channel = n_channel
+        self.n_classes = n_classes + 1
+        self.image_x_size = image_x_size
+        self.image_y_size = image_y_size
+        self.max_objects = max_objects
+        self.cell_x_size = cell_x_size
+        self.cell_y_size = cell_y_size
+        self.pool_mode = pool_mode
+        self.n_boxes = box_per_cell
+        # 网络中的张量不依赖batch_size，同一个图可以输入任意大小的batch
+        self.batch_size = batch_size
+        self.object_scale = float(object_scale)
+        self.noobject_scale = float(noobject_scale)
+        self.coord_scale = float(coord_scale)
+        self.class_scale = float(class_scale)
+        self.noobject_thresh = noobject_thresh
+        self.recall_thresh = recall_thresh
+        self.pred_thresh = pred_thresh
+        self.nms_thresh = nms_thresh
+        self.is_weight_decay = is_weight_decay
+        self.weight_decay_scale = float(weight_decay_scale)
+        # 分桶或者多尺度时所有可能的输入尺寸(image_x_size, image_y_size)，所有尺寸共用同一套参数
+        # 标签的cell个数为输入尺寸除以网络的步长，loss中网格的大小由logits的尺寸决定，检测头输出的网格必须与之一致
+        # 卷积的检测头输出的网格跟随特征图变化，全连接的检测头只支持默认的输入尺寸
+        self.input_sizes = [tuple(size) for size in input_sizes] if input_sizes else None
+        # network：在loss中根据标签计算每个anchor box负责的物体，producer：使用生产者计算好的目标
+        self.assign_mode = assign_mode
+        # 检测头，dense：两层全连接，conv：1x1卷积，特征图的每个位置是一个cell，每个anchor box直接输出预测，
+        # 参数量与输入尺寸无关
+        self.head = head
+        # 骨干网络的配置，格式见src.network.backbone，None时使用YOLO_BACKBONE
+        self.backbone = backbone if backbone else backbone_tools.YOLO_BACKBONE
+
+        # 全局变量
+        # 只在自己的维度上展开，其余维度为1，使用时按广播计算，同一个图可以输入任意的batch大小
+        # 网格的偏移随输入尺寸变化，见get_grid
+        prior_w = numpy.array([1.0, 0.8, 0.6, 0.4, 0.2], dtype='float32')
+        prior_w = numpy.reshape(prior_w, (1, 1, 1, self.n_boxes, 1))
+        self.prior_w = tf.constant(prior_w, dtype=tf.float32)
+        
+        prior_h = numpy.array([0.2, 0.4, 0.6, 0.8, 1.0], dtype='float32')
+        prior_h = numpy.reshape(prior_h, (1, 1, 1, self.n_boxes, 1))
+        self.prior_h = tf.constant(prior_h, dtype=tf.float32)
+        self.prior_sizes = numpy.stack([prior_w.flatten(), prior_h.flatten()], axis=1)
+        
+        # 网络结构
+        # 建立任何op之前先按配置估计每一层的尺寸、计算量、参数量和显存，配置错误时尽早发现
+        input_shape = (self.image_y_size, self.image_x_size, self.n_channel)
+        self.layer_specs = list(self.backbone) + backbone_tools.get_head_specs(
+            self.head, self.cell_y_size, self.cell_x_size, self.n_boxes, self.n_classes)
+        self.layer_infos = backbone_tools.get_layer_infos(self.layer_specs, input_shape)
+        n_backbone = len(self.backbone)
+        if 'dense' in [spec['type'] for spec in self.backbone]:
+            raise('ERROR: backbone can only contain conv and pool layers!')
+        
+        # 全连接层的输入固定为image_y_size x image_x_size时骨干网络的输出尺寸
+        self.feature_y_size, self.feature_x_size, self.feature_n_channel = \
+            self.layer_infos[n_backbone-1]['output_shape']
+        self.stride = int(self.image_x_size / self.feature_x_size)
+        
+        self.calculation = sum([info['calculation'] for info in self.layer_infos])
+        self.n_params = sum([info['n_params'] for info in self.layer_infos])
+        # 训练时每一层的输出都要保存下来用于反向传播，按batch_size张图片估计
+        self.memory = self.batch_size * sum([info['memory'] for info in self.layer_infos])
+        # 建立变量之前打印每一层的计算量、参数量、显存和感受野，以及检测头的部分
+        backbone_tools.print_layer_infos(self.layer_infos, self.batch_size)
+        print('head calculation: %.2fM, head params: %.2fM' % (
+            sum([info['calculation'] for info in self.layer_infos[n_backbone:]]) / 1024.0 / 1024.0,
+            sum([info['n_params'] for info in self.layer_infos[n_backbone:]]) / 1024.0 / 1024.0))
+        
+        print('\n%-10s\t%-25s\t%-20s\t%-20s\t%s' % ('Name', 'Filter', 'Input', 'Output', 'Field')) 
+        self.layers = backbone_tools.build_layers(
+            self.layer_specs, input_shape, pool_mode=self.pool_mode, weight_decay=self.weight_decay_scale)
+        self.backbone_layers = self.layers[0:n_backbone]
+        self.head_layers = self.layers[n_backbone:]
+        print()
+        
+        if self.input_sizes:
+            for image_x_size, image_y_size in self.input_sizes:
+                self.check_input_size((image_x_size, image_y_size))
+                print('input %dx%d calculation: %.2fM' % (image_x_size, image_y_size, 
+                    self.get_calculation(image_x_size, image_y_size) / 1024.0 / 1024.0))
+            print()
+
+    def check_input_size(self, image_size):
+        """
+        检查网络能否处理某个输入尺寸，输出的网格必须等于标签的cell个数，即输入尺寸除以网络的步长
+        输入：image_size - 输入尺寸(image_x_size, image_y_size)
+        """
+        image_x_size, image_y_size = image_size
+        if image_x_size % self.stride != 0 or image_y_size % self.stride != 0:
+            raise('ERROR: input size must be a multiple of network stride!')
+        # 全连接的检测头输出的网格固定为cell_y_size x cell_x_size，只有默认的输入尺寸与标签一致
+        if self.head == 'dense' and (image_x_size, image_y_size) != (self.image_x_size, self.image_y_size):
+            raise('ERROR: dense head only supports the default input size!')
+
+    def get_calculation(self, image_x_size, image_y_size):
+        """
+        计算某个输入尺寸下网络的计算量，卷积和池化层的计算量与特征图的面积成正比，全连接层不变
+        输入：image_x_size, image_y_size - 输入图片的尺寸
+        输出：calculation - 乘加的次数
+        """
+        ratio = 1.0 * image_x_size * image_y_size / (self.image_x_size * self.image_y_size)
+        calculation = 0
+        for layer in self.layers:
+            if layer.ltype in ['conv', 'pool']:
+                calculation += layer.calculation * ratio
+            else:
+                calculation += layer.calculation
+        
+        return calculation
+
+    def get_loss(self, images, coord_true, object_mask, class_true, 
+        unpos_coord_true, unpos_object_mask, object_nums, global_step, name, targets=None):
+        
+        self.images = tf.stop_gradient(self.normalize_images(images))
+        self.coord_true = coord_true
+        self.object_mask = object_mask
+        # 类别序号形式的class_true在calculate_loss中只对物体展开成one-hot
+        self.class_true = class_true
+        self.unpos_coord_true = unpos_coord_true
+        self.unpos_object_mask = unpos_object_mask
+        self.object_nums = object_nums
+        # producer时为生产者计算好的目标，字段与Processor.convert_batch_targets的输出一致
+        self.targets = targets
+        self.global_step = global_step
+
+        # 待输出的中间变量
+        self.logits = self.inference(self.images, is_training=tf.constant(True))
+        self.loss, self.noobject_loss, self.object_loss, self.coord_loss, self.class_loss, \
+            self.iou_value, self.object_value, self.noobject_value, self.class_value = self.calculate_loss(self.logits)
+        self.weight_decay_loss = tf.constant(0.0)
+        
+        tf.add_to_collection('losses_%s' % (name), self.loss)
+
+        if self.is_weight_decay:
+            for layer in self.layers:
+                if layer.ltype =='conv' and layer.weight_decay:
+                    weight_decay_loss = tf.multiply(tf.nn.l2_loss(layer.weight), layer.weight_decay)
+                    self.weight_decay_loss += weight_decay_loss
+                    tf.add_to_collection('losses_%s' % (name), weight_decay_loss)
+        
+        self.avg_loss = tf.add_n(tf.get_collection('losses_%s' % (name)))
+        n_batch = tf.cast(tf.shape(self.logits)[0], dtype=tf.float32)
+        self.noobject_loss /= n_batch
+        self.object_loss /= n_batch
+        self.coord_loss /= n_batch
+        self.class_loss /= n_batch
+            
+        return self.avg_loss, self.noobject_loss, self.object_loss, self.coord_loss, self.class_loss, \
+            self.weight_decay_loss, self.iou_value, self.object_value, self.noobject_value, self.class_value
+
+    def get_inference(self, images):
+       
+        self.logits = self.inference(self.normalize_images(images), is_training=tf.constant(False))
+        return self.logits
+
+    def normalize_images(self, images):
+        """
+        将uint8的原始像素转化为[0,1]之间的float32，float32的输入保持不变
+        """
+        if images.dtype == tf.uint8:
+            with tf.name_scope('normalize'):
+                images = tf.cast(images, dtype=tf.float32) / 255.0
+        
+        return images
+
+    def inference(self, images, is_training=True):
+        with tf.name_scope('inference'):
+            # 数据流
+            hidden_state = images
+            for layer in self.backbone_layers:
+                hidden_state = layer.get_output(input=hidden_state, is_training=is_training)
+            if self.head == 'conv':
+                # 特征图的每个位置是一个cell，输出的网格随输入尺寸变化，与标签的cell个数一致
+                for layer in self.head_layers:
+                    hidden_state = layer.get_output(input=hidden_state, is_training=is_training)
+                cell_y_size, cell_x_size, _, _ = self.get_grid(hidden_state)
+            else:
+                # 全连接层的输入固定为image_y_size x image_x_size时的特征图，其他输入尺寸在check_input_size中拒绝
+                hidden_state = tf.reshape(hidden_state, (
+                    -1, self.feature_y_size*self.feature_x_size*self.feature_n_channel))
+                for layer in self.head_layers:
+                    hidden_state = layer.get_output(input=hidden_state, is_training=is_training)
+                cell_y_size, cell_x_size = self.cell_y_size, self.cell_x_size
+            logits = hidden_state
+            
+            # 网络输出，batch的大小由输入决定
+            logits = tf.reshape(logits, shape=(
+                -1, cell_y_size, cell_x_size, self.n_boxes, 5+self.n_classes))
+            logits1 = tf.sigmoid(tf.reshape(logits[:,:,:,:,0:5], shape=[
+                -1, cell_y_size, cell_x_size, self.n_boxes, 5]))
+            logits2 = tf.nn.softmax(tf.reshape(logits[:,:,:,:,5:], shape=[
+                -1, cell_y_size, cell_x_size, self.n_boxes, self.n_classes]))
+            logits = tf.concat([logits1, logits2], axis=4)
+        
+        return logits
+    
+    def calculate_loss(self, logits):
+        with tf.name_scope('detection'):
+            # 获取class_pred和box_pred
+            conf_pred = logits[:,:,:,:,0:1]
+            coord_pred = logits[:,:,:,:,1:5]
+            class_pred = logits[:,:,:,:,5:5+self.n_classes]
+            n_batch = tf.shape(logits)[0]
+
+            with tf.name_scope('data'):
+                if self.assign_mode == 'producer':
+                    iou_tensor_pred_mask, coord_label, class_label, iou_value, n_objects = \
+                        self.get_producer_targets(coord_pred)
+                else:
+                    iou_tensor_pred_mask, coord_label, class_label, iou_value, n_objects = \
+                        self.get_network_targets(coord_pred)
+            
+            with tf.name_scope('noobject'):
+                # 根据iou_tensor计算得到iou_anyobject_mask
+                noobject_mask = 1.0 - iou_tensor_pred_mask
+            
+                # 计算anyobject_output
+                noobject_output = (0.0 - conf_pred) * tf.stop_gradient(noobject_mask)
+                noobject_loss = self.noobject_scale * tf.nn.l2_loss(noobject_output)
+
+                # 计算noobject_value
+                noobject_value = tf.reduce_sum(
+                    conf_pred * noobject_mask, axis=[0,1,2,3,4]) / (
+                        tf.reduce_sum(noobject_mask, axis=[0,1,2,3,4]))
+            
+            with tf.name_scope('object'):
+                # 计算object_output
+                object_output = (1.0 - conf_pred) * tf.stop_gradient(iou_tensor_pred_mask)
+                object_loss = self.object_scale * tf.nn.l2_loss(object_output) ** 2
+
+                # 计算object_value
+                object_value = tf.reduce_sum(
+                    conf_pred * iou_tensor_pred_mask, axis=[0,1,2,3,4]) / (
+                        tf.reduce_sum(iou_tensor_pred_mask, axis=[0,1,2,3,4]))
+            
+            with tf.name_scope('coord'):
+                # 计算coord_output
+                coord_label = tf.stop_gradient(coord_label)
+                coord_output = (coord_label - coord_pred) * tf.stop_gradient(iou_tensor_pred_mask)
+                coord_loss = self.coord_scale * tf.nn.l2_loss(coord_output)
+
+            with tf.name_scope('class'):
+                # 计算class_loss和class_value
+                class_label = tf.stop_gradient(class_label)
+                class_output = (class_label - class_pred) * tf.stop_gradient(iou_tensor_pred_mask)
+                class_loss = self.class_scale * tf.nn.l2_loss(class_output)
+
+                # 计算class_value
+                class_value = tf.reduce_sum(
+                    class_label * class_pred * iou_tensor_pred_mask, axis=[0,1,2,3,4]) / n_objects
+            
+            loss = (noobject_loss + object_loss + coord_loss + class_loss) / tf.cast(n_batch, dtype=tf.float32)
+
+            return loss, noobject_loss, object_loss, coord_loss, class_loss, \
+                iou_value, object_value, noobject_value, class_value
+    
+    def get_network_targets(self, coord_pred):
+        """
+        在图中根据标签计算每个anchor box负责的物体，只处理真实存在的物体，计算量与物体个数成正比
+        输入：coord_pred - 相对anchor box的预测框，尺寸(batch_size, cell_y_size, cell_x_size, n_boxes, 4)
+        输出1：iou_tensor_pred_mask - 负责预测物体的anchor box，尺寸(batch_size, cell_y_size, cell_x_size, n_boxes, 1)
+        输出2：coord_label - 相对anchor box的回归目标，尺寸(batch_size, cell_y_size, cell_x_size, n_boxes, 4)
+        输出3：class_label - 类别目标，尺寸(batch_size, cell_y_size, cell_x_size, n_boxes, n_classes)
+        输出4：iou_value - 负责的anchor box的预测框与物体的平均IOU
+        输出5：n_objects - 物体个数
+        """
+        n_batch = tf.shape(coord_pred)[0]
+        cell_y_size, cell_x_size, _, _ = self.get_grid(coord_pred)
+        n_cells = n_batch * cell_y_size * cell_x_size
+        
+        # 只取出真实存在的物体组成物体列表，尺寸为(n_objects, ...)，不再在max_objects的维度上展开
+        # object_cells是物体所在cell在(batch_size*cell_y_size*cell_x_size)中的序号
+        object_indexs = tf.where(self.object_mask > 0)
+        cell_indexs = tf.cast(object_indexs, dtype=tf.int32)
+        object_cells = (cell_indexs[:,0] * cell_y_size + cell_indexs[:,1]) * cell_x_size + cell_indexs[:,2]
+        object_coord = tf.gather_nd(self.coord_true[:,:,:,:,0:4], object_indexs)
+        object_class = tf.gather_nd(self.class_true, object_indexs)
+        # 类别序号形式的class_true只对物体展开成one-hot
+        if object_class.dtype.is_integer:
+            object_class = tf.one_hot(object_class, depth=self.n_classes, dtype=tf.float32)
+        object_class = object_class[:,0:self.n_classes]
+            
+        # 获得pseudo_coord_pred，将x和y改成0，w和h变为base，尺寸为(1, n_boxes, 4)
+        pseudo_coord_pred = tf.concat([
+            tf.zeros(shape=(1, self.n_boxes, 2)), 
+            tf.reshape(self.prior_w, shape=(1, self.n_boxes, 1)),
+            tf.reshape(self.prior_h, shape=(1, self.n_boxes, 1))], axis=2)
+        # 获得shift_coord_true，将x和y改成0，w和h不变，尺寸为(n_objects, 1, 4)
+        shift_coord_true = tf.concat([
+            tf.zeros_like(object_coord[:,0:2]), object_coord[:,2:4]], axis=1)
+        shift_coord_true = tf.reshape(shift_coord_true, shape=(-1, 1, 4))
+
+        # 根据pseudo_iou_tensor计算每个物体负责的anchor box，尺寸为(n_objects, n_boxes)
+        pseudo_iou_tensor = self.calculate_iou(pseudo_coord_pred, shift_coord_true, mode='xywh')
+        iou_tensor_max = tf.reduce_max(pseudo_iou_tensor, 1, keep_dims=True)
+        iou_tensor_mask = tf.cast((pseudo_iou_tensor >= iou_tensor_max), dtype=tf.float32)
+        # 同一个cell中的物体按anchor box取最大值，scatter回网格得到iou_tensor_pred_mask
+        iou_tensor_pred_mask = tf.maximum(tf.unsorted_segment_max(
+            iou_tensor_mask, object_cells, n_cells), 0.0)
+        iou_tensor_pred_mask = tf.reshape(iou_tensor_pred_mask, shape=(
+            -1, cell_y_size, cell_x_size, self.n_boxes, 1))
+            
+        # 计算得到iou_tensor，每个物体只和所在cell的预测框计算，尺寸为(n_objects, n_boxes)
+        coord_pred_convert = self.get_direct_position(coord_pred)
+        object_coord_pred = tf.gather(tf.reshape(
+            coord_pred_convert, shape=(-1, self.n_boxes, 4)), object_cells)
+        iou_tensor = self.calculate_iou(
+            object_coord_pred, tf.reshape(object_coord, shape=(-1, 1, 4)))
+
+        # 每个cell中pseudo IOU最大的物体作为这个cell所有负责的anchor box的标签
+        # 有多个物体时取它们的最大值，结果与在max_objects的维度上取最大值一致
+        cell_iou_max = tf.unsorted_segment_max(iou_tensor_max[:,0], object_cells, n_cells)
+        object_label_mask = tf.cast(
+            iou_tensor_max[:,0] >= tf.gather(cell_iou_max, object_cells), dtype=tf.float32)
+        object_label_mask = tf.reshape(object_label_mask, shape=(-1, 1))
+        
+        # 标签扩展到负责的anchor box上，并转化为相对anchor box的坐标
+        coord_label = tf.maximum(tf.unsorted_segment_max(
+            object_label_mask * object_coord, object_cells, n_cells), 0.0)
+        coord_label = tf.reshape(coord_label, shape=(
+            -1, cell_y_size, cell_x_size, 1, 4)) * iou_tensor_pred_mask
+        coord_label = self.get_inverse_position(coord_label)
+        class_label = tf.maximum(tf.unsorted_segment_max(
+            object_label_mask * object_class, object_cells, n_cells), 0.0)
+        class_label = tf.reshape(class_label, shape=(
+            -1, cell_y_size, cell_x_size, 1, self.n_classes)) * iou_tensor_pred_mask
+        
+        # 计算iou_value
+        n_objects = tf.reduce_sum(self.object_mask)
+        iou_value = tf.reduce_sum(iou_tensor * iou_tensor_mask) / n_objects
+        
+        return iou_tensor_pred_mask, coord_label, class_label, iou_value, n_objects
+    
+    def get_producer_targets(self, coord_pred):
+        """
+        使用生产者计算好的目标，只需要展开到anchor box的维度，计算量与标签无关
+        输入：coord_pred - 相对anchor box的预测框，尺寸(batch_size, cell_y_size, cell_x_size, n_boxes, 4)
+        输出：与get_network_targets相同
+        """
+        n_batch = tf.shape(coord_pred)[0]
+        cell_y_size, cell_x_size, _, _ = self.get_grid(coord_pred)
+        
+        iou_tensor_pred_mask = tf.reshape(self.targets['anchor_mask'], shape=(
+            -1, cell_y_size, cell_x_size, self.n_boxes, 1))
+        coord_label = tf.reshape(self.targets['anchor_coord'], shape=(
+            -1, cell_y_size, cell_x_size, 1, 4)) * iou_tensor_pred_mask
+        class_label = self.targets['anchor_class']
+        if class_label.dtype.is_integer:
+            class_label = tf.one_hot(class_label, depth=self.n_classes, dtype=tf.float32)
+        class_label = tf.reshape(class_label[:,:,:,0:self.n_classes], shape=(
+            -1, cell_y_size, cell_x_size, 1, self.n_classes)) * iou_tensor_pred_mask
+        
+        # 计算iou_value，物体列表中补齐的位置没有负责的anchor box
+        coord_pred_convert = tf.reshape(self.get_direct_position(coord_pred), shape=(
+            -1, cell_y_size*cell_x_size, self.n_boxes, 4))
+        batch_indexs = tf.tile(tf.reshape(tf.range(n_batch), shape=(-1, 1)), [1, self.max_objects])
+        object_coord_pred = tf.gather_nd(coord_pred_convert, tf.stack(
+            [batch_indexs, self.targets['object_cells']], axis=2))
+        iou_tensor = self.calculate_iou(object_coord_pred, tf.reshape(
+            self.targets['object_coord'], shape=(-1, self.max_objects, 1, 4)))
+        object_anchors = self.targets['object_anchors']
+        n_objects = tf.reduce_sum(tf.reduce_max(object_anchors, axis=2))
+        iou_value = tf.reduce_sum(iou_tensor * object_anchors) / n_objects
+        
+        return iou_tensor_pred_mask, coord_label, class_label, iou_value, n_objects
+
+    def get_grid(self, tensor):
+        """
+        网格的大小和每个cell的偏移，由张量的尺寸决定，尺寸不固定时在图中计算
+        输入：tensor - 尺寸(batch_size, cell_y_size, cell_x_size, ...)
+        输出1：cell_y_size, cell_x_size - 网格的大小，python的整数或者int32的标量
+        输出2：grid_y, grid_x - 每个cell的偏移，尺寸分别为(1, cell_y_size, 1, 1, 1)和(1, 1, cell_x_size, 1, 1)
+        """
+        cell_y_size, cell_x_size = tensor.shape[1:3].as_list()
+        if cell_y_size is None:
+            cell_y_size = tf.shape(tensor)[1]
+        if cell_x_size is None:
+            cell_x_size = tf.shape(tensor)[2]
+        grid_y = tf.reshape(tf.cast(tf.range(cell_y_size), dtype=tf.float32), shape=(1, -1, 1, 1, 1))
+        grid_x = tf.reshape(tf.cast(tf.range(cell_x_size), dtype=tf.float32), shape=(1, 1, -1, 1, 1))
+        
+        return cell_y_size, cell_x_size, grid_y, grid_x
+
+    def get_direct_position(self, coord_pred):
+        """
+        将相对anchor box的预测框转化为绝对预测框
+        输入：相对anchor box的预测框，尺寸(batch_size, cell_y_size, cell_x_size, n_boxes, 4)
+        输出：绝对预测框，尺寸(batch_size, cell_y_size, cell_x_size, n_boxes, 4)
+        """
+        with tf.name_scope('direct_position'):
+            cell_y_size, cell_x_size, grid_y, grid_x = self.get_grid(coord_pred)
+            x_pred = (coord_pred[:,:,:,:,0:1] + grid_x) / tf.cast(cell_x_size, dtype=tf.float32)
+            y_pred = (coord_pred[:,:,:,:,1:2] + grid_y) / tf.cast(cell_y_size, dtype=tf.float32)
+            w_pred = coord_pred[:,:,:,:,2:3]
+            h_pred = coord_pred[:,:,:,:,3:4]
+            
+            new_coord_pred = tf.concat([x_pred, y_pred, w_pred, h_pred], axis=4)
+        
+        return new_coord_pred
+              
+    def get_inverse_position(self, coord_true):
+        """
+        将绝对真实框转化为相对标记框label
+        输入：绝对真实框，尺寸(batch_size, cell_y_size, cell_x_size, n_boxes, 4)
+        输出：相对标记框，尺寸(batch_size, cell_y_size, cell_x_size, n_boxes, 4)
+        """
+        with tf.name_scope('inverse_position'):
+            cell_y_size, cell_x_size, grid_y, grid_x = self.get_grid(coord_true)
+            x_pred = (coord_true[:,:,:,:,0:1] * tf.cast(cell_x_size, dtype=tf.float32) - grid_x)
+            y_pred = (coord_true[:,:,:,:,1:2] * tf.cast(cell_y_size, dtype=tf.float32) - grid_y)
+            w_pred = coord_true[:,:,:,:,2:3]
+            h_pred = coord_true[:,:,:,:,3:4]
+            
+            coord_label = tf.concat([x_pred, y_pred, w_pred, h_pred], axis=4)
+        
+        return coord_label
+
+    def calculate_iou(self, box_pred, box_true, mode='xywh'):
+        """
+        计算两组框的IOU，最后一维是坐标，其余维度按广播计算
+        输入1：box_pred - 预测框，尺寸(..., 4)
+        输入2：box_true - 真实框，尺寸(..., 4)
+        输出：iou - 尺寸为广播之后去掉最后一维
+        """
+        with tf.name_scope('iou'):
+            if mode == 'xywh':
+                box1 = tf.stack([
+                    box_pred[...,0] - box_pred[...,2] / 2.0,
+                    box_pred[...,1] - box_pred[...,3] / 2.0,
+                    box_pred[...,0] + box_pred[...,2] / 2.0,
+                    box_pred[...,1] + box_pred[...,3] / 2.0], axis=-1)
+                box2 = tf.stack([
+                    box_true[...,0] - box_true[...,2] / 2.0,
+                    box_true[...,1] - box_true[...,3] / 2.0,
+                    box_true[...,0] + box_true[...,2] / 2.0,
+                    box_true[...,1] + box_true[...,3] / 2.0], axis=-1)
+            
+            left_top = tf.maximum(box1[...,0:2], box2[...,0:2])
+            right_bottom = tf.minimum(box1[...,2:4], box2[...,2:4])
+            intersection = right_bottom - left_top
+            inter_area = intersection[...,0] * intersection[...,1]
+            mask = tf.cast(intersection[...,0] > 0, tf.float32) * \
+                tf.cast(intersection[...,1] > 0, tf.float32)
+            inter_area = inter_area * mask
+            box1_area = (box1[...,2]-box1[...,0]) * (box1[...,3]-box1[...,1])
+            box2_area = (box2[...,2]-box2[...,0]) * (box2[...,3]-box2[...,1])
+            iou = inter_area / (box1_area + box2_area - inter_area + 1e-6)
+        
+        return iou
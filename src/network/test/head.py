@@ -0,0 +1,65 @@
+# -*- coding: utf8 -*-
+# description: dense head vs 1x1 conv head, run with `python -m src.network.test.head`
+from __future__ import print_function
+import os
+import time
+import shutil
+import tempfile
+import numpy
+import tensorflow as tf
+from src.network.network_basic import Network
+
+n_iter = 20
+batch_sizes = [1, 8]
+image_x_size = 448
+image_y_size = 448
+
+
+def build_network(head):
+    return Network(
+        n_channel=3, n_classes=20, image_x_size=image_x_size, image_y_size=image_y_size,
+        max_objects=30, cell_x_size=7, cell_y_size=7, pool_mode='max', box_per_cell=5,
+        batch_size=1, object_scale=1, noobject_scale=0.5, coord_scale=5, class_scale=1, head=head)
+
+def get_checkpoint_size(sess, saver):
+    """
+    保存一次模型，分别统计参数文件和meta文件的大小，卷积层的初始值作为常量保存在meta文件中
+    """
+    backup_dir = tempfile.mkdtemp()
+    try:
+        saver.save(sess, os.path.join(backup_dir, 'model.ckpt'))
+        sizes = [(name, os.path.getsize(os.path.join(backup_dir, name))) for name in os.listdir(backup_dir)]
+        data_size = sum([size for name, size in sizes if '.data' in name or '.index' in name])
+        meta_size = sum([size for name, size in sizes if name.endswith('.meta')])
+        return data_size, meta_size
+    finally:
+        shutil.rmtree(backup_dir)
+
+def main():
+    for head in ['dense', 'conv']:
+        with tf.Graph().as_default():
+            network = build_network(head)
+            images = tf.placeholder(dtype=tf.float32, shape=[None, image_y_size, image_x_size, 3])
+            logits = network.get_inference(images)
+            saver = tf.train.Saver(var_list=tf.global_variables(), write_version=tf.train.SaverDef.V2)
+            with tf.Session() as sess:
+                sess.run(tf.global_variables_initializer())
+                data_size, meta_size = get_checkpoint_size(sess, saver)
+                print('%s head: params %.2fM, calculation %.2fM, checkpoint data %.2fMB, meta %.2fMB' % (
+                    head, network.n_params / 1024.0 / 1024.0, network.calculation / 1024.0 / 1024.0,
+                    data_size / 1024.0 / 1024.0, meta_size / 1024.0 / 1024.0))
+                
+                # 推理的延迟，前几次运行包含初始化的时间，不计入
+                for batch_size in batch_sizes:
+                    batch_images = numpy.random.random((batch_size, image_y_size, image_x_size, 3))
+                    for _ in range(3):
+                        sess.run(logits, feed_dict={images: batch_images})
+                    st = time.time()
+                    for _ in range(n_iter):
+                        sess.run(logits, feed_dict={images: batch_images})
+                    print('%s head: batch %d, latency %.2fms' % (
+                        head, batch_size, 1000.0 * (time.time() - st) / n_iter))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+# -*- coding: utf8 -*-
+# description: object list loss vs tiled loss, run with `python -m src.network.test.loss`
+from __future__ import print_function
+import time
+import numpy
+import tensorflow as tf
+from src.data.data_basic import Processor
+from src.network.network_basic import Network
+
+n_iter = 20
+batch_size = 8
+max_objects = 30
+n_classes = 20
+cell_size = 7
+n_boxes = 5
+names = ['loss', 'noobject_loss', 'object_loss', 'coord_loss', 'class_loss',
+    'iou_value', 'object_value', 'noobject_value', 'class_value']
+
+
+def calculate_tiled_loss(network, logits):
+    """
+    原来的loss，在(batch_size, cell_y_size, cell_x_size, n_boxes, max_objects, ...)上展开所有的框，
+    class_true需要是one-hot的形式
+    """
+    conf_pred = logits[:,:,:,:,0:1]
+    coord_pred = logits[:,:,:,:,1:5]
+    class_pred = logits[:,:,:,:,5:5+network.n_classes]
+    n_batch = tf.shape(logits)[0]
+
+    coord_pred_convert = network.get_direct_position(coord_pred)
+    coord_pred_iter = tf.tile(tf.reshape(coord_pred_convert, shape=[
+        -1, cell_size, cell_size, n_boxes, 1, 4]), [1, 1, 1, 1, max_objects, 1])
+    coord_true_iter = tf.reshape(network.coord_true[:,:,:,:,0:4], shape=[
+        -1, cell_size, cell_size, 1, max_objects, 4])
+    coord_true_iter = tf.tile(coord_true_iter, [1, 1, 1, n_boxes, 1, 1])
+    class_true_iter = tf.reshape(network.class_true[:,:,:,:,0:network.n_classes], shape=[
+        -1, cell_size, cell_size, 1, max_objects, network.n_classes])
+    class_true_iter = tf.tile(class_true_iter, [1, 1, 1, n_boxes, 1, 1])
+
+    shift_coord_true = tf.concat([
+        tf.zeros_like(network.coord_true[:,:,:,:,0:2]), network.coord_true[:,:,:,:,2:4]], axis=4)
+    shift_coord_true_iter = tf.tile(tf.reshape(shift_coord_true, shape=(
+        -1, cell_size, cell_size, 1, max_objects, 4)), (1, 1, 1, n_boxes, 1, 1))
+    pseudo_coord_pred = tf.concat([
+        tf.zeros(shape=(1, 1, 1, n_boxes, 2)), network.prior_w, network.prior_h], axis=4)
+    pseudo_coord_pred_iter = tf.tile(tf.reshape(pseudo_coord_pred, shape=(
+        1, 1, 1, n_boxes, 1, 4)), tf.stack([n_batch, cell_size, cell_size, 1, max_objects, 1]))
+
+    pseudo_iou_tensor = network.calculate_iou(pseudo_coord_pred_iter, shift_coord_true_iter, mode='xywh')
+    pseudo_iou_tensor = tf.reshape(pseudo_iou_tensor, shape=[
+        -1, cell_size, cell_size, n_boxes, max_objects, 1])
+    iou_tensor_max = tf.reduce_max(pseudo_iou_tensor, 3, keep_dims=True)
+    iou_tensor_mask = tf.cast((pseudo_iou_tensor >= iou_tensor_max), dtype=tf.float32)
+    iou_tensor_mask *= tf.reshape(network.object_mask, shape=(
+        -1, cell_size, cell_size, 1, max_objects, 1))
+    iou_tensor_pred_mask = tf.reduce_max(iou_tensor_mask, axis=4)
+    iou_tensor = network.calculate_iou(coord_pred_iter, coord_true_iter)
+    iou_tensor = tf.reshape(iou_tensor, shape=[-1, cell_size, cell_size, n_boxes, max_objects, 1])
+
+    noobject_mask = 1.0 - iou_tensor_pred_mask
+    noobject_loss = network.noobject_scale * tf.nn.l2_loss((0.0 - conf_pred) * noobject_mask)
+    noobject_value = tf.reduce_sum(conf_pred * noobject_mask) / tf.reduce_sum(noobject_mask)
+
+    object_loss = network.object_scale * tf.nn.l2_loss((1.0 - conf_pred) * iou_tensor_pred_mask) ** 2
+    object_value = tf.reduce_sum(conf_pred * iou_tensor_pred_mask) / tf.reduce_sum(iou_tensor_pred_mask)
+
+    iou_tensor_pred_mask_copy = tf.reshape(iou_tensor_pred_mask, shape=(
+        -1, cell_size, cell_size, n_boxes, 1, 1))
+    coord_label_matrix = iou_tensor_max * iou_tensor_pred_mask_copy
+    coord_label_max = tf.reduce_max(coord_label_matrix, axis=4, keep_dims=True)
+    coord_label_mask = tf.cast(
+        coord_label_matrix >= coord_label_max, dtype=tf.float32) * iou_tensor_pred_mask_copy
+    coord_label = tf.reduce_max(coord_label_mask * coord_true_iter, axis=4)
+    coord_label = network.get_inverse_position(coord_label)
+    coord_loss = network.coord_scale * tf.nn.l2_loss((coord_label - coord_pred) * iou_tensor_pred_mask)
+    iou_value = tf.reduce_sum(iou_tensor * iou_tensor_mask) / tf.reduce_sum(network.object_mask)
+
+    class_label = tf.reduce_max(coord_label_mask * class_true_iter, axis=4)
+    class_loss = network.class_scale * tf.nn.l2_loss((class_label - class_pred) * iou_tensor_pred_mask)
+    class_value = tf.reduce_sum(
+        class_label * class_pred * iou_tensor_pred_mask) / tf.reduce_sum(network.object_mask)
+
+    loss = (noobject_loss + object_loss + coord_loss + class_loss) / tf.cast(n_batch, dtype=tf.float32)
+
+    return loss, noobject_loss, object_loss, coord_loss, class_loss, \
+        iou_value, object_value, noobject_value, class_value
+
+def random_labels():
+    """
+    第0张图片没有物体，第1张图片的max_objects个物体挤在同一个cell中，多于anchor box的个数，
+    第2张图片有重复的框，其余图片随机
+    """
+    labels = numpy.zeros((batch_size, max_objects, 5), dtype='float32')
+    for b in range(1, batch_size):
+        n_objects = max_objects if b == 1 else numpy.random.randint(1, max_objects+1)
+        labels[b,0:n_objects,0] = numpy.random.randint(1, n_classes+1, size=(n_objects, ))
+        labels[b,0:n_objects,1:3] = numpy.random.random((n_objects, 2))
+        labels[b,0:n_objects,3:5] = numpy.random.random((n_objects, 2)) * 0.5 + 0.01
+    labels[1,:,1:3] = 0.5
+    labels[2,1:4,1:5] = labels[2,0,1:5]
+    return labels
+
+def build_placeholders(network, batch_results, batch_targets=None):
+    """
+    建立标签的placeholder并设置到network上，返回placeholder到数据的feed_dict
+    """
+    feed_dict = {}
+    label_names = ['coord_true', 'object_mask', 'class_true',
+        'unpos_coord_true', 'unpos_object_mask', 'object_nums']
+    for name, value in zip(label_names, batch_results):
+        placeholder = tf.placeholder(dtype=tf.as_dtype(value.dtype), shape=(None, ) + value.shape[1:])
+        setattr(network, name, placeholder)
+        feed_dict[placeholder] = value
+    if batch_targets is not None:
+        network.targets = {}
+        target_names = ['anchor_mask', 'anchor_coord', 'anchor_class',
+            'object_coord', 'object_cells', 'object_anchors']
+        for name, value in zip(target_names, batch_targets):
+            placeholder = tf.placeholder(dtype=tf.as_dtype(value.dtype), shape=(None, ) + value.shape[1:])
+            network.targets[name] = placeholder
+            feed_dict[placeholder] = value
+    return feed_dict
+
+def run(sess, outputs, feed_dict):
+    results = sess.run(outputs, feed_dict=feed_dict)
+    st = time.time()
+    for _ in range(n_iter):
+        sess.run(outputs, feed_dict=feed_dict)
+    return results, 1000.0 * (time.time() - st) / n_iter
+
+def main():
+    numpy.random.seed(0)
+    # 生产者计算目标时，稀疏的类别每个cell只保留一个，与原来的loss不同，所以只在网络中计算目标时比较稀疏的类别
+    for is_sparse_class, assign_mode in [(False, 'network'), (True, 'network'), (False, 'producer')]:
+        processor = Processor(
+            image_x_size=448, image_y_size=448, max_objects=max_objects, n_classes=n_classes,
+            cell_x_size=cell_size, cell_y_size=cell_size, n_boxes=n_boxes, batch_size=batch_size, n_channel=3,
+            n_processes=1, n_iters=n_iter, buffer_size=2, is_sparse_class=is_sparse_class)
+        batch_results = processor.convert_batch_labels(random_labels())
+        batch_targets = processor.convert_batch_targets(*batch_results[0:3]) \
+            if assign_mode == 'producer' else None
+        logits_value = numpy.random.random((
+            batch_size, cell_size, cell_size, n_boxes, 5+n_classes+1)).astype('float32')
+
+        with tf.Graph().as_default():
+            network = Network(
+                n_channel=3, n_classes=n_classes, image_x_size=448, image_y_size=448,
+                max_objects=max_objects, cell_x_size=cell_size, cell_y_size=cell_size, pool_mode='max',
+                box_per_cell=n_boxes, batch_size=batch_size, object_scale=1, noobject_scale=0.5,
+                coord_scale=5, class_scale=1, assign_mode=assign_mode)
+            logits = tf.placeholder(dtype=tf.float32, shape=(None, ) + logits_value.shape[1:])
+            feed_dict = build_placeholders(network, batch_results, batch_targets)
+            feed_dict[logits] = logits_value
+            new_outputs = network.calculate_loss(logits)
+            if is_sparse_class:
+                network.class_true = tf.one_hot(network.class_true, depth=network.n_classes, dtype=tf.float32)
+            old_outputs = calculate_tiled_loss(network, logits)
+
+            with tf.Session() as sess:
+                old_results, old_time = run(sess, old_outputs, feed_dict)
+                new_results, new_time = run(sess, new_outputs, feed_dict)
+
+        mode = '%s class, %s targets' % ('sparse' if is_sparse_class else 'dense', assign_mode)
+        for name, old_result, new_result in zip(names, old_results, new_results):
+            if not numpy.allclose(old_result, new_result, rtol=1e-5, atol=1e-6):
+                print(name, old_result, new_result)
+                raise Exception('ERROR: %s is different with %s!' % (name, mode))
+        print('%s: outputs are identical, tiled loss %.2fms, object list loss %.2fms' % (
+            mode, old_time, new_time))
+
+
+if __name__ == '__main__':
+    main()
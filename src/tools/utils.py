@@ -3,6 +3,7 @@
 # time: 2018/01/11
 # description: util tools for project
 import os
+import sys
 
 
 def is_in_table(text, table):
@@ -34,3 +35,19 @@ def cal_resized_size(orig_h, orig_w, canvas_h, canvas_w):
         is_horizal = False
 
     return resized_h, resized_w, is_horizal
+
+def get_resident_memory():
+    """
+    获取当前进程的常驻内存（RSS），单位为MB
+    """
+    if os.path.exists('/proc/self/status'):
+        with open('/proc/self/status', 'r') as fo:
+            for line in fo:
+                if line.startswith('VmRSS:'):
+                    return float(line.split()[1]) / 1024.0
+    import resource
+    # linux下ru_maxrss单位为KB，mac下为B，这里返回的是峰值
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if 'darwin' in sys.platform:
+        return max_rss / 1024.0 / 1024.0
+    return max_rss / 1024.0